@@ -1,20 +1,42 @@
+import time
+
+# Start of the app's imports, for the cold-start import time reported at /ready
+_IMPORT_STARTED = time.monotonic()
+
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse
+from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from dotenv import load_dotenv
 import os
+from utils.pipeline import (
+    get_evaluation, parse_budgets, stage_stats, check_admission, PipelineError,
+    CRAWL_STAGE_CONCURRENCY, LLM_STAGE_CONCURRENCY, CORE_SCORE_FIELDS
+)
+from utils.browser_pool import close_crawler_pool, get_crawler_pool
+from utils.crawl4ai_integration import fetch_paths, close_http_client
+from utils.result_cache import get_result_cache
+from utils.coalescing import single_flight
+from utils.llm_cache import llm_cache
+from utils.page_cache import page_cache
+from utils.admission import crawl_admission
+from utils import metrics
+from utils.llm_integration import router_stats, close_router
+from utils.jobs import get_job_manager, job_is_stale, TERMINAL_STATUSES, LOST_JOB_ERROR
 from utils.url_validation import validate_url
-from utils.crawl4ai_integration import scrape_content
-from utils.llm_integration import evaluate_partner
+from utils.warmup import warmup
 from pathlib import Path
 import atexit
 import signal
 import traceback
 import logging
 import asyncio
+import json
+from typing import Dict, List, Optional, Tuple
+
+warmup.record_import(_IMPORT_STARTED)
 
 # Configure logging
 logging.basicConfig(
@@ -42,6 +64,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count in-flight requests and time each one to its response headers"""
+    started = time.monotonic()
+    status = 500
+    with metrics.HTTP_REQUESTS_IN_FLIGHT.track_inprogress():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # The matched route's path template, so ids in URLs don't become labels
+            route = request.scope.get("route")
+            handler = getattr(route, "path", None) or "unmatched"
+            if handler != "/metrics":
+                metrics.HTTP_REQUEST_DURATION.labels(handler, request.method, str(status)).observe(
+                    time.monotonic() - started
+                )
+
+# Largest number of URLs accepted by /predict/batch in one request
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "1000"))
+
+# How often the job event stream checks for new events
+JOB_EVENTS_POLL_INTERVAL = float(os.getenv("JOB_EVENTS_POLL_INTERVAL", "0.5"))
+
 # Get the current directory
 BASE_DIR = Path(__file__).resolve().parent
 
@@ -66,11 +113,19 @@ async def startup_event():
     logger.info("Server starting up...")
     logger.info(f"Static files directory: {str(BASE_DIR / 'static')}")
     logger.info(f"Templates directory: {str(BASE_DIR / 'templates')}")
+    # Browsers and clients warm up in the background so /health answers right away
+    warmup.start()
+    get_job_manager().start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Run when the server shuts down"""
     logger.info("Server shutting down...")
+    await warmup.stop()
+    await get_job_manager().stop()
+    await close_crawler_pool()
+    await close_http_client()
+    await close_router()
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -87,6 +142,36 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness of this worker: 503 until its browsers and clients are warmed up"""
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/stats")
+async def stats():
+    """Runtime statistics for sizing the crawler pool per worker"""
+    return {
+        "pid": os.getpid(),
+        "crawler_pool": get_crawler_pool().stats(),
+        "fetch_paths": fetch_paths.stats(),
+        "page_cache": page_cache.stats(),
+        "pipeline_stages": stage_stats(),
+        "admission": crawl_admission.stats(),
+        "result_cache": get_result_cache().stats(),
+        "coalescing": single_flight.stats(),
+        "llm_cache": llm_cache.stats(),
+        "llm_backends": router_stats(),
+        "jobs": get_job_manager().stats(),
+        "startup": warmup.status()
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics aggregated across all workers"""
+    body, content_type = await asyncio.to_thread(metrics.render)
+    return Response(content=body, media_type=content_type)
+
 @app.post("/predict")
 async def predict(request: Request):
     """Evaluate a website for partnership potential"""
@@ -103,70 +188,23 @@ async def predict(request: Request):
 
         url = data.get("url")
         logger.info(f"Received prediction request for URL: {url}")
-        
-        if not url:
-            logger.warning("No URL provided in request")
-            return JSONResponse(
-                status_code=400,
-                content={"error": "URL is required"}
-            )
-        
-        if not validate_url(url):
-            logger.warning(f"Invalid URL format: {url}")
-            return JSONResponse(
-                status_code=400,
-                content={"error": "Invalid URL format"}
-            )
-        
-        try:
-            # Scrape content using Crawl4AI with timeout
-            logger.info(f"Starting content scraping for: {url}")
-            content = await scrape_content(url)
-            if not content:
-                return JSONResponse(
-                    status_code=500,
-                    content={"error": "Failed to retrieve content from website"}
-                )
-            logger.info(f"Successfully scraped content, length: {len(content)}")
-        except asyncio.TimeoutError:
-            logger.error(f"Timeout while scraping {url}")
-            return JSONResponse(
-                status_code=504,
-                content={"error": "Timeout while scraping website"}
-            )
-        except Exception as e:
-            logger.error(f"Scraping error for {url}: {str(e)}")
-            logger.error(traceback.format_exc())
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Failed to scrape website: {str(e)}"}
-            )
-        
+
         try:
-            # Evaluate using LLM with timeout
-            logger.info("Starting LLM evaluation")
-            result = await evaluate_partner(content)
-            if not result:
-                return JSONResponse(
-                    status_code=500,
-                    content={"error": "Failed to generate evaluation"}
-                )
-            logger.info("Successfully completed LLM evaluation")
-            logger.debug(f"Evaluation result: {result}")
-            return JSONResponse(content=result)
-        except asyncio.TimeoutError:
-            logger.error("Timeout during LLM evaluation")
-            return JSONResponse(
-                status_code=504,
-                content={"error": "Timeout during content evaluation"}
-            )
-        except Exception as e:
-            logger.error(f"LLM evaluation error: {str(e)}")
-            logger.error(traceback.format_exc())
-            return JSONResponse(
-                status_code=500,
-                content={"error": f"Failed to evaluate content: {str(e)}"}
+            budgets = parse_budgets(data)
+            evaluation = await get_evaluation(
+                url,
+                force_refresh=bool(data.get("forceRefresh")),
+                **budgets
             )
+        except PipelineError as e:
+            return JSONResponse(status_code=e.status_code, content=e.to_dict(), headers=e.headers)
+
+        logger.info(f"Evaluation for {url} served with cache status {evaluation.cache_status}")
+        logger.debug(f"Evaluation result: {evaluation.result}")
+        headers = evaluation.headers()
+        if request.headers.get("if-none-match") == evaluation.etag:
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(content=evaluation.result, headers=headers)
     
     except Exception as e:
         logger.error(f"General error in predict endpoint: {str(e)}")
@@ -176,6 +214,277 @@ async def predict(request: Request):
             content={"error": str(e)}
         )
 
+def parse_batch_body(body: bytes, content_type: str) -> Tuple[List[str], Dict]:
+    """
+    Read the URLs of a batch request.
+
+    Accepts a JSON object {"urls": [...], ...options}, a bare JSON list, or a
+    JSONL upload (one URL string or {"url": ...} object per line).
+    """
+    if "ndjson" in content_type or "jsonl" in content_type:
+        urls = []
+        for line in body.decode("utf-8").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            urls.append(item.get("url") if isinstance(item, dict) else item)
+        return urls, {}
+
+    data = json.loads(body)
+    if isinstance(data, list):
+        return data, {}
+    if not isinstance(data, dict) or not isinstance(data.get("urls"), list):
+        raise ValueError("Expected a list of URLs")
+    return data["urls"], data
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    Evaluate many websites, streaming one NDJSON line per URL as soon as it completes.
+
+    Each line is {"index", "url", "cache", "result"} on success or {"index", "url",
+    "status", "error"} on failure, so one bad URL never fails the whole batch.
+    A busy host refuses the batch with a 503 up front; once accepted, its
+    crawls wait for admission instead of being shed.
+    """
+    try:
+        urls, options = parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+        budgets = parse_budgets(options)
+        force_refresh = bool(options.get("forceRefresh"))
+        check_admission()
+    except PipelineError as e:
+        return JSONResponse(status_code=e.status_code, content=e.to_dict(), headers=e.headers)
+    except Exception as e:
+        logger.error(f"Failed to parse batch request: {e}")
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid request format"}
+        )
+
+    if not urls:
+        return JSONResponse(status_code=400, content={"error": "At least one URL is required"})
+    if len(urls) > BATCH_MAX_URLS:
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Batch is limited to {BATCH_MAX_URLS} URLs"}
+        )
+    logger.info(f"Received batch prediction request for {len(urls)} URLs")
+
+    async def run_batch():
+        work: asyncio.Queue = asyncio.Queue()
+        for item in enumerate(urls):
+            work.put_nowait(item)
+        done: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            while True:
+                try:
+                    index, url = work.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                line = {"index": index, "url": url}
+                try:
+                    evaluation = await get_evaluation(
+                        url if isinstance(url, str) else None,
+                        force_refresh=force_refresh,
+                        shed_load=False,
+                        **budgets
+                    )
+                    line["cache"] = evaluation.cache_status
+                    line["result"] = evaluation.result
+                except PipelineError as e:
+                    line.update(status=e.status_code, **e.to_dict())
+                except Exception as e:
+                    logger.error(f"Batch item {index} failed: {str(e)}")
+                    line.update(status=500, error=str(e))
+                await done.put(line)
+
+        # Enough workers to keep both stages busy; the stage semaphores in
+        # utils.pipeline are what actually bound crawl and LLM concurrency.
+        workers = [
+            asyncio.ensure_future(worker())
+            for _ in range(min(len(urls), CRAWL_STAGE_CONCURRENCY + LLM_STAGE_CONCURRENCY))
+        ]
+        try:
+            for _ in range(len(urls)):
+                line = await done.get()
+                yield json.dumps(line) + "\n"
+        finally:
+            # Client went away or batch finished: stop any remaining work
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    return StreamingResponse(run_batch(), media_type="application/x-ndjson")
+
+def sse_event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    """Format one server-sent event"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    Evaluate a website, streaming progress as server-sent events.
+
+    The core scores arrive in a "scores" event as soon as the model emits
+    them, followed by one "section" event per remaining field and a final
+    "result" (or "error") event with the complete evaluation.
+    """
+    try:
+        data = await request.json()
+        budgets = parse_budgets(data)
+        # Shed load before the 200 and the event stream start
+        check_admission()
+    except PipelineError as e:
+        return JSONResponse(status_code=e.status_code, content=e.to_dict(), headers=e.headers)
+    except Exception as e:
+        logger.error(f"Failed to parse request JSON: {e}")
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid request format"}
+        )
+
+    url = data.get("url")
+    logger.info(f"Received streaming prediction request for URL: {url}")
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        try:
+            evaluation = await get_evaluation(
+                url,
+                force_refresh=bool(data.get("forceRefresh")),
+                progress=lambda event, payload: events.put_nowait((event, payload)),
+                **budgets
+            )
+            if evaluation.cache_status in ("HIT", "STALE", "COALESCED"):
+                # No LLM stream ran in this request; send the scores up front anyway
+                events.put_nowait(("scores", {
+                    field: evaluation.result.get(field) for field in CORE_SCORE_FIELDS
+                }))
+            events.put_nowait(("result", evaluation.result))
+        except PipelineError as e:
+            events.put_nowait(("error", {"status": e.status_code, **e.to_dict()}))
+        except Exception as e:
+            logger.error(f"Streaming evaluation failed for {url}: {str(e)}")
+            events.put_nowait(("error", {"status": 500, "error": str(e)}))
+
+    async def stream():
+        task = asyncio.ensure_future(run())
+        try:
+            while True:
+                event, payload = await events.get()
+                yield sse_event(event, payload)
+                if event in ("result", "error"):
+                    return
+        finally:
+            task.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request):
+    """Queue an evaluation and return its job id immediately"""
+    try:
+        data = await request.json()
+    except Exception as e:
+        logger.error(f"Failed to parse request JSON: {e}")
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid request format"}
+        )
+
+    url = data.get("url")
+    if not url:
+        return JSONResponse(status_code=400, content={"error": "URL is required"})
+    if not validate_url(url):
+        return JSONResponse(status_code=400, content={"error": "Invalid URL format"})
+    try:
+        budgets = parse_budgets(data)
+        check_admission()
+    except PipelineError as e:
+        return JSONResponse(status_code=e.status_code, content=e.to_dict(), headers=e.headers)
+
+    job_id = await get_job_manager().submit(url, {
+        "force_refresh": bool(data.get("forceRefresh")),
+        **budgets
+    })
+    logger.info(f"Queued job {job_id} for URL: {url}")
+    return {
+        "id": job_id,
+        "status": "queued",
+        "statusUrl": f"/jobs/{job_id}",
+        "eventsUrl": f"/jobs/{job_id}/events"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a job, with its result once done"""
+    job = await asyncio.to_thread(get_job_manager().store.get, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-sent events for a job: queued, crawl_started, page_fetched,
+    crawl_finished, llm_started, scores, section, llm_finished and finally
+    done or failed.
+    """
+    store = get_job_manager().store
+    if await asyncio.to_thread(store.get, job_id) is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+
+    try:
+        last_seq = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_seq = 0
+
+    async def stream():
+        nonlocal last_seq
+        idle = 0.0
+        while not await request.is_disconnected():
+            events = await asyncio.to_thread(store.events_since, job_id, last_seq)
+            for event in events:
+                last_seq = event["seq"]
+                yield sse_event(event["event"], event["data"], event["seq"])
+                if event["event"] in TERMINAL_STATUSES:
+                    return
+            if events:
+                idle = 0.0
+            else:
+                job = await asyncio.to_thread(store.get, job_id)
+                if job is None or job["status"] in TERMINAL_STATUSES or job_is_stale(job):
+                    # Finished since the read above, expired or lost with its
+                    # worker: send what's left and end the stream
+                    for event in await asyncio.to_thread(store.events_since, job_id, last_seq):
+                        last_seq = event["seq"]
+                        yield sse_event(event["event"], event["data"], event["seq"])
+                        if event["event"] in TERMINAL_STATUSES:
+                            return
+                    if job is not None:
+                        status = job["status"] if job["status"] in TERMINAL_STATUSES else "failed"
+                        yield sse_event(status, {"error": job.get("error") or LOST_JOB_ERROR} if status == "failed" else {})
+                    return
+                if idle >= 15:
+                    # Keep proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    idle = 0.0
+            await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+            idle += JOB_EVENTS_POLL_INTERVAL
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     logger.info("Starting server on http://localhost:3000")
     uvicorn.run("app:app", host="127.0.0.1", port=3000, reload=True) 
\ No newline at end of file
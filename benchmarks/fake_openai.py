@@ -0,0 +1,242 @@
+"""
+Stand-in for the OpenAI chat completions and Anthropic messages APIs, for
+testing the LLM dispatch and routing layers and load testing without
+spending tokens.
+
+    python benchmarks/fake_openai.py --port 8001 --latency 2 --rpm 60
+    LLM_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=fake python run.py
+
+    # A second provider, to exercise hedging
+    python benchmarks/fake_openai.py --port 8002 --latency 1
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8002 ANTHROPIC_API_KEY=fake ...
+
+Answers every request with a canned evaluation (only the requested fields for
+repair requests), streamed or not, over --latency seconds; --slow-rate of
+requests wait before their first token so they take --slow-latency in total,
+producing a latency tail; --output-tokens lengthens the answer. Requests
+beyond --rpm in a sliding minute get a 429 with Retry-After, and
+--error-rate of requests fail with a 500, like the real APIs under load.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import deque
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SAMPLE_EVALUATION = {
+    "probability": 72,
+    "reachScore": 65,
+    "relevanceScore": 80,
+    "reasoning": "Web agency serving small businesses with site builds and hosting.",
+    "category": "Web Agency",
+    "businessProfile": {
+        "industry": "Web design", "companySize": "10-50", "geographicReach": "National",
+        "yearsInBusiness": "12", "clientPortfolioSize": "200+"
+    },
+    "technicalAssessment": {
+        "techStack": ["WordPress", "Shopify"], "accessibilitySolutions": "None mentioned",
+        "integrationScore": 4, "developmentServices": ["Custom themes"], "hostingServices": "Managed hosting"
+    },
+    "marketPosition": {
+        "segments": ["SMB"], "competitors": [], "certifications": [], "memberships": [], "awards": []
+    },
+    "clientRelationships": {
+        "clientTypes": ["Retail", "Professional services"], "averageClientSize": "Small",
+        "retentionRate": "Long-term retainers", "serviceModel": "Retainer", "successStories": 6
+    },
+    "businessModel": {
+        "revenueStreams": ["Projects", "Hosting"], "pricingModel": "Fixed price", "salesApproach": "Referral",
+        "serviceDelivery": "Remote", "contractTypes": ["Retainer"]
+    },
+    "complianceGrowth": {
+        "regulatoryFocus": [], "complianceServices": [], "growthIndicators": ["Hiring"],
+        "digitalPresenceScore": 4, "futurePlans": []
+    },
+    "partnershipEvaluation": {
+        "strengths": ["Large client base"], "challenges": ["No accessibility offering yet"],
+        "opportunities": ["Bundle with hosting"], "risks": [], "recommendedApproach": "Reseller program"
+    },
+    "indicators": ["Hosts client sites", "Builds on WordPress"],
+    "salesPitch": "Add accessibility compliance to every site you host."
+}
+
+def create_app(latency: float = 1.0, rpm: int = 0, error_rate: float = 0.0, chunk_size: int = 20,
+               slow_rate: float = 0.0, slow_latency: float = 10.0, output_tokens: int = 0) -> FastAPI:
+    app = FastAPI()
+    recent = deque()
+    stats = {"requests": 0, "rate_limited": 0, "errors": 0, "slow": 0}
+
+    def queueing_delay() -> float:
+        """Extra wait before the first token, as when a provider is overloaded"""
+        if random.random() < slow_rate:
+            stats["slow"] += 1
+            return max(0.0, slow_latency - latency)
+        return 0.0
+
+    def reject() -> Optional[JSONResponse]:
+        """A 429 or 500 response if this request should fail"""
+        stats["requests"] += 1
+        now = time.monotonic()
+        while recent and now - recent[0] > 60:
+            recent.popleft()
+        if rpm and len(recent) >= rpm:
+            stats["rate_limited"] += 1
+            retry_after = max(1, int(60 - (now - recent[0])) + 1)
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": str(retry_after)}
+            )
+        recent.append(now)
+        if random.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "Server error", "type": "server_error"}}, status_code=500)
+        return None
+
+    def chunked(text: str) -> List[str]:
+        return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+    def answer_for(body: dict) -> dict:
+        schema = (body.get("response_format") or {}).get("json_schema") or {}
+        if schema.get("name") == "PartnerEvaluationRepair":
+            fields = schema["schema"]["properties"]
+            return {key: value for key, value in SAMPLE_EVALUATION.items() if key in fields}
+        answer = dict(SAMPLE_EVALUATION)
+        padding = output_tokens - len(json.dumps(answer, indent=2)) // 4
+        if padding > 0:
+            # Lengthen the reasoning to about output_tokens tokens in all (~4 characters each)
+            answer["reasoning"] += " The site lists more client work." * (padding // 8 + 1)
+        return answer
+
+    def usage(body: dict, text: str) -> dict:
+        prompt = sum(len(message.get("content") or "") for message in body.get("messages", [])) // 4
+        completion = len(text) // 4
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        rejection = reject()
+        if rejection is not None:
+            return rejection
+
+        text = json.dumps(answer_for(body), indent=2)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "gpt-4")
+        queued = queueing_delay()
+
+        if not body.get("stream"):
+            await asyncio.sleep(queued + latency)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage(body, text)
+            }
+
+        async def events():
+            await asyncio.sleep(queued)
+            chunks = chunked(text)
+            for chunk in chunks:
+                await asyncio.sleep(latency / len(chunks))
+                yield "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]
+                }) + "\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [],
+                    "usage": usage(body, text)
+                }) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        rejection = reject()
+        if rejection is not None:
+            return rejection
+
+        text = json.dumps(answer_for(body), indent=2)
+        message_id = f"msg_{uuid.uuid4().hex}"
+        model = body.get("model", "claude")
+        queued = queueing_delay()
+        prompt_tokens = usage({"messages": body.get("messages", [])}, "")["prompt_tokens"]
+
+        if not body.get("stream"):
+            await asyncio.sleep(queued + latency)
+            return {
+                "id": message_id,
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": len(text) // 4}
+            }
+
+        def event(kind: str, data: dict) -> str:
+            return f"event: {kind}\ndata: " + json.dumps({"type": kind, **data}) + "\n\n"
+
+        async def events():
+            yield event("message_start", {"message": {
+                "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+                "usage": {"input_tokens": prompt_tokens, "output_tokens": 0}
+            }})
+            await asyncio.sleep(queued)
+            yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            chunks = chunked(text)
+            for chunk in chunks:
+                await asyncio.sleep(latency / len(chunks))
+                yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": chunk}})
+            yield event("content_block_stop", {"index": 0})
+            yield event("message_delta", {"delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": len(text) // 4}})
+            yield event("message_stop", {})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per completion")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute before 429s (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with 500")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests taking --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=10.0, help="seconds per slow completion")
+    parser.add_argument("--output-tokens", type=int, default=0, help="approximate completion length in tokens")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(
+            latency=args.latency, rpm=args.rpm, error_rate=args.error_rate,
+            slow_rate=args.slow_rate, slow_latency=args.slow_latency, output_tokens=args.output_tokens
+        ),
+        host=args.host, port=args.port, log_level="warning"
+    )
+
+if __name__ == "__main__":
+    main()
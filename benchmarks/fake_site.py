@@ -0,0 +1,173 @@
+"""
+Local multi-page websites for benchmarking the crawl stage without the
+internet. Each site is served on its own port, so sites are distinct hosts
+to the crawler's per-host limits, fetch-path memory and robots.txt.
+
+    python benchmarks/fake_site.py --port 8100 --sites 20 --pages 30 --fanout 8 --latency 0.05 --js-rate 0.25
+
+serves http://127.0.0.1:8100/ ... http://127.0.0.1:8119/. A homepage links to
+--fanout other pages (about, services, partners, pricing, blog posts, ...),
+every page links to --fanout more. --js-rate of the sites are single-page
+apps whose HTML is an empty shell filled in by JavaScript, so they need the
+browser. --sitemap adds robots.txt and sitemap.xml. Every response waits
+--latency seconds (plus up to --jitter).
+"""
+import argparse
+import asyncio
+import html
+import json
+import random
+import signal
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response
+
+SECTIONS = [
+    "about", "services", "partners", "pricing", "contact", "team", "clients", "case-studies",
+    "solutions", "integrations", "careers", "press", "support", "security", "resources"
+]
+VOCABULARY = (
+    "web design agency hosting clients websites accessibility compliance wcag development "
+    "wordpress shopify support maintenance partners resellers digital marketing seo ecommerce "
+    "small business enterprise retainer projects portfolio team years experience award certified "
+    "integration platform solutions customers growth strategy consulting services pricing plans"
+).split()
+
+class FakeSite:
+    def __init__(self, index: int, pages: int, fanout: int, words: int, js: bool, seed: int):
+        rng = random.Random(seed * 1000 + index)
+        self.name = f"Example Company {index}"
+        self.js = js
+        paths = ["/"] + [f"/{section}" for section in SECTIONS]
+        post = 1
+        while len(paths) < pages:
+            paths.append(f"/blog/post-{post}")
+            post += 1
+        self.paths = paths[:max(1, pages)]
+        self.links: Dict[str, List[str]] = {
+            path: rng.sample(self.paths, min(fanout, len(self.paths))) for path in self.paths
+        }
+        self.text: Dict[str, str] = {
+            path: " ".join(rng.choice(VOCABULARY) for _ in range(words)) for path in self.paths
+        }
+
+    def body(self, path: str) -> str:
+        title = path.strip("/").replace("-", " ").title() or "Home"
+        nav = "".join(
+            f'<li><a href="{link}">{link.strip("/").replace("-", " ").title() or "Home"}</a></li>'
+            for link in self.links[path]
+        )
+        paragraphs = self.text[path].split()
+        chunks = [" ".join(paragraphs[i:i + 60]) for i in range(0, len(paragraphs), 60)]
+        text = "".join(f"<p>{chunk}</p>" for chunk in chunks)
+        return (
+            f"<header><nav><ul>{nav}</ul></nav></header>"
+            f"<main><h1>{html.escape(self.name)}: {title}</h1>{text}</main>"
+            f"<footer><p>Copyright {html.escape(self.name)}</p></footer>"
+        )
+
+    def page(self, path: str) -> str:
+        title = f"<title>{html.escape(self.name)}</title>"
+        if not self.js:
+            return f"<!DOCTYPE html><html><head>{title}</head><body>{self.body(path)}</body></html>"
+        # A single-page app: nothing to read without running the script
+        return (
+            f"<!DOCTYPE html><html><head>{title}</head><body><div id=\"root\"></div>"
+            f"<script>document.getElementById('root').innerHTML = {json.dumps(self.body(path))};</script>"
+            f"<noscript>Please enable JavaScript to use this site.</noscript></body></html>"
+        )
+
+def create_app(base_port: int, sites: int = 10, pages: int = 30, fanout: int = 8, words: int = 400,
+               latency: float = 0.05, jitter: float = 0.0, js_rate: float = 0.0, sitemap: bool = False,
+               seed: int = 1) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    js_sites = set(rng.sample(range(sites), round(sites * js_rate)))
+    catalog = [FakeSite(index, pages, fanout, words, index in js_sites, seed) for index in range(sites)]
+    stats = {"requests": 0}
+
+    def site_for(request: Request) -> FakeSite:
+        port = request.url.port or base_port
+        return catalog[(port - base_port) % sites]
+
+    async def delay():
+        stats["requests"] += 1
+        await asyncio.sleep(latency + random.uniform(0, jitter))
+
+    @app.get("/_stats")
+    async def get_stats():
+        return stats
+
+    @app.get("/robots.txt")
+    async def robots(request: Request):
+        await delay()
+        if not sitemap:
+            return Response(status_code=404)
+        return PlainTextResponse(f"User-agent: *\nAllow: /\nSitemap: {request.base_url}sitemap.xml\n")
+
+    @app.get("/sitemap.xml")
+    async def sitemap_xml(request: Request):
+        await delay()
+        if not sitemap:
+            return Response(status_code=404)
+        base = str(request.base_url).rstrip("/")
+        urls = "".join(f"<url><loc>{base}{path}</loc></url>" for path in site_for(request).paths)
+        return Response(
+            f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>',
+            media_type="application/xml"
+        )
+
+    @app.get("/{path:path}")
+    async def page(path: str, request: Request):
+        await delay()
+        site = site_for(request)
+        path = "/" + path
+        if path not in site.links:
+            return HTMLResponse("<html><body><h1>Not found</h1></body></html>", status_code=404)
+        return HTMLResponse(site.page(path))
+
+    return app
+
+async def serve(app: FastAPI, host: str, base_port: int, sites: int):
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host=host, port=base_port + index, log_level="warning"))
+        for index in range(sites)
+    ]
+
+    def stop():
+        for server in servers:
+            server.should_exit = True
+
+    # One process serves every port, so stop them all on the first signal
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop)
+    for server in servers:
+        server.install_signal_handlers = lambda: None
+    await asyncio.gather(*(server.serve() for server in servers))
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake websites for crawl benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100, help="port of the first site")
+    parser.add_argument("--sites", type=int, default=10, help="sites, one per port")
+    parser.add_argument("--pages", type=int, default=30, help="pages per site")
+    parser.add_argument("--fanout", type=int, default=8, help="links per page")
+    parser.add_argument("--words", type=int, default=400, help="words of text per page")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per response")
+    parser.add_argument("--js-rate", type=float, default=0.0, help="fraction of sites rendered by JavaScript")
+    parser.add_argument("--sitemap", action="store_true", help="serve robots.txt and sitemap.xml")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    app = create_app(
+        base_port=args.port, sites=args.sites, pages=args.pages, fanout=args.fanout, words=args.words,
+        latency=args.latency, jitter=args.jitter, js_rate=args.js_rate, sitemap=args.sitemap, seed=args.seed
+    )
+    asyncio.run(serve(app, args.host, args.port, args.sites))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Micro-benchmark of the crawl frontier: queueing the links of link-heavy pages
+(repeated nav/footer links, fragments, tracking query strings, assets,
+external links) with the old urljoin + substring scoring + unbounded heap,
+against utils.frontier.Frontier.
+
+    python benchmarks/frontier_bench.py --pages 50 --links 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from heapq import heappush, heappop
+from typing import List, Tuple
+from urllib.parse import urljoin, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.frontier import Frontier, PageScore  # noqa: E402
+from utils.url_validation import canonicalize_url  # noqa: E402
+
+BASE = "https://www.example.com/"
+NAV = ["/", "/about", "/services", "/products", "/pricing", "/contact", "/blog", "/careers", "/partners", "/support"]
+WORDS = ["solutions", "news", "team", "article", "widget", "case-study", "guide", "events", "archive", "tag"]
+
+def legacy_score(url: str) -> float:
+    url_lower = url.lower()
+    if any(x in url_lower for x in [
+        'about', 'company', 'team', 'partner', 'client', 'service', 'product', 'solution', 'integration',
+        'enterprise', 'business', 'pricing', 'plan', 'technology', 'platform', 'developer', 'api',
+        'security', 'compliance', 'legal', 'privacy', 'contact', 'support'
+    ]):
+        return 1.0
+    if any(x in url_lower for x in [
+        'feature', 'resource', 'blog', 'news', 'case-study', 'success-story', 'testimonial',
+        'documentation', 'guide', 'help'
+    ]):
+        return 0.6
+    if any(x in url_lower for x in ['career', 'job', 'press', 'media', 'event', 'webinar', 'download']):
+        return 0.3
+    return 0.1
+
+def make_pages(pages: int, links: int, seed: int = 1) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """Synthetic pages as (url, [(href, anchor text)])"""
+    rng = random.Random(seed)
+    site = []
+    for index in range(pages):
+        anchors = [(href, href.strip("/").title()) for href in NAV] * 3  # header, footer, sitemap block
+        while len(anchors) < links:
+            kind = rng.random()
+            path = "/" + "/".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))) + f"/{rng.randint(0, links)}"
+            if kind < 0.3:
+                href = path + f"#section-{rng.randint(0, 5)}"
+            elif kind < 0.5:
+                href = path + f"?utm_source=nav&ref={rng.randint(0, 1000)}"
+            elif kind < 0.6:
+                href = f"https://cdn.example.net/assets/{rng.randint(0, 500)}.png"
+            elif kind < 0.7:
+                href = f"https://twitter.com/share?u={rng.randint(0, 1000)}"
+            elif kind < 0.75:
+                href = path + "/"
+            else:
+                href = path
+            anchors.append((href, rng.choice(["Read more", "Learn more", "Our team", "Case study", ""])))
+        site.append((urljoin(BASE, f"/page/{index}"), anchors))
+    return site
+
+def run_legacy(site, max_pages: int):
+    base_domain = urlparse(BASE).netloc
+    visited = set()
+    queue: List[PageScore] = []
+    peak = 0
+    for page_url, anchors in site:
+        visited.add(page_url)
+        for href, _ in anchors:
+            full_url = urljoin(page_url, href)
+            if urlparse(full_url).netloc == base_domain and full_url not in visited:
+                heappush(queue, PageScore(url=full_url, score=legacy_score(full_url), depth=1))
+        peak = max(peak, len(queue))
+    picked = []
+    while queue and len(picked) < max_pages:
+        page = heappop(queue)
+        if page.url not in visited and page.url not in picked:
+            picked.append(page.url)
+    # The same page reached through a fragment, query string or trailing slash
+    return peak, len({canonicalize_url(url)[1] for url in picked})
+
+def run_frontier(site, max_pages: int):
+    frontier = Frontier(BASE)
+    peak = 0
+    for page_url, anchors in site:
+        for href, text in anchors:
+            frontier.add(href, base=page_url, depth=1, anchor_text=text)
+        peak = max(peak, len(frontier))
+    picked = []
+    while frontier and len(picked) < max_pages:
+        picked.append(frontier.pop().url)
+    return peak, len({canonicalize_url(url)[1] for url in picked}), frontier.stats()
+
+def timed(function, *args, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crawl frontier")
+    parser.add_argument("--pages", type=int, default=50, help="pages whose links are queued")
+    parser.add_argument("--links", type=int, default=2000, help="links per page")
+    parser.add_argument("--max-pages", type=int, default=20, help="pages popped at the end")
+    args = parser.parse_args()
+
+    site = make_pages(args.pages, args.links)
+    total = sum(len(anchors) for _, anchors in site)
+    legacy_time, (legacy_peak, legacy_unique) = timed(run_legacy, site, args.max_pages)
+    frontier_time, (frontier_peak, frontier_unique, stats) = timed(run_frontier, site, args.max_pages)
+
+    print(f"{total} links on {args.pages} pages")
+    print(f"legacy:   {legacy_time * 1000:8.1f} ms  {total / legacy_time:10.0f} links/s  peak heap {legacy_peak}")
+    print(f"frontier: {frontier_time * 1000:8.1f} ms  {total / frontier_time:10.0f} links/s  peak heap {frontier_peak}")
+    print(f"speedup {legacy_time / frontier_time:.1f}x, "
+          f"{legacy_unique} vs {frontier_unique} distinct pages in the top {args.max_pages}")
+    print(f"frontier stats: {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+End-to-end load benchmark of /predict against local stand-ins for the
+websites (benchmarks/fake_site.py) and the model API (benchmarks/fake_openai.py).
+
+    # Start the stand-ins and the app under gunicorn, run the load, save the results
+    python benchmarks/load_test.py --spawn --requests 200 --concurrency 16 --output bench.json
+
+    # Same settings on the next release, failing if anything got >15% worse
+    python benchmarks/load_test.py --spawn --requests 200 --concurrency 16 --compare bench.json
+
+    # Or drive a server that is already running, pointed at running stand-ins
+    python benchmarks/load_test.py --target http://127.0.0.1:8000 --site-port 8100 --sites 20
+
+Reports throughput, end-to-end latency percentiles, crawl time per request,
+the per-stage breakdown from the app's /metrics (stage time and queue wait,
+page fetches by path, model calls and tokens), error and cache counts, and
+the peak RSS of the app's process tree (workers and browsers), as JSON.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.join(ROOT, "benchmarks")
+
+# Histograms whose per-label means make up the stage breakdown
+BREAKDOWN = {
+    "stages": "partner_stage_duration_seconds",
+    "stage_queues": "partner_stage_queue_seconds",
+    "page_fetches": "partner_page_fetch_duration_seconds",
+    "llm_requests": "partner_llm_request_duration_seconds",
+    "host_queue": "partner_host_queue_seconds",
+    "browser_lease_wait": "partner_browser_lease_wait_seconds",
+    "browser_launch": "partner_browser_launch_seconds",
+    "llm_parse": "partner_llm_parse_seconds",
+}
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100.0 * len(ordered)) - 1))
+    return round(ordered[index], 4)
+
+def summarize(values: List[float]) -> Dict:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": round(sum(values) / len(values), 4) if values else None,
+        "max": round(max(values), 4) if values else None,
+    }
+
+def parse_metrics(text: str) -> Dict[Tuple[str, str], float]:
+    """Prometheus text format to {(series name, labels): value}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        series, _, value = line.rpartition(" ")
+        name, _, labels = series.partition("{")
+        try:
+            samples[(name, labels.rstrip("}"))] = float(value)
+        except ValueError:
+            continue
+    return samples
+
+def label_key(labels: str) -> str:
+    """'backend="openai",kind="complete"' -> 'openai/complete'"""
+    return "/".join(re.findall(r'="([^"]*)"', labels)) or "all"
+
+def breakdown(before: Dict, after: Dict) -> Dict:
+    """Count and mean of each histogram series over the run"""
+    report = {}
+    for section, metric in BREAKDOWN.items():
+        rows = {}
+        for (name, labels), total in after.items():
+            if name != f"{metric}_count":
+                continue
+            count = total - before.get((name, labels), 0.0)
+            if count <= 0:
+                continue
+            seconds = after.get((f"{metric}_sum", labels), 0.0) - before.get((f"{metric}_sum", labels), 0.0)
+            rows[label_key(labels)] = {"count": int(count), "mean_seconds": round(seconds / count, 4)}
+        report[section] = rows
+    tokens = {}
+    for (name, labels), total in after.items():
+        if name == "partner_llm_tokens_total":
+            tokens[label_key(labels)] = int(total - before.get((name, labels), 0.0))
+    report["llm_tokens"] = tokens
+    return report
+
+class RssSampler:
+    """Peak resident memory of a process and all its descendants"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self):
+        try:
+            root = psutil.Process(self.pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        self.peak = max(self.peak, total)
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.pid:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+async def wait_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url, timeout=2)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+            await asyncio.sleep(0.5)
+
+def spawn(args, cache_dir: str) -> List[subprocess.Popen]:
+    """Start the fake sites, the fake model API and the app under gunicorn"""
+    site = [
+        sys.executable, os.path.join(BENCHMARKS, "fake_site.py"), "--port", str(args.site_port),
+        "--sites", str(args.sites), "--pages", str(args.pages), "--fanout", str(args.fanout),
+        "--latency", str(args.site_latency), "--js-rate", str(args.js_rate)
+    ] + (["--sitemap"] if args.sitemap else [])
+    llm = [
+        sys.executable, os.path.join(BENCHMARKS, "fake_openai.py"), "--port", str(args.llm_port),
+        "--latency", str(args.llm_latency), "--output-tokens", str(args.output_tokens)
+    ]
+    env = dict(
+        os.environ,
+        LLM_BASE_URL=f"http://127.0.0.1:{args.llm_port}/v1",
+        OPENAI_API_KEY="fake",
+        LLM_BACKENDS="openai",
+        LLM_RPM_LIMIT="0",
+        LLM_TPM_LIMIT="0",
+        WEB_CONCURRENCY=str(args.workers),
+        CACHE_DIR=cache_dir,
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(cache_dir, "metrics"),
+    )
+    if not args.warm_cache:
+        env.update(RESULT_CACHE_TTL="0", LLM_CACHE_MAX_AGE="0", PAGE_CACHE_MAX_BYTES="0")
+    app = [
+        sys.executable, "-m", "gunicorn", "app:app", "--workers", str(args.workers),
+        "-k", "uvicorn.workers.UvicornWorker", "--bind", f"127.0.0.1:{args.app_port}", "--log-level", "warning"
+    ]
+    log = open(os.path.join(cache_dir, "app.log"), "wb")
+    return [
+        subprocess.Popen(site, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        subprocess.Popen(llm, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        subprocess.Popen(app, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT),
+    ]
+
+async def run_load(args, target: str, app_pid: Optional[int]) -> Dict:
+    urls = [f"http://127.0.0.1:{args.site_port + index % args.sites}/" for index in range(args.requests)]
+    latencies: List[float] = []
+    crawl_seconds: List[float] = []
+    statuses: Counter = Counter()
+    cache: Counter = Counter()
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+
+    async with httpx.AsyncClient(base_url=target, timeout=args.timeout, limits=limits) as client:
+        async def predict(url: str, record: bool):
+            started = time.monotonic()
+            try:
+                response = await client.post("/predict", json={"url": url, "forceRefresh": not args.warm_cache})
+            except httpx.HTTPError as e:
+                if record:
+                    statuses[type(e).__name__] += 1
+                return
+            if not record:
+                return
+            latencies.append(time.monotonic() - started)
+            statuses[str(response.status_code)] += 1
+            cache[response.headers.get("x-cache", "none")] += 1
+            if response.status_code == 200:
+                elapsed = (response.json().get("crawlStats") or {}).get("elapsedSeconds")
+                if elapsed is not None:
+                    crawl_seconds.append(elapsed)
+
+        # Warm up browsers and connections outside the measurement
+        await asyncio.gather(*(
+            predict(f"http://127.0.0.1:{args.site_port + index % args.sites}/", False)
+            for index in range(args.warmup)
+        ))
+
+        before = parse_metrics((await client.get("/metrics")).text)
+        sampler = RssSampler(app_pid)
+        sampler.start()
+        queue: asyncio.Queue = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait(url)
+
+        async def worker():
+            while not queue.empty():
+                await predict(queue.get_nowait(), True)
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(min(args.concurrency, len(urls)))))
+        duration = time.monotonic() - started
+        sampler.sample()
+        await sampler.stop()
+        after = parse_metrics((await client.get("/metrics")).text)
+
+    ok = statuses.get("200", 0)
+    return {
+        "requests": len(urls),
+        "ok": ok,
+        "statuses": dict(statuses),
+        "cache": dict(cache),
+        "duration_seconds": round(duration, 3),
+        "throughput_rps": round(ok / duration, 3) if duration else None,
+        "latency_seconds": summarize(latencies),
+        "crawl_seconds": summarize(crawl_seconds),
+        "breakdown": breakdown(before, after),
+        "peak_rss_mb": round(sampler.peak / 1024 / 1024, 1) if sampler.peak else None,
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(result: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Regressions beyond max_regression (a fraction) against a previous run"""
+    checks = [("throughput_rps", result["throughput_rps"], baseline.get("throughput_rps"), False)]
+    for key in ("p50", "p95", "p99"):
+        checks.append((
+            f"latency {key}", result["latency_seconds"][key], baseline.get("latency_seconds", {}).get(key), True
+        ))
+    checks.append(("peak_rss_mb", result["peak_rss_mb"], baseline.get("peak_rss_mb"), True))
+    regressions = []
+    for name, current, previous, higher_is_worse in checks:
+        if not current or not previous:
+            continue
+        change = (current - previous) / previous
+        print(f"  {name:16} {previous:>10} -> {current:>10}  ({change:+.1%})")
+        if (change if higher_is_worse else -change) > max_regression:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark of /predict")
+    parser.add_argument("--spawn", action="store_true", help="start the stand-ins and the app")
+    parser.add_argument("--target", default=None, help="base URL of a running app (default: the spawned one)")
+    parser.add_argument("--pid", type=int, default=None, help="pid of a running app, for peak RSS")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests first")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds per request")
+    parser.add_argument("--warm-cache", action="store_true", help="keep the result, LLM and page caches on")
+    parser.add_argument("--app-port", type=int, default=8090)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers when spawning")
+    parser.add_argument("--site-port", type=int, default=8100)
+    parser.add_argument("--sites", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--site-latency", type=float, default=0.05)
+    parser.add_argument("--js-rate", type=float, default=0.0)
+    parser.add_argument("--sitemap", action="store_true")
+    parser.add_argument("--llm-port", type=int, default=8001)
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--output-tokens", type=int, default=600)
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="previous results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if not args.spawn and not args.target:
+        parser.error("either --spawn or --target is required")
+    target = args.target or f"http://127.0.0.1:{args.app_port}"
+
+    async def run() -> Dict:
+        processes: List[subprocess.Popen] = []
+        with tempfile.TemporaryDirectory(prefix="partner-bench-") as cache_dir:
+            try:
+                app_pid = args.pid
+                if args.spawn:
+                    processes = spawn(args, cache_dir)
+                    app_pid = processes[2].pid
+                    await wait_ready(f"http://127.0.0.1:{args.site_port}/")
+                    await wait_ready(f"http://127.0.0.1:{args.llm_port}/stats")
+                await wait_ready(f"{target}/ready")
+                return await run_load(args, target, app_pid)
+            finally:
+                for process in processes:
+                    process.terminate()
+                for process in processes:
+                    try:
+                        process.wait(timeout=15)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        **asyncio.run(run()),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} ({baseline.get('commit')}):")
+        regressions = compare(result, baseline, args.max_regression)
+        if regressions:
+            print(f"Regressions beyond {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
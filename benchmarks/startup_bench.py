@@ -0,0 +1,182 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import the app,
+and how long the app under gunicorn takes to answer /health and /ready.
+
+    # Measure and save the results
+    python benchmarks/startup_bench.py --runs 5 --output startup.json
+
+    # Same settings on the next release, failing if anything got >20% slower
+    python benchmarks/startup_bench.py --runs 5 --compare startup.json
+
+Reports the median import time with the slowest modules imported by app.py
+(from python -X importtime), the time from spawning gunicorn to the first
+200 from /health and from /ready, and the import and time-to-ready figures
+the worker that answered /ready reported itself, as JSON. The model API is
+never called during warm-up, so no stand-in is needed.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def env_for(cache_dir: str) -> Dict[str, str]:
+    return dict(
+        os.environ,
+        OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "fake"),
+        CACHE_DIR=cache_dir,
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(cache_dir, "metrics"),
+    )
+
+def measure_import(cache_dir: str) -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=env_for(cache_dir), stderr=subprocess.DEVNULL
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+def slowest_imports(cache_dir: str, count: int) -> List[Tuple[str, float]]:
+    """Modules imported directly by app.py, by cumulative import time"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, env=env_for(cache_dir), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    # importtime prints a module after its own imports, one level deeper
+    # per nesting; app's direct imports are one level below app
+    times = []
+    for line in completed.stderr.decode(errors="replace").splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) == 3:
+            times.append((match.group(4), int(match.group(2)) / 1e6))
+    times.sort(key=lambda item: -item[1])
+    return [(name, round(seconds, 3)) for name, seconds in times[:count]]
+
+def measure_server(args, cache_dir: str) -> Dict:
+    """Spawn gunicorn and time the first 200 from /health and /ready"""
+    command = [
+        sys.executable, "-m", "gunicorn", "app:app", "--workers", str(args.workers),
+        "-k", "uvicorn.workers.UvicornWorker", "--bind", f"127.0.0.1:{args.port}", "--log-level", "warning"
+    ]
+    base = f"http://127.0.0.1:{args.port}"
+    log = open(os.path.join(cache_dir, "app.log"), "wb")
+    started = time.monotonic()
+    process = subprocess.Popen(command, cwd=ROOT, env=env_for(cache_dir), stdout=log, stderr=subprocess.STDOUT)
+    health: Optional[float] = None
+    ready: Optional[float] = None
+    reported: Dict = {}
+    try:
+        with httpx.Client(base_url=base, timeout=2) as client:
+            while ready is None:
+                if process.poll() is not None:
+                    raise RuntimeError(f"gunicorn exited with {process.returncode}, see {log.name}")
+                if time.monotonic() - started > args.timeout:
+                    raise RuntimeError(f"not ready within {args.timeout:.0f}s")
+                try:
+                    if health is None and client.get("/health").status_code == 200:
+                        health = time.monotonic() - started
+                    if health is not None:
+                        response = client.get("/ready")
+                        if response.status_code == 200:
+                            ready = time.monotonic() - started
+                            reported = response.json()
+                except httpx.HTTPError:
+                    pass
+                time.sleep(args.poll_interval)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+    return {
+        "health_seconds": round(health, 3),
+        "ready_seconds": round(ready, 3),
+        "worker_import_seconds": reported.get("import_seconds"),
+        "worker_time_to_ready_seconds": reported.get("time_to_ready_seconds"),
+        "warmup_steps": reported.get("steps"),
+    }
+
+def median(values: List[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return round(statistics.median(values), 3) if values else None
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(result: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Regressions beyond max_regression (a fraction) against a previous run"""
+    regressions = []
+    for name in ("import_seconds", "health_seconds", "ready_seconds"):
+        current, previous = result.get(name), baseline.get(name)
+        if not current or not previous:
+            continue
+        change = (current - previous) / previous
+        print(f"  {name:16} {previous:>10} -> {current:>10}  ({change:+.1%})")
+        if change > max_regression:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the app")
+    parser.add_argument("--runs", type=int, default=5, help="fresh imports and server starts to take the median of")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--port", type=int, default=8095)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds a server start may take")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--top", type=int, default=10, help="slowest direct imports of app.py to list")
+    parser.add_argument("--no-server", action="store_true", help="only measure the import")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="previous results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="partner-startup-") as cache_dir:
+        imports = [measure_import(cache_dir) for _ in range(args.runs)]
+        slowest = slowest_imports(cache_dir, args.top)
+        servers = [] if args.no_server else [measure_server(args, cache_dir) for _ in range(args.runs)]
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "import_seconds": median(imports),
+        "slowest_imports": slowest,
+        "health_seconds": median([server["health_seconds"] for server in servers]),
+        "ready_seconds": median([server["ready_seconds"] for server in servers]),
+        "worker_import_seconds": median([server["worker_import_seconds"] for server in servers]),
+        "worker_time_to_ready_seconds": median([server["worker_time_to_ready_seconds"] for server in servers]),
+        "runs": servers,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} ({baseline.get('commit')}):")
+        regressions = compare(result, baseline, args.max_regression)
+        if regressions:
+            print(f"Regressions beyond {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+# Read by gunicorn from the working directory (see Procfile)
+from utils.metrics import reset_metrics_dir, mark_worker_dead
+
+def on_starting(server):
+    # Metrics files from a previous run would otherwise be summed into this one
+    reset_metrics_dir()
+
+def child_exit(server, worker):
+    mark_worker_dead(worker.pid)
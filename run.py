@@ -5,6 +5,7 @@ import signal
 from time import sleep
 import sys
 import logging
+from utils.metrics import reset_metrics_dir
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +31,7 @@ def run_server(port):
         try:
             # Kill any existing process on our port
             kill_server_on_port(port)
+            reset_metrics_dir()
             
             # Start the server
             config = uvicorn.Config(
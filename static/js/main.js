@@ -4,6 +4,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const resultDiv = document.getElementById('result');
     const errorDiv = document.getElementById('error');
     const loadingDiv = document.getElementById('loading');
+    const loadingStatus = document.getElementById('loading-status');
     
     // Score elements
     const probabilityBar = document.getElementById('probability-bar');
@@ -33,26 +34,10 @@ document.addEventListener('DOMContentLoaded', () => {
         showLoading();
 
         try {
-            console.log('Sending request for URL:', url);
-            const response = await fetch('/predict', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ url }),
-            });
-
-            const data = await response.json();
+            console.log('Submitting evaluation job for URL:', url);
+            const data = await runJob(url);
             console.log('Received response:', data);
 
-            if (!response.ok) {
-                throw new Error(data.error || data.detail || 'Failed to evaluate URL');
-            }
-
-            if (data.error) {
-                throw new Error(data.error);
-            }
-
             displayResult(data);
         } catch (error) {
             console.error('Error during evaluation:', error);
@@ -62,6 +47,88 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    // Queue an evaluation job and follow its progress until it finishes
+    async function runJob(url) {
+        const response = await fetch('/jobs', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ url }),
+        });
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || job.detail || 'Failed to evaluate URL');
+        }
+
+        await waitForJob(job);
+
+        const statusResponse = await fetch(job.statusUrl);
+        const finished = await statusResponse.json();
+        if (finished.status !== 'done') {
+            throw new Error(finished.error || 'Failed to evaluate URL');
+        }
+        return finished.result;
+    }
+
+    function waitForJob(job) {
+        return new Promise((resolve) => {
+            if (!window.EventSource) {
+                pollJob(job, resolve);
+                return;
+            }
+            const events = new EventSource(job.eventsUrl);
+            const finish = () => {
+                events.close();
+                resolve();
+            };
+            events.addEventListener('crawl_started', () => setLoadingStatus('Crawling website...'));
+            events.addEventListener('page_fetched', (e) => {
+                const data = JSON.parse(e.data);
+                setLoadingStatus(`Fetched page ${data.page} of ${data.maxPages}...`);
+            });
+            events.addEventListener('llm_started', () => setLoadingStatus('Evaluating content...'));
+            events.addEventListener('scores', (e) => {
+                // Core scores arrive before the full analysis; show them right away
+                const scores = JSON.parse(e.data);
+                updateScoreBar(scores.probability, 'probability');
+                updateScoreBar(scores.reachScore, 'reach');
+                updateScoreBar(scores.relevanceScore, 'relevance');
+                setLoadingStatus(`Partnership potential ${scores.probability}%, finishing analysis...`);
+            });
+            events.addEventListener('done', finish);
+            events.addEventListener('failed', finish);
+            events.onerror = () => {
+                // Stream dropped (e.g. by a proxy); fall back to polling
+                events.close();
+                pollJob(job, resolve);
+            };
+        });
+    }
+
+    function pollJob(job, resolve) {
+        const poll = async () => {
+            try {
+                const response = await fetch(job.statusUrl);
+                const data = await response.json();
+                if (!response.ok || data.status === 'done' || data.status === 'failed') {
+                    resolve();
+                    return;
+                }
+            } catch (error) {
+                console.error('Error polling job:', error);
+            }
+            setTimeout(poll, 2000);
+        };
+        poll();
+    }
+
+    function setLoadingStatus(message) {
+        if (loadingStatus) {
+            loadingStatus.textContent = message;
+        }
+    }
+
     function displayResult(data) {
         try {
             console.log('Displaying result:', data);
@@ -178,6 +245,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function showLoading() {
+        setLoadingStatus('Analyzing website...');
         loadingDiv.classList.remove('hidden');
         evaluateButton.disabled = true;
     }
@@ -0,0 +1,47 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the caches and metrics files of the modules under test out of the repository
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="partner-tests-"))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def fake_llm():
+    """Start benchmarks/fake_openai.py stand-ins; returns a function taking its options and returning the base URL"""
+    processes = []
+
+    def start(**options) -> str:
+        port = free_port()
+        command = [sys.executable, os.path.join(ROOT, "benchmarks", "fake_openai.py"), "--port", str(port)]
+        for name, value in options.items():
+            command += [f"--{name.replace('_', '-')}", str(value)]
+        processes.append(subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        base_url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                httpx.get(f"{base_url}/stats", timeout=1)
+                return base_url
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("fake_openai.py did not start")
+                time.sleep(0.1)
+
+    yield start
+    for process in processes:
+        process.terminate()
+        process.wait(timeout=10)
@@ -0,0 +1,63 @@
+"""
+Dropping boilerplate blocks repeated across crawled pages.
+"""
+from utils.content_dedup import dedupe_pages
+
+FOOTER = "Copyright 2024 Example Inc. All rights reserved. Privacy policy, terms of service and cookie settings."
+COOKIES = "Accept cookies"
+
+def page(url: str, *blocks: str) -> str:
+    return f"# {url}\n\n" + "\n\n".join(blocks)
+
+def test_exact_duplicate_blocks_are_dropped():
+    pages, stats = dedupe_pages([
+        page("https://example.com", COOKIES, "Welcome to our agency.", FOOTER),
+        page("https://example.com/about", COOKIES, "We were founded in 2005.", FOOTER),
+    ])
+    assert pages[0] == page("https://example.com", COOKIES, "Welcome to our agency.", FOOTER)
+    assert pages[1] == page("https://example.com/about", "We were founded in 2005.")
+    assert stats.blocks_total == 6
+    assert stats.blocks_dropped == 2
+
+def test_duplicates_match_regardless_of_case_and_whitespace():
+    pages, _ = dedupe_pages([
+        page("https://example.com", FOOTER),
+        page("https://example.com/team", "  " + FOOTER.upper().replace(" ", "\n")),
+    ])
+    assert pages[1] == "# https://example.com/team"
+
+def test_near_duplicate_blocks_are_dropped():
+    navigation = " ".join(f"Section {i} overview" for i in range(12))
+    pages, stats = dedupe_pages([
+        page("https://example.com", navigation),
+        # The same menu with the current page highlighted
+        page("https://example.com/pricing", navigation + " (current)", "Plans start at $10."),
+    ])
+    assert pages[1] == page("https://example.com/pricing", "Plans start at $10.")
+    assert stats.blocks_dropped == 1
+
+def test_short_blocks_are_only_dropped_when_identical():
+    pages, stats = dedupe_pages([
+        page("https://example.com", "Contact us today"),
+        page("https://example.com/contact", "Contact us now"),
+    ])
+    assert pages[1] == page("https://example.com/contact", "Contact us now")
+    assert stats.blocks_dropped == 0
+
+def test_page_headers_are_always_kept():
+    pages, _ = dedupe_pages([page("https://example.com", FOOTER), page("https://example.com", FOOTER)])
+    assert pages[1] == "# https://example.com"
+
+def test_bytes_saved():
+    original = [page("https://example.com", FOOTER), page("https://example.com/a", FOOTER)]
+    pages, stats = dedupe_pages(original)
+    assert stats.bytes_before == sum(len(p.encode("utf-8")) for p in original)
+    assert stats.bytes_after == sum(len(p.encode("utf-8")) for p in pages)
+    # The second footer and the blank line before it
+    assert stats.bytes_saved == len(FOOTER) + 2
+
+def test_bytes_saved_counts_encoded_bytes():
+    footer = "© 2024 Société Générale — tous droits réservés, mentions légales et politique de confidentialité."
+    _, stats = dedupe_pages([page("https://example.com", footer), page("https://example.com/a", footer)])
+    assert stats.bytes_saved == len(footer.encode("utf-8")) + 2
+    assert stats.bytes_saved > len(footer) + 2
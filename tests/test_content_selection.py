@@ -0,0 +1,60 @@
+"""
+Packing the most relevant sections of crawled content into a token budget.
+"""
+import pytest
+
+from utils import content_selection
+from utils.content_selection import PAGE_SEPARATOR, count_tokens, select_content, split_sections
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # tiktoken downloads its vocabulary on first use; the estimate is deterministic offline
+    monkeypatch.setattr(content_selection, "_encoding", None)
+    monkeypatch.setattr(content_selection, "_encoding_failed", True)
+
+def filler(word: str, count: int) -> str:
+    return " ".join(f"{word}{i}" for i in range(count))
+
+NAVIGATION = "## Menu\n\n" + " ".join(f"[Link {i}](/page-{i})" for i in range(40))
+PARTNERS = "## Partner program\n\nOur reseller and agency partner program serves 500 clients with WCAG accessibility."
+BLOG = "## Blog\n\n" + filler("lorem", 60)
+ABOUT = "## About us\n\nFounded in 2005, our team of 40 employees builds WordPress websites for customers."
+
+def site() -> str:
+    home = "# https://example.com\n\n" + "\n\n".join([NAVIGATION, BLOG, PARTNERS])
+    about = "# https://example.com/about\n\n" + "\n\n".join([BLOG.replace("lorem", "ipsum"), ABOUT])
+    return home + PAGE_SEPARATOR + about
+
+def test_content_within_budget_is_unchanged():
+    content = site()
+    assert select_content(content, count_tokens(content)) == content
+
+def test_selection_fits_the_budget():
+    content = site()
+    for budget in (60, 100, 200):
+        assert count_tokens(select_content(content, budget)) <= budget
+
+def test_relevant_sections_win_over_boilerplate():
+    selected = select_content(site(), 100)
+    assert "Partner program" in selected
+    assert "About us" in selected
+    assert "[Link 0]" not in selected
+    assert "lorem0" not in selected
+
+def test_selection_keeps_page_and_section_order():
+    selected = select_content(site(), 100)
+    # The about page's section scores higher but stays after the home page's
+    assert selected.index("Partner program") < selected.index("About us")
+    pages = selected.split(PAGE_SEPARATOR)
+    assert [page.splitlines()[0] for page in pages] == ["# https://example.com", "# https://example.com/about"]
+
+def test_oversized_sections_are_split_on_paragraphs():
+    paragraphs = [filler(f"p{n}x", 150) for n in range(4)]
+    sections = split_sections("# https://example.com\n\n## Long\n\n" + "\n\n".join(paragraphs))
+    assert len(sections) > 1
+    assert all(section.tokens <= content_selection.MAX_SECTION_TOKENS for section in sections)
+    assert all(section.page_url == "https://example.com" for section in sections)
+
+def test_falls_back_to_a_character_cut():
+    content = filler("word", 2000)
+    assert select_content(content, 50) == content[:200]
@@ -0,0 +1,79 @@
+"""
+URL canonicalization and the crawl frontier's dedup, scoring and trimming.
+"""
+from utils.frontier import Frontier
+from utils.url_validation import canonicalize_url
+
+HOME = "https://example.com/"
+
+def test_canonical_url_drops_fragment_and_query():
+    assert canonicalize_url("https://www.Example.com/About/?ref=nav#team") == (
+        "https://www.example.com/About/", "example.com/About"
+    )
+
+def test_dedup_key_ignores_scheme_www_and_trailing_slash():
+    keys = {
+        canonicalize_url(href)[1]
+        for href in ("https://example.com/about", "http://example.com/about/", "https://www.example.com/about#x")
+    }
+    assert keys == {"example.com/about"}
+
+def test_relative_links_resolve_against_the_page():
+    assert canonicalize_url("/pricing?plan=pro", "https://example.com/team/") == (
+        "https://example.com/pricing", "example.com/pricing"
+    )
+    assert canonicalize_url("../careers", "https://example.com/team/lead") == (
+        "https://example.com/careers", "example.com/careers"
+    )
+
+def test_non_page_links_are_rejected():
+    for href in ("mailto:hi@example.com", "javascript:void(0)", "ftp://example.com/file"):
+        assert canonicalize_url(href) is None
+
+def test_frontier_queues_each_page_once():
+    frontier = Frontier(HOME)
+    frontier.seed(HOME)
+    assert frontier.add("/about", base=HOME, depth=1)
+    assert not frontier.add("/about/", base=HOME, depth=1)
+    assert not frontier.add("http://www.example.com/about#team", base=HOME, depth=1)
+    # The seed's key is taken too
+    assert not frontier.add("/", base=HOME, depth=1)
+    # Repeated hrefs are answered from memory with the same counters
+    assert not frontier.add("/about", base=HOME, depth=1)
+    assert frontier.stats()["duplicates"] == 4
+    assert len(frontier) == 2
+
+def test_frontier_rejects_other_sites():
+    frontier = Frontier(HOME)
+    assert not frontier.add("https://partner.test/about", base=HOME)
+    assert not frontier.add("mailto:hi@example.com", base=HOME)
+    assert frontier.add("https://www.example.com/contact", base=HOME)
+    assert frontier.stats()["rejected"] == 2
+
+def test_frontier_pops_best_first():
+    frontier = Frontier(HOME)
+    frontier.seed(HOME)
+    frontier.add("/blog/post-1", base=HOME, depth=1)
+    frontier.add("/random", base=HOME, depth=1)
+    frontier.add("/partners", base=HOME, depth=1)
+    frontier.add("/x", base=HOME, depth=1, anchor_text="Our services")
+    order = [page.url for page in iter(frontier.pop, None)]
+    assert order == [
+        HOME,
+        "https://example.com/partners",
+        "https://example.com/x",
+        "https://example.com/blog/post-1",
+        "https://example.com/random",
+    ]
+
+def test_frontier_is_trimmed_to_the_best_urls():
+    frontier = Frontier(HOME, max_size=3)
+    frontier.add("/about", base=HOME, depth=1)
+    frontier.add("/pricing", base=HOME, depth=1)
+    for i in range(5):
+        frontier.add(f"/page-{i}", base=HOME, depth=1)
+    # Past twice max_size, the queue drops back to the max_size best
+    assert len(frontier) == 3
+    assert frontier.stats()["dropped"] == 4
+    popped = [page.url for page in iter(frontier.pop, None)]
+    assert popped[:2] == ["https://example.com/about", "https://example.com/pricing"]
@@ -0,0 +1,58 @@
+"""
+HTML to markdown conversion of server-rendered pages.
+"""
+from utils.html_markdown import html_to_markdown
+
+BASE = "https://example.com/services/"
+
+def test_headings_paragraphs_and_title():
+    document = html_to_markdown(
+        "<html><head><title> Example  Agency </title><style>p {color: red}</style></head>"
+        "<body><h1>We build websites</h1><p>For <b>agencies</b>\n and  brands.</p>"
+        "<script>var tracking = 1;</script><h2>Services</h2><p>Hosting</p></body></html>",
+        BASE
+    )
+    assert document.title == "Example Agency"
+    assert document.markdown == "# We build websites\n\nFor agencies and brands.\n\n## Services\n\nHosting"
+    assert document.words == 9
+
+def test_head_without_closing_tag_ends_at_the_body():
+    document = html_to_markdown(
+        "<html><head><title>Example</title><meta charset=utf-8>"
+        "<h1>Welcome</h1><p>Partner with us.</p>",
+        BASE
+    )
+    assert document.title == "Example"
+    assert document.markdown == "# Welcome\n\nPartner with us."
+
+def test_head_ends_at_text_without_a_body_tag():
+    document = html_to_markdown("<head><title>Example</title><link rel=stylesheet href=a.css>Hello there", BASE)
+    assert document.markdown == "Hello there"
+
+def test_links_are_resolved_and_grouped():
+    document = html_to_markdown(
+        '<p><a href="../about#team">About  us</a> <a href="https://partner.test/">Partner</a> '
+        '<a href="/about">About again</a> <a href="mailto:hi@example.com">Email</a> '
+        '<a href="#top">Top</a></p>',
+        BASE
+    )
+    assert document.markdown == (
+        "[About us](https://example.com/about) [Partner](https://partner.test/) "
+        "[About again](https://example.com/about) Email Top"
+    )
+    # Each link once, by its first anchor text
+    assert document.links == {
+        "internal": [{"href": "https://example.com/about", "text": "About us"}],
+        "external": [{"href": "https://partner.test/", "text": "Partner"}],
+    }
+
+def test_nested_lists():
+    document = html_to_markdown(
+        "<ul><li>Design</li><li>Development<ul><li>WordPress</li><li>Shopify</li></ul></li></ul><p>After</p>",
+        BASE
+    )
+    assert document.markdown == "- Design\n- Development\n  - WordPress\n  - Shopify\n\nAfter"
+
+def test_preformatted_text_keeps_its_whitespace():
+    document = html_to_markdown("<pre>line one\n    indented</pre>", BASE)
+    assert document.markdown == "line one\n    indented"
@@ -0,0 +1,46 @@
+"""
+Incremental parsing of a streamed JSON object's top-level fields.
+"""
+import json
+
+from utils.json_stream import IncrementalJSONParser
+
+DOCUMENT = {
+    "score": 7,
+    "notes": 'Says "agency-friendly", uses {braces} and [brackets], ends with \\',
+    "services": [{"name": "Hosting", "tags": ["wp", "cdn"]}, {"name": "Design"}],
+    "summary": "Ünïcode, commas, and: colons",
+    "partner": True,
+}
+
+def feed_in_chunks(text: str, size: int):
+    parser = IncrementalJSONParser()
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return parser, completed
+
+def test_fields_complete_in_order_whatever_the_chunk_size():
+    text = json.dumps(DOCUMENT, ensure_ascii=False)
+    for size in (1, 2, 7, len(text)):
+        parser, completed = feed_in_chunks(text, size)
+        assert completed == list(DOCUMENT.items())
+        assert parser.fields == DOCUMENT
+        assert parser.complete
+
+def test_field_is_returned_once_its_value_ends():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"score": 8, "notes": "still wri') == [("score", 8)]
+    assert parser.feed('ting"') == []
+    assert parser.feed(', "partner": false}') == [("notes", "still writing"), ("partner", False)]
+
+def test_text_around_the_object_is_ignored():
+    parser, completed = feed_in_chunks('Here is the evaluation:\n```json\n{"score": 5}\n```\nDone {"score": 1}', 4)
+    assert completed == [("score", 5)]
+    assert parser.fields == {"score": 5}
+
+def test_malformed_field_is_skipped():
+    parser = IncrementalJSONParser()
+    completed = parser.feed('{"score": 7, "notes": not json, "partner": true}')
+    assert completed == [("score", 7), ("partner", True)]
+    assert "notes" not in parser.fields
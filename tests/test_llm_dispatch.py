@@ -0,0 +1,175 @@
+"""
+The LLM dispatcher's rate limiting, adaptive concurrency and retries, with
+fake attempts and against the local stand-in API (benchmarks/fake_openai.py).
+"""
+import asyncio
+import time
+
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from utils.llm_dispatch import (
+    AdaptiveLimiter, DeadlineExceeded, LLMDispatcher, RateLimited, TokenBucket, TransientError, retry_delay,
+    LLM_RETRY_MAX_DELAY
+)
+from utils.llm_providers import OpenAIBackend
+
+MESSAGES = [{"role": "user", "content": "Website content"}]
+
+def dispatcher(**options) -> LLMDispatcher:
+    settings = dict(rpm=0, tpm=0, workers=1, min_concurrency=1, max_concurrency=8, max_retries=3, deadline=10)
+    settings.update(options)
+    return LLMDispatcher(**settings)
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(rate=10, capacity=2)
+
+    async def run():
+        deadline_at = time.monotonic() + 5
+        started = time.monotonic()
+        await bucket.acquire(2, deadline_at)
+        burst = time.monotonic() - started
+        await bucket.acquire(1, deadline_at)
+        return burst, time.monotonic() - started
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.05
+    # One more unit takes a tenth of a second to refill
+    assert 0.08 <= total < 0.5
+
+def test_token_bucket_refuses_waits_past_the_deadline():
+    bucket = TokenBucket(rate=1, capacity=1)
+
+    async def run():
+        await bucket.acquire(1, time.monotonic() + 5)
+        await bucket.acquire(1, time.monotonic() + 0.1)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+    # Fails up front instead of sleeping until the deadline
+    assert time.monotonic() - started < 0.1
+
+def test_token_bucket_adjust_corrects_estimates():
+    bucket = TokenBucket(rate=0.001, capacity=100)
+    asyncio.run(bucket.acquire(60, time.monotonic() + 1))
+    assert bucket.level == pytest.approx(40, abs=0.1)
+    # The call used 20 tokens fewer than estimated
+    bucket.adjust(-20)
+    assert bucket.level == pytest.approx(60, abs=0.1)
+    # Overdrafts go negative for later callers to wait off
+    bucket.adjust(100)
+    assert bucket.level == pytest.approx(-40, abs=0.1)
+
+def test_adaptive_limiter_halves_once_per_cooldown():
+    limiter = AdaptiveLimiter(minimum=1, maximum=8, cooldown=60)
+    assert limiter.limit == 4
+
+    async def run():
+        for _ in range(3):
+            await limiter.acquire(time.monotonic() + 1)
+            await limiter.release(throttled=True)
+
+    asyncio.run(run())
+    # A burst of 429s counts as one decrease
+    assert limiter.limit == 2
+    assert limiter.in_flight == 0
+
+def test_adaptive_limiter_grows_additively():
+    limiter = AdaptiveLimiter(minimum=1, maximum=8)
+    limiter.limit = 2.0
+
+    async def run():
+        for _ in range(2):
+            await limiter.acquire(time.monotonic() + 1)
+            await limiter.release()
+
+    asyncio.run(run())
+    # 1/limit per success: about one more slot per window of limit calls
+    assert int(limiter.limit) == 2
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+
+def test_adaptive_limiter_bounds_concurrency():
+    limiter = AdaptiveLimiter(minimum=1, maximum=1)
+
+    async def run():
+        await limiter.acquire(time.monotonic() + 1)
+        await limiter.acquire(time.monotonic() + 0.1)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+
+def test_run_retries_rate_limits_after_retry_after():
+    gate = dispatcher()
+    calls = []
+
+    async def attempt():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise RateLimited("429", retry_after=0.1)
+        return "ok"
+
+    assert asyncio.run(gate.run(attempt, 10)) == "ok"
+    assert gate.retries == 2
+    assert gate.throttled == 2
+    assert gate.failures == 0
+    # Retry-After is honored between attempts
+    assert calls[1] - calls[0] >= 0.09
+    # Halved once for both 429s (4 -> 2), then one success's worth of growth
+    assert gate.concurrency.limit == pytest.approx(2 + 1 / 2)
+
+def test_run_stops_retrying_at_the_deadline():
+    gate = dispatcher(max_retries=100, deadline=0.5)
+
+    async def attempt():
+        raise TransientError("overloaded")
+
+    started = time.monotonic()
+    with pytest.raises((TransientError, DeadlineExceeded, asyncio.TimeoutError)):
+        asyncio.run(gate.run(attempt, 10))
+    assert time.monotonic() - started < 0.6
+    assert gate.failures == 1
+
+def test_run_times_out_a_hung_attempt():
+    gate = dispatcher(max_retries=0, deadline=0.2)
+
+    async def attempt():
+        await asyncio.sleep(5)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(gate.run(attempt, 10))
+    assert gate.concurrency.in_flight == 0
+
+def test_run_does_not_retry_other_errors():
+    gate = dispatcher()
+
+    async def attempt():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(gate.run(attempt, 10))
+    assert gate.calls == 1
+    assert gate.retries == 0
+    assert gate.failures == 1
+
+def test_stand_in_429_throttles_the_dispatcher(fake_llm):
+    base_url = fake_llm(latency=0.05, rpm=1)
+    client = AsyncOpenAI(api_key="fake", base_url=f"{base_url}/v1", max_retries=0)
+    backend = OpenAIBackend(client, "gpt-4", "none", 0.5, dispatcher(max_retries=0))
+
+    async def run():
+        await backend.complete(MESSAGES)
+        try:
+            await backend.complete(MESSAGES)
+        finally:
+            await client.close()
+
+    with pytest.raises(openai.RateLimitError) as error:
+        asyncio.run(run())
+    gate = backend.dispatcher
+    assert gate.throttled == 1
+    # One success (4 -> 4.25), then halved on the 429
+    assert gate.concurrency.limit == pytest.approx((4 + 1 / 4) / 2)
+    # The stand-in's Retry-After (the rest of its minute) is read from the response, capped
+    assert retry_delay(0, error.value) == min(LLM_RETRY_MAX_DELAY, float(error.value.response.headers["retry-after"]))
@@ -0,0 +1,115 @@
+"""
+Hedging and failover of the LLM Router against local stand-in providers
+(benchmarks/fake_openai.py) with injected latency and errors.
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from utils import llm_providers
+from utils.llm_dispatch import LLMDispatcher, Superseded
+from utils.llm_providers import AnthropicBackend, OpenAIBackend, Router
+
+MESSAGES = [
+    {"role": "system", "content": "Evaluate partners."},
+    {"role": "user", "content": "Website content"},
+]
+
+def dispatcher() -> LLMDispatcher:
+    return LLMDispatcher(rpm=0, tpm=0, workers=1, max_retries=0, deadline=30)
+
+def make_router(primary_url: str, backup_url: str) -> Router:
+    """OpenAI-compatible primary, Anthropic-compatible backup"""
+    client = AsyncOpenAI(api_key="fake", base_url=f"{primary_url}/v1", max_retries=0)
+    primary = OpenAIBackend(client, "gpt-4", "none", 0.5, dispatcher())
+    backup = AnthropicBackend("fake", "claude", backup_url, 0.5, dispatcher())
+    return Router([primary, backup], hedge=True)
+
+def requests_served(base_url: str) -> int:
+    return httpx.get(f"{base_url}/stats").json()["requests"]
+
+@pytest.fixture(autouse=True)
+def short_hedge_delay(monkeypatch):
+    # Hedge after 0.3s until enough latencies are recorded for a p90
+    monkeypatch.setattr(llm_providers, "LLM_HEDGE_DEFAULT_DELAY", 0.3)
+
+def test_slow_primary_is_hedged_and_cancelled(fake_llm):
+    slow, fast = fake_llm(latency=0.2, slow_rate=1, slow_latency=5), fake_llm(latency=0.2)
+    router = make_router(slow, fast)
+
+    async def run():
+        started = time.monotonic()
+        text, _ = await router.complete(MESSAGES)
+        elapsed = time.monotonic() - started
+        await router.close()
+        return text, elapsed
+
+    text, elapsed = asyncio.run(run())
+    assert json.loads(text)["probability"] == 72
+    # The backup's answer arrived first, and the primary wasn't waited for
+    assert elapsed < 2
+    assert router.hedges == 1
+    assert router.wins == {"openai": 0, "anthropic": 1}
+    primary = router.backends[0].dispatcher
+    assert primary.calls == 1
+    assert primary.failures == 0
+    assert primary.concurrency.in_flight == 0
+
+def test_stream_race_goes_to_first_field(fake_llm):
+    slow, fast = fake_llm(latency=0.2, slow_rate=1, slow_latency=5), fake_llm(latency=0.2)
+    router = make_router(slow, fast)
+    fields = []
+
+    async def run():
+        result = await router.stream(MESSAGES, lambda key, value: fields.append(key))
+        await router.close()
+        return result
+
+    _, parsed, _ = asyncio.run(run())
+    assert parsed is not None and parsed["probability"] == 72
+    # Every field came from the winner, once
+    assert len(fields) == len(set(fields)) == len(parsed)
+    assert router.wins == {"openai": 0, "anthropic": 1}
+    assert router.backends[0].dispatcher.failures == 0
+
+def test_fast_primary_is_not_hedged(fake_llm):
+    primary, backup = fake_llm(latency=0.05), fake_llm(latency=0.05)
+    router = make_router(primary, backup)
+
+    async def run():
+        await router.complete(MESSAGES)
+        await router.close()
+
+    asyncio.run(run())
+    assert router.hedges == 0
+    assert router.wins == {"openai": 1, "anthropic": 0}
+    assert requests_served(backup) == 0
+
+def test_failing_primary_fails_over(fake_llm):
+    failing, backup = fake_llm(latency=0.05, error_rate=1), fake_llm(latency=0.05)
+    router = make_router(failing, backup)
+
+    async def run():
+        text, _ = await router.complete(MESSAGES)
+        await router.close()
+        return text
+
+    assert json.loads(asyncio.run(run()))["probability"] == 72
+    assert router.failovers == 1
+    assert router.wins == {"openai": 0, "anthropic": 1}
+    assert router.backends[0].dispatcher.failures == 1
+
+def test_superseded_call_is_not_a_failure():
+    gate = dispatcher()
+
+    async def attempt():
+        raise Superseded()
+
+    with pytest.raises(Superseded):
+        asyncio.run(gate.run(attempt, 10))
+    assert gate.calls == 1
+    assert gate.failures == 0
@@ -0,0 +1,203 @@
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Deque, Dict, List, Optional
+import psutil
+from utils.sqlite_store import CACHE_DIR
+from utils.metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS, ADMISSION_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Host-wide admission control for crawls, so a burst of requests can't launch
+# more browsers than the box has memory for. Each crawl holds one of
+# ADMISSION_MAX_CRAWLS slots, lock files under ADMISSION_LOCK_DIR that every
+# gunicorn worker flock()s; the kernel releases the slots of a worker that
+# dies. No crawl starts while memory use is above ADMISSION_MEMORY_HIGH_WATER
+# percent. A crawl that can't start waits in its worker's queue, which holds
+# at most ADMISSION_QUEUE_SIZE crawls for up to ADMISSION_QUEUE_TIMEOUT
+# seconds; beyond that requests get a 503 with Retry-After. Crawls of
+# accepted batches and jobs wait in a separate, unbounded background queue
+# that only gets a slot when no interactive crawl is waiting.
+ADMISSION_MAX_CRAWLS = int(os.getenv("ADMISSION_MAX_CRAWLS", "8"))
+ADMISSION_MEMORY_HIGH_WATER = float(os.getenv("ADMISSION_MEMORY_HIGH_WATER", "90"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "10"))
+ADMISSION_LOCK_DIR = os.getenv("ADMISSION_LOCK_DIR", str(CACHE_DIR / "admission"))
+
+# How often a waiting crawl retries the slots and the memory check
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+class AdmissionRejected(Exception):
+    """A crawl was shed; reason is "memory", "queue_full" or "timeout" """
+
+    def __init__(self, reason: str, retry_after: int = ADMISSION_RETRY_AFTER):
+        super().__init__(f"Crawl not admitted: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+def memory_percent() -> float:
+    return psutil.virtual_memory().percent
+
+class CrawlAdmission:
+    """Cross-process crawl slots with bounded interactive and unbounded background wait queues per worker"""
+
+    def __init__(
+        self,
+        max_crawls: int = ADMISSION_MAX_CRAWLS,
+        memory_high_water: float = ADMISSION_MEMORY_HIGH_WATER,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        lock_dir: str = ADMISSION_LOCK_DIR
+    ):
+        self.max_crawls = max_crawls
+        self.memory_high_water = memory_high_water
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.lock_dir = Path(lock_dir)
+        self.active = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"memory": 0, "queue_full": 0, "timeout": 0}
+        self.wait_total = 0.0
+        self._fds: List[int] = []
+        self._held: List[bool] = []
+        self._pid: Optional[int] = None
+        self._queue: Deque[object] = deque()
+        self._background: Deque[object] = deque()
+
+    def _slot_fds(self) -> List[int]:
+        # Opened per process: a flock is shared by every copy of a descriptor,
+        # so descriptors inherited across a fork would share its slots
+        if self._pid != os.getpid():
+            self.lock_dir.mkdir(parents=True, exist_ok=True)
+            self._fds = [
+                os.open(str(self.lock_dir / f"slot-{index}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                for index in range(self.max_crawls)
+            ]
+            self._held = [False] * self.max_crawls
+            self._pid = os.getpid()
+        return self._fds
+
+    def _try_acquire(self) -> Optional[int]:
+        """Lock a free slot without blocking; returns its index"""
+        if self.max_crawls <= 0:
+            return -1
+        fds = self._slot_fds()
+        # Start at a per-process offset so workers don't all contend for slot 0
+        start = os.getpid() % len(fds)
+        for offset in range(len(fds)):
+            index = (start + offset) % len(fds)
+            if self._held[index]:
+                continue
+            try:
+                fcntl.flock(fds[index], fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            self._held[index] = True
+            return index
+        return None
+
+    def _release(self, index: int):
+        if index >= 0:
+            fcntl.flock(self._fds[index], fcntl.LOCK_UN)
+            self._held[index] = False
+
+    def _over_memory(self) -> bool:
+        return self.memory_high_water > 0 and memory_percent() >= self.memory_high_water
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        logger.warning(
+            f"Shedding crawl ({reason}): {self.active} active, "
+            f"{len(self._queue)} waiting, {len(self._background)} in background"
+        )
+        raise AdmissionRejected(reason)
+
+    def check(self):
+        """
+        Raise AdmissionRejected if a new crawl would be shed right now, so
+        endpoints that reply before crawling can refuse work up front.
+        """
+        if self._over_memory():
+            self._reject("memory")
+        if len(self._queue) >= self.queue_size:
+            self._reject("queue_full")
+
+    async def _wait_for_slot(self, shed: bool) -> int:
+        deadline = time.monotonic() + self.queue_timeout
+        ticket = object()
+        # This worker's waiters take slots in arrival order: only the head of
+        # a queue polls the slots and the memory check, and the background
+        # queue only while no interactive crawl is waiting
+        queue = self._queue if shed else self._background
+        queue.append(ticket)
+        try:
+            interval = POLL_INTERVAL
+            while True:
+                turn = queue[0] is ticket and (shed or not self._queue)
+                if turn and not self._over_memory():
+                    index = self._try_acquire()
+                    if index is not None:
+                        return index
+                if shed and time.monotonic() >= deadline:
+                    self._reject("timeout")
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+        finally:
+            queue.remove(ticket)
+
+    @asynccontextmanager
+    async def slot(self, shed: bool = True) -> AsyncIterator[None]:
+        """
+        Hold a crawl slot for the duration of the block.
+
+        With shed, raises AdmissionRejected when memory is over the high-water
+        mark, the wait queue is full or no slot frees up within the queue
+        timeout. Without it (background jobs and batches, which are already
+        accepted) the crawl waits as long as it takes, behind any interactive
+        crawls, and doesn't count towards the queue limit.
+        """
+        queued = time.monotonic()
+        index = None
+        if shed:
+            self.check()
+        waiting = self._queue if shed else self._queue or self._background
+        if not waiting and not self._over_memory():
+            index = self._try_acquire()
+        if index is None:
+            with ADMISSION_QUEUE_DEPTH.track_inprogress():
+                index = await self._wait_for_slot(shed)
+        waited = time.monotonic() - queued
+        self.admitted += 1
+        self.wait_total += waited
+        ADMISSION_WAIT.observe(waited)
+        self.active += 1
+        try:
+            with ADMISSION_ACTIVE.track_inprogress():
+                yield
+        finally:
+            self.active -= 1
+            self._release(index)
+
+    def stats(self) -> Dict:
+        return {
+            "max_crawls": self.max_crawls,
+            "active": self.active,
+            "waiting": len(self._queue),
+            "waiting_background": len(self._background),
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_wait": round(self.wait_total / self.admitted, 3) if self.admitted else 0.0,
+            "memory_percent": memory_percent(),
+            "memory_high_water": self.memory_high_water
+        }
+
+crawl_admission = CrawlAdmission()
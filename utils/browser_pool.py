@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+from utils.metrics import BROWSER_LAUNCH_DURATION, BROWSER_LEASE_WAIT
+
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing is per process, so with gunicorn the host-wide browser count is
+# CRAWLER_POOL_SIZE * number of workers.
+CRAWLER_POOL_SIZE = int(os.getenv("CRAWLER_POOL_SIZE", "2"))
+CRAWLER_MAX_PAGES_PER_BROWSER = int(os.getenv("CRAWLER_MAX_PAGES_PER_BROWSER", "50"))
+CRAWLER_LEASE_TIMEOUT = float(os.getenv("CRAWLER_LEASE_TIMEOUT", "60"))
+
+def load_crawl4ai():
+    """
+    Import crawl4ai, which pulls in Playwright and takes seconds, on first
+    use instead of when the server starts. Warm-up calls this in a thread.
+    """
+    import crawl4ai
+    return crawl4ai
+
+@dataclass
+class PooledCrawler:
+    slot: int
+    crawler: Optional["AsyncWebCrawler"] = None
+    pages_served: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+class CrawlerPool:
+    """
+    Fixed-size pool of warm AsyncWebCrawler instances.
+
+    Crawlers are leased one page at a time, health-checked before each lease,
+    and recycled after serving max_pages_per_browser pages or after a crash.
+    """
+
+    def __init__(
+        self,
+        size: int = CRAWLER_POOL_SIZE,
+        max_pages_per_browser: int = CRAWLER_MAX_PAGES_PER_BROWSER,
+        lease_timeout: float = CRAWLER_LEASE_TIMEOUT,
+        browser_config: Optional["BrowserConfig"] = None
+    ):
+        self.size = max(1, size)
+        self.max_pages_per_browser = max_pages_per_browser
+        self.lease_timeout = lease_timeout
+        self.browser_config = browser_config
+        self._slots: List[PooledCrawler] = [PooledCrawler(slot=i) for i in range(self.size)]
+        self._idle: Optional[asyncio.Queue] = None
+        self._closed = False
+
+        # Counters exposed through stats()
+        self.leases = 0
+        self.lease_wait_total = 0.0
+        self.lease_wait_max = 0.0
+        self.launches = 0
+        self.recycles = 0
+        self.crashes = 0
+
+    def _idle_queue(self) -> asyncio.Queue:
+        # Created lazily so the queue binds to the running event loop
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for slot in self._slots:
+                self._idle.put_nowait(slot)
+        return self._idle
+
+    async def _launch(self, slot: PooledCrawler):
+        crawl4ai = load_crawl4ai()
+        if self.browser_config is None:
+            self.browser_config = crawl4ai.BrowserConfig(headless=True, verbose=False)
+        started = time.monotonic()
+        crawler = crawl4ai.AsyncWebCrawler(config=self.browser_config)
+        await crawler.start()
+        BROWSER_LAUNCH_DURATION.observe(time.monotonic() - started)
+        slot.crawler = crawler
+        slot.pages_served = 0
+        slot.started_at = time.monotonic()
+        self.launches += 1
+        logger.info(f"Crawler pool slot {slot.slot}: browser launched")
+
+    async def _shutdown(self, slot: PooledCrawler):
+        crawler, slot.crawler = slot.crawler, None
+        if crawler is None:
+            return
+        try:
+            await crawler.close()
+        except Exception as e:
+            logger.warning(f"Crawler pool slot {slot.slot}: error closing browser: {str(e)}")
+
+    async def _recycle(self, slot: PooledCrawler, reason: str):
+        logger.info(f"Crawler pool slot {slot.slot}: recycling browser ({reason})")
+        self.recycles += 1
+        await self._shutdown(slot)
+
+    @staticmethod
+    def _is_healthy(crawler: "AsyncWebCrawler") -> bool:
+        """Best-effort check that the underlying Playwright browser is still connected"""
+        if not getattr(crawler, "ready", True):
+            return False
+        strategy = getattr(crawler, "crawler_strategy", None)
+        manager = getattr(strategy, "browser_manager", None)
+        browser = getattr(manager, "browser", None)
+        if browser is not None and hasattr(browser, "is_connected"):
+            return browser.is_connected()
+        return True
+
+    async def start(self) -> int:
+        """
+        Launch every browser up front so the first requests don't pay for it.
+        Returns the number of browsers running; raises RuntimeError if none
+        could be launched (slots that failed launch on their first lease).
+        """
+        queue = self._idle_queue()
+        slots = [queue.get_nowait() for _ in range(queue.qsize())]
+        errors = []
+        try:
+            results = await asyncio.gather(
+                *(self._launch(slot) for slot in slots if slot.crawler is None),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to warm crawler pool browser: {str(result)}")
+                    errors.append(result)
+        finally:
+            for slot in slots:
+                queue.put_nowait(slot)
+        running = sum(1 for slot in self._slots if slot.crawler is not None)
+        if not running:
+            raise RuntimeError(f"No crawler pool browser could be launched: {str(errors[0]) if errors else 'no slots'}")
+        if running < self.size:
+            logger.warning(f"Crawler pool started with {running} of {self.size} browser(s)")
+        else:
+            logger.info(f"Crawler pool started with {running} browser(s)")
+        return running
+
+    async def close(self):
+        """Close every browser; in-use crawlers are closed when released"""
+        self._closed = True
+        if self._idle is None:
+            return
+        slots = []
+        while not self._idle.empty():
+            slots.append(self._idle.get_nowait())
+        await asyncio.gather(*(self._shutdown(slot) for slot in slots))
+        logger.info("Crawler pool closed")
+
+    @asynccontextmanager
+    async def lease(self, timeout: Optional[float] = None) -> AsyncIterator["AsyncWebCrawler"]:
+        """
+        Lease a warm crawler for a single page fetch.
+
+        Raises asyncio.TimeoutError if no crawler becomes free within timeout.
+        """
+        if self._closed:
+            raise RuntimeError("Crawler pool is closed")
+
+        queue = self._idle_queue()
+        wait_started = time.monotonic()
+        slot = await asyncio.wait_for(queue.get(), timeout=timeout or self.lease_timeout)
+        waited = time.monotonic() - wait_started
+        self.leases += 1
+        self.lease_wait_total += waited
+        self.lease_wait_max = max(self.lease_wait_max, waited)
+        BROWSER_LEASE_WAIT.observe(waited)
+
+        try:
+            if slot.crawler is not None and not self._is_healthy(slot.crawler):
+                self.crashes += 1
+                await self._recycle(slot, "failed health check")
+            if slot.crawler is None:
+                await self._launch(slot)
+
+            try:
+                yield slot.crawler
+            except Exception:
+                if slot.crawler is not None and not self._is_healthy(slot.crawler):
+                    self.crashes += 1
+                    await self._recycle(slot, "browser crashed")
+                raise
+            finally:
+                slot.pages_served += 1
+
+            if slot.crawler is not None and slot.pages_served >= self.max_pages_per_browser:
+                await self._recycle(slot, f"served {slot.pages_served} pages")
+        finally:
+            if self._closed:
+                await self._shutdown(slot)
+            queue.put_nowait(slot)
+
+    def stats(self) -> Dict:
+        idle = self._idle.qsize() if self._idle is not None else self.size
+        return {
+            "pool_size": self.size,
+            "idle": idle,
+            "in_use": self.size - idle,
+            "browsers_running": sum(1 for slot in self._slots if slot.crawler is not None),
+            "max_pages_per_browser": self.max_pages_per_browser,
+            "leases": self.leases,
+            "lease_wait_avg_seconds": round(self.lease_wait_total / self.leases, 4) if self.leases else 0.0,
+            "lease_wait_max_seconds": round(self.lease_wait_max, 4),
+            "launches": self.launches,
+            "recycles": self.recycles,
+            "crashes": self.crashes
+        }
+
+_pool: Optional[CrawlerPool] = None
+
+def get_crawler_pool() -> CrawlerPool:
+    """Return the process-wide crawler pool, creating it on first use"""
+    global _pool
+    if _pool is None or _pool._closed:
+        _pool = CrawlerPool()
+    return _pool
+
+async def start_crawler_pool() -> CrawlerPool:
+    pool = get_crawler_pool()
+    await pool.start()
+    return pool
+
+async def close_crawler_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
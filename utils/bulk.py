@@ -0,0 +1,458 @@
+"""
+Offline evaluation of large domain lists.
+
+    python -m utils.bulk domains.csv results.jsonl --workers 4 --llm-concurrency 8
+
+Input is a CSV file (a url, domain, website or site column, or the first
+column) or a JSONL file of URLs or {"url": ...} objects, read as a stream.
+Sites are crawled by a pool of worker processes, each with its own browser
+pool, and the crawled content is evaluated in this process within the LLM
+rate limits (LLM_RPM_LIMIT/LLM_TPM_LIMIT, or --llm-rpm/--llm-tpm).
+
+Results are appended to a JSONL file, one line per URL in the format of
+/predict/batch, or written to a directory of Parquet files (needs pyarrow).
+Finished URLs are recorded in a checkpoint next to the output once their
+results are written, so rerunning the same command after a crash or Ctrl-C
+continues with the URLs that are left.
+"""
+import argparse
+import asyncio
+import atexit
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from utils.sqlite_store import SQLiteStore
+from utils.url_validation import normalize_url, validate_url
+from utils.browser_pool import close_crawler_pool
+from utils.crawl4ai_integration import crawl_site, close_http_client, CRAWL_DEADLINE, CRAWL_CONTENT_BUDGET
+from utils.content_selection import CONTENT_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+URL_FIELDS = ("url", "domain", "website", "site")
+
+def read_input(path: str, column: Optional[str] = None) -> Iterator[str]:
+    """Stream the URLs of a CSV or JSONL file, in file order"""
+    fields = (column,) if column else URL_FIELDS
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if isinstance(item, dict):
+                    item = next((item[name] for name in fields if item.get(name)), "")
+                yield str(item).strip()
+            return
+
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        names = [name.strip().lower() for name in header]
+        index = next((names.index(name.lower()) for name in fields if name.lower() in names), None)
+        if index is None:
+            if column:
+                raise ValueError(f"No column named {column} in {path}")
+            # No recognised header: the first column holds the URLs, maybe from the first row
+            index = 0
+            if header and validate_url(header[0].strip()):
+                yield header[0].strip()
+        for row in reader:
+            yield row[index].strip() if len(row) > index else ""
+
+def item_key(index: int, url: str) -> str:
+    """Checkpoint key: the normalized URL, or the row for input that isn't one"""
+    return normalize_url(url) if validate_url(url) else f"row:{index}"
+
+class BulkCheckpoint(SQLiteStore):
+    """Keys of the input rows whose results have been written"""
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS finished (
+                key TEXT PRIMARY KEY,
+                failed INTEGER NOT NULL,
+                finished_at REAL NOT NULL
+            )
+        """)
+
+    def finished_keys(self, include_failed: bool = True) -> Set[str]:
+        with self._connect() as conn:
+            query = "SELECT key FROM finished" + ("" if include_failed else " WHERE failed = 0")
+            return {row[0] for row in conn.execute(query)}
+
+    def mark(self, keys: List[Tuple[str, bool]]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO finished (key, failed, finished_at) VALUES (?, ?, ?)",
+                [(key, int(failed), now) for key, failed in keys]
+            )
+
+class JSONLWriter:
+    """Appends result lines to a JSONL file"""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, lines: List[Dict]):
+        self.file.write("".join(json.dumps(line) + "\n" for line in lines))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+class ParquetWriter:
+    """
+    Writes each flush of results as a new part-NNNNN.parquet file in a
+    directory. The scores are columns; the full result is kept as JSON.
+    """
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pa, pq
+        self.schema = pa.schema([
+            ("index", pa.int64()),
+            ("url", pa.string()),
+            ("status", pa.int64()),
+            ("error", pa.string()),
+            ("tier", pa.string()),
+            ("probability", pa.int64()),
+            ("reachScore", pa.int64()),
+            ("relevanceScore", pa.int64()),
+            ("result", pa.string())
+        ])
+        self.directory = Path(path)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        parts = [int(p.stem.split("-")[1]) for p in self.directory.glob("part-*.parquet")]
+        self.part = max(parts, default=0)
+
+    def write(self, lines: List[Dict]):
+        rows = []
+        for line in lines:
+            result = line.get("result") or {}
+            rows.append({
+                "index": line["index"],
+                "url": line["url"],
+                "status": line.get("status", 200),
+                "error": line.get("error"),
+                "tier": result.get("tier"),
+                "probability": result.get("probability"),
+                "reachScore": result.get("reachScore"),
+                "relevanceScore": result.get("relevanceScore"),
+                "result": json.dumps(result) if result else None
+            })
+        self.part += 1
+        # Written under a temporary name so a crash never leaves a truncated part
+        path = self.directory / f"part-{self.part:05d}.parquet"
+        temporary = path.with_suffix(".tmp")
+        self.pq.write_table(self.pa.Table.from_pylist(rows, schema=self.schema), temporary)
+        os.replace(temporary, path)
+
+    def close(self):
+        pass
+
+# Each crawl worker process keeps one event loop for its lifetime, so its
+# browser pool and HTTP client stay warm from one site to the next.
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _init_worker():
+    global _worker_loop
+    # Ctrl-C is handled by the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    atexit.register(_close_worker)
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), daemon=True).start()
+
+def _exit_with_parent(parent: int):
+    # A worker orphaned by a killed parent would otherwise keep its browsers running
+    while os.getppid() == parent:
+        time.sleep(2)
+    os._exit(1)
+
+def _close_worker():
+    try:
+        _worker_loop.run_until_complete(close_crawler_pool())
+        _worker_loop.run_until_complete(close_http_client())
+    except Exception as e:
+        logger.error(f"Failed to close crawl worker: {str(e)}")
+
+def crawl_in_worker(url: str, deadline: float, content_budget: int) -> Dict:
+    """Crawl one site in a worker process; returns its content and crawlStats, or an error"""
+    try:
+        report = _worker_loop.run_until_complete(
+            crawl_site(url, deadline=deadline, content_budget=content_budget)
+        )
+    except Exception as e:
+        return {"status": 500, "error": f"Failed to scrape website: {str(e)}"}
+    if not report.content:
+        if report.stop_reason == "deadline":
+            return {"status": 504, "error": "Timeout while scraping website", "crawlStats": report.stats()}
+        return {"status": 500, "error": "Failed to retrieve content from website", "crawlStats": report.stats()}
+    return {"content": report.content, "crawlStats": report.stats()}
+
+class CrawlWorkers:
+    """Process pool of crawl workers that replaces itself if a worker dies"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.restarts = 0
+        self._executor = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked: browsers and event loops don't survive a fork
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+
+    async def crawl(self, url: str, deadline: float, content_budget: int) -> Dict:
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(executor, crawl_in_worker, url, deadline, content_budget)
+            except BrokenProcessPool:
+                # A worker was killed (a browser crash or the OOM killer); every
+                # crawl in flight fails with it, so each gets one more try
+                if executor is self._executor:
+                    logger.error(f"Crawl worker died while crawling {url}, restarting the pool")
+                    self.restarts += 1
+                    executor.shutdown(wait=False)
+                    self._executor = self._start()
+        return {"status": 500, "error": "Crawl worker died"}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+class Progress:
+    """Counts for the live progress line; throughput is measured over the last minute"""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.done = 0
+        self.failed = 0
+        self.crawling = 0
+        self.evaluating = 0
+        self.started = time.monotonic()
+        self._finished: deque = deque()
+
+    def finish(self, failed: bool):
+        self.done += 1
+        self.failed += int(failed)
+        self._finished.append(time.monotonic())
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        while self._finished and now - self._finished[0] > 60:
+            self._finished.popleft()
+        window = min(60.0, now - self.started)
+        return len(self._finished) / window if window > 0 else 0.0
+
+    def line(self) -> str:
+        rate = self.rate()
+        remaining = self.total - self.done
+        eta = format_duration(remaining / rate) if rate > 0 else "--"
+        return (
+            f"{self.done}/{self.total} done ({self.failed} failed, {self.skipped} already finished) "
+            f"{rate * 60:.1f}/min ETA {eta} | crawling {self.crawling}, evaluating {self.evaluating}"
+        )
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+async def run(args: argparse.Namespace):
+    # This process makes every model call of the run, so it gets the whole
+    # rate limit instead of one gunicorn worker's share. The LLM modules read
+    # these at import time.
+    os.environ["WEB_CONCURRENCY"] = "1"
+    if args.llm_rpm:
+        os.environ["LLM_RPM_LIMIT"] = str(args.llm_rpm)
+    if args.llm_tpm:
+        os.environ["LLM_TPM_LIMIT"] = str(args.llm_tpm)
+    from utils.llm_integration import evaluate_partner, get_router, close_router
+    try:
+        # Fail before the first crawl rather than on every URL
+        get_router()
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    checkpoint = BulkCheckpoint(args.checkpoint or f"{args.output}.checkpoint")
+    finished = checkpoint.finished_keys(include_failed=not args.retry_failed)
+
+    # A first pass over the input for the totals behind the ETA
+    seen: Set[str] = set()
+    total = skipped = 0
+    for index, url in enumerate(read_input(args.input, args.column)):
+        key = item_key(index, url)
+        if key in seen:
+            continue
+        seen.add(key)
+        if key in finished:
+            skipped += 1
+        else:
+            total += 1
+    progress = Progress(total, skipped)
+    print(f"{total} URLs to evaluate, {skipped} already finished", file=sys.stderr)
+    if not total:
+        return
+
+    writer = ParquetWriter(args.output) if output_format == "parquet" else JSONLWriter(args.output)
+    workers = CrawlWorkers(args.workers)
+    crawl_slots = asyncio.Semaphore(args.workers)
+    llm_slots = asyncio.Semaphore(args.llm_concurrency)
+    # Bounds the URLs in flight, and so the crawled content held in memory
+    # while it waits for the LLM stage
+    admission = asyncio.Semaphore(2 * args.workers + args.llm_concurrency)
+    pending: List[Tuple[str, Dict]] = []
+    flush_lock = asyncio.Lock()
+    tasks: Set[asyncio.Task] = set()
+
+    async def flush():
+        async with flush_lock:
+            if not pending:
+                return
+            batch = pending[:]
+            del pending[:]
+            # Results first, then the checkpoint: a crash in between repeats
+            # a batch on the next run rather than losing it
+            await asyncio.to_thread(writer.write, [line for _, line in batch])
+            await asyncio.to_thread(checkpoint.mark, [(key, "error" in line) for key, line in batch])
+
+    async def evaluate(index: int, url: str) -> Dict:
+        line: Dict = {"index": index, "url": url}
+        if not validate_url(url):
+            line.update(status=400, error="Invalid URL format" if url else "URL is required")
+            return line
+        async with crawl_slots:
+            progress.crawling += 1
+            try:
+                crawled = await workers.crawl(url, args.deadline, args.content_budget)
+            finally:
+                progress.crawling -= 1
+        if "error" in crawled:
+            line.update(crawled)
+            return line
+        async with llm_slots:
+            progress.evaluating += 1
+            try:
+                result = await evaluate_partner(crawled["content"], token_budget=args.token_budget)
+            except Exception as e:
+                logger.error(f"LLM evaluation error for {url}: {str(e)}")
+                line.update(status=500, error=f"Failed to evaluate content: {str(e)}")
+                return line
+            finally:
+                progress.evaluating -= 1
+        result["tier"] = "llm"
+        result["crawlStats"] = crawled["crawlStats"]
+        line["result"] = result
+        return line
+
+    async def process(index: int, url: str, key: str):
+        try:
+            line = await evaluate(index, url)
+        except Exception as e:
+            # One URL's unexpected error (a result that won't pickle, a bug)
+            # fails that URL, not the run
+            logger.error(f"Unexpected error evaluating {url}: {type(e).__name__}: {str(e)}")
+            line = {"index": index, "url": url, "status": 500, "error": f"Failed to evaluate website: {str(e)}"}
+        finally:
+            admission.release()
+        # Interrupted evaluations never get here, so they are redone on resume
+        progress.finish("error" in line)
+        pending.append((key, line))
+        if len(pending) >= args.batch_size:
+            await flush()
+
+    async def report():
+        while True:
+            await asyncio.sleep(args.progress_interval)
+            print(progress.line(), file=sys.stderr)
+            await flush()
+
+    reporter = asyncio.ensure_future(report())
+    try:
+        seen.clear()
+        for index, url in enumerate(read_input(args.input, args.column)):
+            key = item_key(index, url)
+            if key in seen or key in finished:
+                continue
+            seen.add(key)
+            await admission.acquire()
+            task = asyncio.ensure_future(process(index, url, key))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        reporter.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await flush()
+        writer.close()
+        await asyncio.to_thread(workers.shutdown)
+        await close_router()
+        elapsed = time.monotonic() - progress.started
+        print(progress.line(), file=sys.stderr)
+        print(
+            f"Finished {progress.done} URLs in {format_duration(elapsed)} "
+            f"({progress.failed} failed, {workers.restarts} worker restarts)",
+            file=sys.stderr
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a list of websites offline")
+    parser.add_argument("input", help="CSV or JSONL file of URLs")
+    parser.add_argument("output", help="JSONL file, or a .parquet directory, to add results to")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], help="default: from the output name")
+    parser.add_argument("--column", help="CSV column or JSON field holding the URL")
+    parser.add_argument("--checkpoint", help="default: OUTPUT.checkpoint")
+    parser.add_argument("--retry-failed", action="store_true", help="evaluate failed URLs again on resume")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="crawl worker processes, each with its own browsers")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="evaluations in flight at once")
+    parser.add_argument("--llm-rpm", type=int, help="model requests per minute (default: LLM_RPM_LIMIT)")
+    parser.add_argument("--llm-tpm", type=int, help="model tokens per minute (default: LLM_TPM_LIMIT)")
+    parser.add_argument("--deadline", type=float, default=CRAWL_DEADLINE, help="seconds per site crawl")
+    parser.add_argument("--content-budget", type=int, default=CRAWL_CONTENT_BUDGET)
+    parser.add_argument("--token-budget", type=int, default=CONTENT_TOKEN_BUDGET)
+    parser.add_argument("--batch-size", type=int, default=50, help="results per write and checkpoint")
+    parser.add_argument("--progress-interval", type=float, default=10, help="seconds between progress lines")
+    parser.add_argument("--verbose", action="store_true", help="log crawl and LLM details")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
+
+if __name__ == "__main__":
+    main()
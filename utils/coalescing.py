@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from utils.sqlite_store import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within a worker only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COALESCE_LOCK_DIR = os.getenv("COALESCE_LOCK_DIR", str(CACHE_DIR / "inflight"))
+COALESCE_POLL_INTERVAL = float(os.getenv("COALESCE_POLL_INTERVAL", "0.25"))
+COALESCE_MAX_WAIT = float(os.getenv("COALESCE_MAX_WAIT", "180"))
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Single-flight de-duplication of concurrent work for the same key.
+
+    Within a worker, concurrent callers attach to one in-flight task. Across
+    gunicorn workers, the leader holds an flock on a per-key lock file; other
+    workers wait for the lock and then read the leader's result through the
+    `shared` callback (normally the on-disk result cache) instead of redoing
+    the work.
+    """
+
+    def __init__(
+        self,
+        lock_dir: str = COALESCE_LOCK_DIR,
+        poll_interval: float = COALESCE_POLL_INTERVAL,
+        max_wait: float = COALESCE_MAX_WAIT
+    ):
+        self.lock_dir = Path(lock_dir)
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+
+    def _lock_path(self, key: str) -> Path:
+        # Lock files are left in place; unlinking a lock file other processes may hold is racy
+        return self.lock_dir / (hashlib.sha1(key.encode("utf-8")).hexdigest() + ".lock")
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    async def _lead(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        shared: Optional[Callable[[float], Awaitable[Optional[T]]]]
+    ) -> Tuple[T, bool]:
+        if fcntl is None or shared is None:
+            self.leaders += 1
+            return await fn(), False
+
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self._lock_path(key)), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            started = time.time()
+            waited = False
+            while not self._try_lock(fd):
+                # Another worker is running this key; wait for it to finish
+                waited = True
+                if time.time() - started > self.max_wait:
+                    logger.warning(f"Gave up waiting for another worker on {key}")
+                    break
+                await asyncio.sleep(self.poll_interval)
+
+            if waited:
+                result = await shared(started)
+                if result is not None:
+                    self.coalesced_remote += 1
+                    logger.info(f"Coalesced {key} with another worker's evaluation")
+                    return result, True
+
+            self.leaders += 1
+            return await fn(), False
+        finally:
+            # Closing the descriptor releases the flock
+            os.close(fd)
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[T]],
+        shared: Optional[Callable[[float], Awaitable[Optional[T]]]] = None
+    ) -> Tuple[T, bool]:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        shared(started) is called in a worker that waited on another worker's
+        lock and should return that worker's result if it was produced after
+        `started` (a time.time() timestamp), or None to run fn locally.
+        Returns (result, coalesced).
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced_local += 1
+            logger.info(f"Coalesced {key} with an in-flight evaluation")
+            # Shield so one caller disconnecting doesn't cancel the others' work
+            result, _ = await asyncio.shield(future)
+            return result, True
+
+        future = asyncio.ensure_future(self._lead(key, fn, shared))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced_local": self.coalesced_local,
+            "coalesced_remote": self.coalesced_remote,
+            "coalesced_total": self.coalesced_local + self.coalesced_remote,
+            "cross_worker": fcntl is not None
+        }
+
+single_flight = SingleFlight()
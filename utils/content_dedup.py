@@ -0,0 +1,78 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import List, Set, Tuple
+
+# Blocks with at least this many shingles are compared by shingle overlap;
+# shorter ones (menu items, "Accept cookies") only by exact normalized hash.
+SHINGLE_SIZE = 4
+MIN_SHINGLES = 8
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+_WHITESPACE = re.compile(r"\s+")
+_BLOCK_SEPARATOR = re.compile(r"\n\s*\n")
+
+@dataclass
+class DedupStats:
+    blocks_total: int = 0
+    blocks_dropped: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+def _fingerprint(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+def _shingles(words: List[str]) -> Set[int]:
+    return {
+        _fingerprint(" ".join(words[i:i + SHINGLE_SIZE]))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+def dedupe_pages(pages: List[str]) -> Tuple[List[str], DedupStats]:
+    """
+    Drop header, navigation, cookie banner and footer blocks repeated across pages.
+
+    Pages are processed in order and split into blank-line separated blocks.
+    A block is dropped if its normalized text was already seen, or if most
+    of its word shingles already appeared in earlier blocks. The first line
+    of each page (the "# <url>" header) is always kept.
+    """
+    stats = DedupStats()
+    seen_blocks: Set[int] = set()
+    seen_shingles: Set[int] = set()
+    deduped: List[str] = []
+
+    for page in pages:
+        stats.bytes_before += len(page.encode("utf-8"))
+        header, _, body = page.partition("\n")
+        kept = [header]
+        for block in _BLOCK_SEPARATOR.split(body):
+            if not block.strip():
+                continue
+            stats.blocks_total += 1
+            normalized = _WHITESPACE.sub(" ", block).strip().lower()
+            fingerprint = _fingerprint(normalized)
+            words = normalized.split(" ")
+            shingles = _shingles(words) if len(words) >= SHINGLE_SIZE + MIN_SHINGLES - 1 else set()
+
+            duplicate = fingerprint in seen_blocks
+            if not duplicate and shingles:
+                overlap = len(shingles & seen_shingles) / len(shingles)
+                duplicate = overlap >= NEAR_DUPLICATE_THRESHOLD
+
+            seen_blocks.add(fingerprint)
+            seen_shingles.update(shingles)
+            if duplicate:
+                stats.blocks_dropped += 1
+                continue
+            kept.append(block.strip("\n"))
+
+        page = "\n\n".join(kept)
+        stats.bytes_after += len(page.encode("utf-8"))
+        deduped.append(page)
+
+    return deduped, stats
@@ -0,0 +1,179 @@
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import List
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Tokens of website content sent to the model per evaluation
+CONTENT_TOKEN_BUDGET = int(os.getenv("CONTENT_TOKEN_BUDGET", "1500"))
+TOKENIZER_MODEL = os.getenv("TOKENIZER_MODEL", "gpt-4")
+MAX_SECTION_TOKENS = 300
+
+PAGE_SEPARATOR = "\n\n---\n\n"
+
+# Terms tied to the evaluation categories in the prompt, with their weights
+RELEVANCE_TERMS = {
+    # Partnership fit and reach
+    "partner": 3.0, "reseller": 3.0, "affiliate": 3.0, "white label": 3.0, "referral": 2.0,
+    "agency": 2.5, "clients": 2.0, "customers": 1.5, "portfolio": 2.0, "case stud": 2.0,
+    "trusted by": 1.5, "websites": 2.0,
+    # Accessibility and compliance
+    "accessib": 3.0, "wcag": 3.0, "ada": 2.0, "section 508": 3.0, "compliance": 2.0,
+    "gdpr": 1.0, "regulat": 1.0, "certif": 1.5,
+    # Services and technology
+    "web design": 2.5, "web development": 2.5, "hosting": 2.0, "wordpress": 2.0, "shopify": 2.0,
+    "cms": 1.5, "platform": 1.0, "integration": 1.5, "api": 1.0, "ecommerce": 1.5, "seo": 1.0,
+    "digital marketing": 1.5,
+    # Business profile and model
+    "about us": 2.0, "founded": 2.0, "years": 1.0, "employees": 1.5, "team": 1.0,
+    "offices": 1.0, "pricing": 1.5, "plans": 1.0, "enterprise": 1.0, "award": 1.0,
+}
+# Short terms must match whole words ("ada" but not "canada"); longer ones match as stems
+_TERM_PATTERN = re.compile("|".join(
+    rf"\b{re.escape(term)}\b" if len(term) <= 4 else rf"\b{re.escape(term)}"
+    for term in sorted(RELEVANCE_TERMS, key=len, reverse=True)
+))
+_LINK_PATTERN = re.compile(r"\]\([^)]*\)")
+_HEADING_PATTERN = re.compile(r"^#{1,6}\s", re.MULTILINE)
+
+@dataclass
+class Section:
+    page: int
+    index: int
+    page_url: str
+    text: str
+    tokens: int
+    score: float = 0.0
+
+_encoding = None
+_encoding_failed = tiktoken is None
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            try:
+                _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # tiktoken downloads its vocabulary on first use, which fails offline
+            logger.warning(f"Tokenizer unavailable, estimating token counts: {str(e)}")
+            _encoding_failed = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the model's tokenizer, or estimate if tiktoken is unavailable"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _split_long(text: str) -> List[str]:
+    """Split an oversized section on paragraph boundaries"""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for paragraph in text.split("\n\n"):
+        paragraph_tokens = count_tokens(paragraph)
+        if current and size + paragraph_tokens > MAX_SECTION_TOKENS:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += paragraph_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def split_sections(content: str) -> List[Section]:
+    """Split crawled markdown into pages, then into heading-delimited sections"""
+    sections: List[Section] = []
+    for page_index, page in enumerate(content.split(PAGE_SEPARATOR)):
+        page_url = ""
+        body = page
+        if page.startswith("# "):
+            # scrape_content prefixes every page with "# <url>"
+            first_line, _, body = page.partition("\n")
+            page_url = first_line[2:].strip()
+
+        starts = [m.start() for m in _HEADING_PATTERN.finditer(body)]
+        bounds = [0] + [start for start in starts if start > 0] + [len(body)]
+        for start, end in zip(bounds, bounds[1:]):
+            text = body[start:end].strip()
+            if not text:
+                continue
+            for chunk in _split_long(text) if count_tokens(text) > MAX_SECTION_TOKENS else [text]:
+                sections.append(Section(
+                    page=page_index,
+                    index=len(sections),
+                    page_url=page_url,
+                    text=chunk,
+                    tokens=count_tokens(chunk)
+                ))
+    return sections
+
+def score_section(section: Section) -> float:
+    """Relevance of a section to the evaluation categories, per token"""
+    text = section.text.lower()
+    weight = sum(RELEVANCE_TERMS[match] for match in _TERM_PATTERN.findall(text))
+
+    # Navigation menus, footers and link lists are mostly markdown links
+    words = max(1, len(text.split()))
+    link_density = len(_LINK_PATTERN.findall(text)) / words
+    penalty = 1.0 / (1.0 + 10 * link_density)
+
+    # Pages arrive in crawl priority order; give earlier pages a small edge
+    page_prior = 1.0 / (1.0 + 0.1 * section.page)
+    return (1.0 + weight) * penalty * page_prior / math.sqrt(max(section.tokens, 1))
+
+def select_content(content: str, token_budget: int = CONTENT_TOKEN_BUDGET) -> str:
+    """
+    Pack the most relevant sections of the crawled markdown into token_budget tokens.
+
+    Sections are ranked by score_section and added greedily while they fit,
+    then re-joined in their original page and section order.
+    """
+    if not content:
+        return content
+    if count_tokens(content) <= token_budget:
+        return content
+
+    sections = split_sections(content)
+    for section in sections:
+        section.score = score_section(section)
+
+    selected: List[Section] = []
+    used = 0
+    for section in sorted(sections, key=lambda s: (-s.score, s.index)):
+        # Rough allowance for the page header added when a page is first used
+        cost = section.tokens + 12
+        if used + cost > token_budget:
+            continue
+        selected.append(section)
+        used += cost
+
+    if not selected:
+        # Only oversized sections; fall back to a plain character cut
+        logger.info("No section fits the token budget, truncating content instead")
+        return content[:token_budget * 4]
+
+    pages: List[str] = []
+    current_page = None
+    for section in sorted(selected, key=lambda s: s.index):
+        if section.page != current_page:
+            current_page = section.page
+            pages.append(f"# {section.page_url}" if section.page_url else "")
+        pages[-1] = f"{pages[-1]}\n\n{section.text}".strip()
+
+    logger.info(
+        f"Selected {len(selected)}/{len(sections)} sections, ~{used} of {token_budget} tokens"
+    )
+    return PAGE_SEPARATOR.join(pages)
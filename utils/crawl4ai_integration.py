@@ -1,118 +1,690 @@
-from crawl4ai import AsyncWebCrawler
 import asyncio
-from urllib.parse import urlparse, urljoin
+import hashlib
+from urllib.parse import urlparse
 import logging
-from typing import Set, Optional, Dict, List
+from typing import AsyncIterator, Callable, Optional, Dict, List, Tuple
+import os
 import re
-from dataclasses import dataclass
-from heapq import heappush, heappop
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+import httpx
+from utils.browser_pool import get_crawler_pool
+from utils.content_dedup import dedupe_pages
+from utils.frontier import Frontier, PageScore
+from utils.html_markdown import html_to_markdown
+from utils.page_cache import CachedPage, page_cache
+from utils.metrics import HOST_QUEUE_WAIT, PAGE_FETCH_DURATION
+from utils.site_discovery import SITEMAP_DISCOVERY, SITEMAP_TIMEOUT, SiteDiscovery, discover_site
 
 logger = logging.getLogger(__name__)
 
+# Pages fetched in parallel for a single request, and per host across requests
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+CRAWL_HOST_CONCURRENCY = int(os.getenv("CRAWL_HOST_CONCURRENCY", "4"))
+# Longest robots.txt Crawl-delay honored between fetches to one host
+CRAWL_MAX_DELAY = float(os.getenv("CRAWL_MAX_DELAY", "10"))
+
+# Total time allowed for one crawl, and the markdown size at which it stops early.
+# evaluate_partner only uses a few thousand characters, so there is no point in
+# gathering much more than that.
+CRAWL_DEADLINE = float(os.getenv("CRAWL_DEADLINE", "45"))
+CRAWL_MAX_DEADLINE = float(os.getenv("CRAWL_MAX_DEADLINE", "120"))
+CRAWL_CONTENT_BUDGET = int(os.getenv("CRAWL_CONTENT_BUDGET", "20000"))
+
+# Pages are first fetched over plain HTTP and converted to markdown here; the
+# headless browser is only used for pages that look rendered by JavaScript,
+# and for every later page of a domain that needed it.
+HTTP_FAST_PATH = os.getenv("HTTP_FAST_PATH", "true").lower() in ("1", "true", "yes")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_BYTES = int(os.getenv("HTTP_MAX_BYTES", str(3 * 1024 * 1024)))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+# Pages with fewer visible words are assumed to need JavaScript; app shells
+# (an empty #root/#app mount point) get a higher bar
+HTTP_MIN_WORDS = int(os.getenv("HTTP_MIN_WORDS", "50"))
+HTTP_SHELL_MIN_WORDS = 200
+FETCH_PATH_MEMORY = int(os.getenv("FETCH_PATH_MEMORY", "10000"))
+FETCH_PATH_TTL = float(os.getenv("FETCH_PATH_TTL", str(24 * 3600)))
+HTTP_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+_APP_SHELL = re.compile(
+    r"""<div[^>]+id=["'](?:root|app|__next|___gatsby|svelte)["'][^>]*>\s*</div>|enable javascript""",
+    re.IGNORECASE
+)
+
+# Receives (event name, event data) as a crawl or evaluation progresses
+ProgressCallback = Callable[[str, Dict], None]
+
 @dataclass
-class PageScore:
+class CrawledPage:
     url: str
     score: float
     depth: int
+    markdown: str
+    order: int  # Position in the crawl's wave order, used as a deterministic tie-breaker
 
-    def __lt__(self, other):
-        return (-self.score, self.depth) < (-other.score, other.depth)
+@dataclass
+class CrawlReport:
+    url: str
+    pages: List[CrawledPage] = field(default_factory=list)
+    pages_fetched: int = 0
+    pages_failed: int = 0
+    pages_skipped: int = 0
+    pages_cancelled: int = 0
+    pages_disallowed: int = 0
+    stop_reason: Optional[str] = None  # "deadline", "content_budget" or None if the crawl completed
+    elapsed: float = 0.0
+    dedup_blocks_dropped: int = 0
+    dedup_bytes_saved: int = 0
+    pages_via_http: int = 0
+    pages_via_browser: int = 0
+    pages_from_cache: int = 0
+    sitemap_urls: int = 0
+    crawl_delay: Optional[float] = None
 
-def score_url(url: str) -> float:
-    """Score URL relevance for business partner evaluation"""
-    url_lower = url.lower()
-    
-    # High priority pages
-    if any(x in url_lower for x in [
-        'about', 'company', 'team', 'partner', 'client', 
-        'service', 'product', 'solution', 'integration',
-        'enterprise', 'business', 'pricing', 'plan',
-        'technology', 'platform', 'developer', 'api',
-        'security', 'compliance', 'legal', 'privacy',
-        'contact', 'support'
-    ]):
-        return 1.0
-        
-    # Medium priority pages    
-    if any(x in url_lower for x in [
-        'feature', 'resource', 'blog', 'news',
-        'case-study', 'success-story', 'testimonial',
-        'documentation', 'guide', 'help'
-    ]):
-        return 0.6
-        
-    # Low priority pages
-    if any(x in url_lower for x in [
-        'career', 'job', 'press', 'media',
-        'event', 'webinar', 'download'
-    ]):
-        return 0.3
-    
-    return 0.1  # Default score
+    @property
+    def content(self) -> Optional[str]:
+        if not self.pages:
+            return None
+        return "\n\n---\n\n".join(page.markdown for page in self.pages)
 
-async def scrape_content(url: str, timeout: int = 30, max_pages: int = 5) -> Optional[str]:
+    def stats(self) -> Dict:
+        return {
+            "pagesFetched": self.pages_fetched,
+            "pagesFailed": self.pages_failed,
+            "pagesSkipped": self.pages_skipped,
+            "pagesCancelled": self.pages_cancelled,
+            "pagesDisallowed": self.pages_disallowed,
+            "stopReason": self.stop_reason,
+            "elapsedSeconds": round(self.elapsed, 2),
+            "dedupBlocksDropped": self.dedup_blocks_dropped,
+            "dedupBytesSaved": self.dedup_bytes_saved,
+            "pagesViaHttp": self.pages_via_http,
+            "pagesViaBrowser": self.pages_via_browser,
+            "pagesFromCache": self.pages_from_cache,
+            "sitemapUrls": self.sitemap_urls,
+            "crawlDelay": self.crawl_delay
+        }
+
+class HostLimiter:
     """
-    Scrape website content using Crawl4AI.
-    Returns cleaned content in Markdown format.
-    
+    Per-host politeness limit shared by every crawl in this process.
+
+    Concurrent requests that crawl the same site share its slots, so one host
+    never sees more than `limit` simultaneous fetches from a worker. Hosts
+    with a robots.txt Crawl-delay also get that long between fetch starts.
+    """
+
+    def __init__(self, limit: int = CRAWL_HOST_CONCURRENCY, max_delays: int = 10000):
+        self.limit = max(1, limit)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._users: Dict[str, int] = {}
+        # host -> [delay, next allowed fetch start], least recently set first
+        self._delays: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.max_delays = max_delays
+
+    @staticmethod
+    def _key(host: str) -> str:
+        # www.example.com and example.com are one server to be polite to
+        host = host.lower()
+        return host[4:] if host.startswith("www.") else host
+
+    def set_delay(self, host: str, delay: float):
+        host = self._key(host)
+        delay = min(max(0.0, delay), CRAWL_MAX_DELAY)
+        entry = self._delays.pop(host, None)
+        self._delays[host] = [delay, entry[1] if entry else 0.0]
+        while len(self._delays) > self.max_delays:
+            self._delays.popitem(last=False)
+
+    @asynccontextmanager
+    async def acquire(self, host: str) -> AsyncIterator[None]:
+        host = self._key(host)
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.limit)
+        self._users[host] = self._users.get(host, 0) + 1
+        queued = time.monotonic()
+        try:
+            async with semaphore:
+                entry = self._delays.get(host)
+                if entry and entry[0]:
+                    now = time.monotonic()
+                    start = max(now, entry[1])
+                    entry[1] = start + entry[0]
+                    if start > now:
+                        await asyncio.sleep(start - now)
+                HOST_QUEUE_WAIT.observe(time.monotonic() - queued)
+                yield
+        finally:
+            self._users[host] -= 1
+            if not self._users[host]:
+                # Drop idle hosts so the table doesn't grow with every domain seen
+                del self._users[host]
+                del self._semaphores[host]
+
+host_limiter = HostLimiter()
+
+def extract_anchors(result) -> List[Tuple[str, str]]:
+    """Return (href, anchor text) pairs from a crawl result, accepting both list and Crawl4AI's internal/external dict formats"""
+    links = getattr(result, "links", None)
+    if not links:
+        return []
+    if isinstance(links, dict):
+        links = [link for group in links.values() for link in group]
+    anchors = []
+    for link in links:
+        if isinstance(link, dict):
+            href, text = link.get("href"), link.get("text") or ""
+        else:
+            href, text = link, ""
+        if href:
+            anchors.append((href, text))
+    return anchors
+
+def extract_links(result) -> List[str]:
+    """Return hrefs from a crawl result"""
+    return [href for href, _ in extract_anchors(result)]
+
+@dataclass
+class HttpPage:
+    """A page fetched without the browser, shaped like the parts of a Crawl4AI result we use"""
+    url: str
+    status_code: int
+    markdown: str
+    links: Dict[str, List[Dict[str, str]]]
+    title: str = ""
+    success: bool = True
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    from_cache: bool = False
+
+def cached_result(page: CachedPage) -> HttpPage:
+    return HttpPage(
+        url=page.url,
+        status_code=200,
+        markdown=page.markdown,
+        links=page.links,
+        title=page.title,
+        etag=page.etag,
+        last_modified=page.last_modified,
+        content_hash=page.content_hash,
+        from_cache=True
+    )
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8", errors="replace")).hexdigest()
+
+class FetchPathMemory:
+    """
+    Which fetch path ("http" or "browser") last worked for each domain, so
+    later pages and crawls go straight to it. Bounded LRU with a TTL, so a
+    site that changes its rendering is re-checked eventually.
+    """
+
+    def __init__(self, max_domains: int = FETCH_PATH_MEMORY, ttl: float = FETCH_PATH_TTL):
+        self.max_domains = max_domains
+        self.ttl = ttl
+        self._paths: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.http_pages = 0
+        self.browser_pages = 0
+        self.fallbacks = 0
+
+    def get(self, host: str) -> Optional[str]:
+        entry = self._paths.get(host)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.ttl:
+            del self._paths[host]
+            return None
+        self._paths.move_to_end(host)
+        return entry[0]
+
+    def record(self, host: str, path: str):
+        self._paths[host] = (path, time.monotonic())
+        self._paths.move_to_end(host)
+        while len(self._paths) > self.max_domains:
+            self._paths.popitem(last=False)
+
+    def stats(self) -> Dict:
+        paths = [path for path, _ in self._paths.values()]
+        return {
+            "http_fast_path": HTTP_FAST_PATH,
+            "domains_http": paths.count("http"),
+            "domains_browser": paths.count("browser"),
+            "pages_http": self.http_pages,
+            "pages_browser": self.browser_pages,
+            "browser_fallbacks": self.fallbacks
+        }
+
+fetch_paths = FetchPathMemory()
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled HTTP client, created lazily on the server's event loop"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            headers={"User-Agent": HTTP_USER_AGENT, "Accept": "text/html,application/xhtml+xml"},
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=20),
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=5)
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def needs_browser(html: str, words: int) -> bool:
+    """Whether a server-rendered page has too little content to be the real page"""
+    if words < HTTP_MIN_WORDS:
+        return True
+    return words < HTTP_SHELL_MIN_WORDS and bool(_APP_SHELL.search(html))
+
+async def fetch_http(url: str, timeout: float, cached: Optional[CachedPage] = None) -> Tuple[Optional[HttpPage], bool]:
+    """
+    Fetch and convert a page without the browser, revalidating the cached
+    copy if there is one: a 304, or a body identical to the one cached, reuses
+    the cached markdown without converting the page again.
+    Returns (page, usable): page is None if the fetch failed, and usable is
+    False when the browser should be tried instead.
+    """
+    headers = cached.conditional_headers() if cached is not None else {}
+    try:
+        async with get_http_client().stream("GET", url, timeout=timeout, headers=headers) as response:
+            if response.status_code == 304 and cached is not None:
+                page_cache.revalidated += 1
+                await page_cache.touch(url)
+                return cached_result(cached), True
+            content_type = response.headers.get("content-type", "")
+            if response.status_code in (404, 410):
+                return None, False
+            if response.status_code >= 400 or "html" not in content_type:
+                # Blocked (403, 429, 5xx) or not a page; the browser may do better
+                return None, True
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= HTTP_MAX_BYTES:
+                    break
+            html = body.decode(response.encoding or "utf-8", errors="replace")
+            final_url = str(response.url)
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+    except (httpx.HTTPError, UnicodeError, LookupError) as e:
+        logger.info(f"HTTP fetch failed for {url}: {type(e).__name__}")
+        return None, True
+
+    digest = content_hash(html)
+    if cached is not None and cached.content_hash == digest:
+        page_cache.unchanged += 1
+        await page_cache.touch(url)
+        return cached_result(cached), True
+
+    # Parsing is CPU-bound; keep it off the event loop
+    document = await asyncio.to_thread(html_to_markdown, html, final_url)
+    if needs_browser(html, document.words):
+        logger.info(f"{url} looks rendered by JavaScript ({document.words} words), using the browser")
+        return None, True
+    return HttpPage(
+        url=final_url,
+        status_code=response.status_code,
+        markdown=document.markdown,
+        links=document.links,
+        title=document.title,
+        etag=etag,
+        last_modified=last_modified,
+        content_hash=digest
+    ), True
+
+async def revalidate(url: str, cached: CachedPage, timeout: float) -> bool:
+    """Whether a conditional GET confirms a cached browser-rendered page is unchanged"""
+    headers = cached.conditional_headers()
+    if not headers:
+        return False
+    try:
+        async with get_http_client().stream("GET", url, timeout=timeout, headers=headers) as response:
+            unchanged = response.status_code == 304
+    except httpx.HTTPError as e:
+        logger.info(f"Revalidation failed for {url}: {type(e).__name__}")
+        return False
+    if unchanged:
+        page_cache.revalidated += 1
+        await page_cache.touch(url)
+    return unchanged
+
+async def store_page(url: str, result):
+    """Cache a fetched page with whatever validators its response had"""
+    if isinstance(result, HttpPage):
+        if result.from_cache:
+            return
+        page = CachedPage(
+            url=result.url, markdown=result.markdown, links=result.links, title=result.title,
+            etag=result.etag, last_modified=result.last_modified, content_hash=result.content_hash
+        )
+    else:
+        headers = {key.lower(): value for key, value in (getattr(result, "response_headers", None) or {}).items()}
+        markdown = getattr(result, "markdown", None)
+        links = getattr(result, "links", None)
+        page = CachedPage(
+            url=getattr(result, "url", None) or url,
+            markdown=str(markdown) if markdown else "",
+            links=links if isinstance(links, dict) else {},
+            title=(getattr(result, "metadata", None) or {}).get("title") or "",
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified")
+        )
+    await page_cache.put(url, page)
+
+async def fetch_page(url: str, timeout: int = 30):
+    """
+    Fetch a single page under the per-host politeness limit: from the page
+    cache while fresh or unchanged, over plain HTTP when the page is
+    server-rendered, otherwise with a pooled crawler.
+    """
+    host = urlparse(url).netloc
+    started = time.monotonic()
+    cached = await page_cache.get(url)
+    if cached is not None and cached.fresh:
+        page_cache.fresh_hits += 1
+        return cached_result(cached)
+
+    async with host_limiter.acquire(host):
+        known = fetch_paths.get(host)
+        if HTTP_FAST_PATH and known != "browser":
+            page, try_browser = await fetch_http(url, min(timeout, HTTP_TIMEOUT), cached)
+            if page is not None:
+                if not page.from_cache:
+                    fetch_paths.record(host, "http")
+                    fetch_paths.http_pages += 1
+                    await store_page(url, page)
+                return page
+            if not try_browser:
+                return None
+            fetch_paths.fallbacks += 1
+        elif cached is not None and await revalidate(url, cached, min(timeout, HTTP_TIMEOUT)):
+            return cached_result(cached)
+
+        pool = get_crawler_pool()
+        remaining = max(0.1, timeout - (time.monotonic() - started))
+        async with pool.lease() as crawler:
+            task = asyncio.create_task(crawler.arun(url=url))
+            result = await asyncio.wait_for(task, timeout=remaining)
+        # A domain already known to serve static pages keeps the fast path for
+        # its other pages; only the first decision for a domain is recorded here
+        if result and getattr(result, "markdown", None) and known is None:
+            fetch_paths.record(host, "browser")
+        fetch_paths.browser_pages += 1
+        if result and getattr(result, "success", True):
+            await store_page(url, result)
+        return result
+
+async def crawl_site(
+    url: str,
+    timeout: int = 30,
+    max_pages: int = 5,
+    concurrency: int = CRAWL_CONCURRENCY,
+    deadline: float = CRAWL_DEADLINE,
+    content_budget: int = CRAWL_CONTENT_BUDGET,
+    progress: Optional[ProgressCallback] = None,
+    homepage=None,
+    discover: bool = SITEMAP_DISCOVERY
+) -> CrawlReport:
+    """
+    Crawl a website within a total latency budget and a content budget.
+
+    With discovery on, the site's robots.txt and sitemaps are read while the
+    homepage is fetched, and the best sitemap URLs are fetched as soon as
+    they arrive. The top-scored frontier URLs are then fetched in parallel
+    waves. The crawl stops as soon as the deadline passes
+    or enough markdown has been gathered, cancelling in-flight fetches and
+    returning the best pages collected so far.
+
     Args:
-        url: Website URL to scrape
-        timeout: Timeout in seconds (default 30)
+        url: Website URL to crawl
+        timeout: Timeout in seconds for a single page (default 30)
         max_pages: Maximum number of pages to scrape (default 5)
+        concurrency: Maximum number of pages fetched at once for this request
+        deadline: Total seconds allowed for the whole crawl
+        content_budget: Stop once this many characters of markdown are gathered
+        progress: Optional callback receiving a "page_fetched" event per page
+        homepage: Optional crawl result for url that was already fetched
+        discover: Read robots.txt and sitemaps alongside the first fetches
     """
     # Ensure URL has scheme
     if not urlparse(url).scheme:
         url = "https://" + url
-    
-    base_domain = urlparse(url).netloc
-    visited_urls: Set[str] = set()
-    all_content: List[str] = []
-    page_queue: List[PageScore] = []  # Priority queue
-    
+
+    started = time.monotonic()
+    deadline_at = started + deadline
+    report = CrawlReport(url=url)
+    frontier = Frontier(url)
+    visited = 0
+    content_size = 0
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
     # Start with homepage
-    heappush(page_queue, PageScore(url=url, score=1.0, depth=0))
-
-    while page_queue and len(visited_urls) < max_pages:
-        current_page = heappop(page_queue)
-        current_url = current_page.url
-        
-        if current_url in visited_urls:
-            continue
-            
-        visited_urls.add(current_url)
-        logger.info(f"Scraping page {len(visited_urls)}/{max_pages} (score: {current_page.score:.2f}): {current_url}")
+    frontier.seed(url)
+
+    # The site's robots.txt and sitemaps are read while the homepage is
+    # fetched. Their URLs join the frontier before the second wave, never
+    # mid-wave, so which pages are crawled doesn't depend on which of the
+    # two finished first
+    discovery_task: Optional[asyncio.Future] = None
+    if discover and max_pages > 1:
+        discovery_task = asyncio.ensure_future(discover_site(
+            get_http_client(), url, timeout=min(SITEMAP_TIMEOUT, max(0.0, deadline_at - time.monotonic()))
+        ))
 
+    # robots.txt rules, once discovery has read them
+    site_rules: Optional[SiteDiscovery] = None
+
+    def merge_discovery():
+        nonlocal discovery_task, site_rules
+        task, discovery_task = discovery_task, None
         try:
-            async with AsyncWebCrawler() as crawler:
-                task = asyncio.create_task(crawler.arun(url=current_url))
-                try:
-                    result = await asyncio.wait_for(task, timeout=timeout)
-                    if result:
+            discovery = task.result()
+        except Exception as e:
+            logger.warning(f"Site discovery for {url} failed: {str(e)}")
+            return
+        site_rules = discovery
+        report.pages_disallowed += discovery.urls_disallowed
+        if discovery.crawl_delay:
+            host_limiter.set_delay(urlparse(url).netloc, discovery.crawl_delay)
+            report.crawl_delay = discovery.crawl_delay
+        for sitemap_url in discovery.urls:
+            frontier.add(sitemap_url, depth=1)
+        report.sitemap_urls = len(discovery.urls)
+
+    async def crawl_one(page: PageScore):
+        if homepage is not None and page.depth == 0:
+            return homepage
+        async with semaphore:
+            page_timeout = min(timeout, max(0.0, deadline_at - time.monotonic()))
+            logger.info(f"Scraping page (score: {page.score:.2f}): {page.url}")
+            started = time.monotonic()
+            result = None
+            try:
+                result = await fetch_page(page.url, timeout=page_timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Timeout scraping {page.url} after {page_timeout:.1f} seconds")
+            except Exception as e:
+                logger.error(f"Error scraping {page.url}: {str(e)}")
+            if not result:
+                path = "failed"
+            elif getattr(result, "from_cache", False):
+                path = "cache"
+            else:
+                path = "http" if isinstance(result, HttpPage) else "browser"
+            PAGE_FETCH_DURATION.labels(path).observe(time.monotonic() - started)
+            return result
+
+    try:
+        while (frontier or discovery_task) and visited < max_pages and report.stop_reason is None:
+            if time.monotonic() >= deadline_at:
+                report.stop_reason = "deadline"
+                break
+            if discovery_task is not None and (visited or not frontier):
+                # After the first wave: wait for discovery, bounded by its own timeout
+                await asyncio.wait({discovery_task}, timeout=max(0.0, deadline_at - time.monotonic()))
+                if not discovery_task.done():
+                    continue
+                merge_discovery()
+                continue
+
+            # Take the best URLs that still fit in the page budget; the frontier
+            # only ever holds each page once. Pages are ordered by when they
+            # were taken from the frontier, not when they finished downloading,
+            # so the content is the same every run
+            wave: List[PageScore] = []
+            tasks: Dict[asyncio.Future, PageScore] = {}
+            positions: Dict[str, int] = {}
+            while frontier and visited < max_pages:
+                page = frontier.pop()
+                if site_rules is not None and not site_rules.allowed(page.url):
+                    report.pages_disallowed += 1
+                    continue
+                positions[page.url] = visited
+                visited += 1
+                wave.append(page)
+                tasks[asyncio.ensure_future(crawl_one(page))] = page
+            logger.info(f"Scraping {len(wave)} page(s), {visited}/{max_pages} total")
+
+            results: Dict[str, object] = {}
+            pending = set(tasks)
+            try:
+                while pending:
+                    remaining = deadline_at - time.monotonic()
+                    if remaining <= 0:
+                        report.stop_reason = "deadline"
+                        break
+                    done, _ = await asyncio.wait(
+                        pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    pending -= done
+                    for task in done:
+                        current_page = tasks[task]
+                        result = task.result()
+                        results[current_page.url] = result
+                        if not result:
+                            report.pages_failed += 1
+                        else:
+                            report.pages_fetched += 1
+                            if getattr(result, "from_cache", False):
+                                report.pages_from_cache += 1
+                            elif isinstance(result, HttpPage):
+                                report.pages_via_http += 1
+                            else:
+                                report.pages_via_browser += 1
+                        if progress:
+                            progress("page_fetched", {
+                                "url": current_page.url,
+                                "ok": bool(result),
+                                "page": report.pages_fetched + report.pages_failed,
+                                "maxPages": max_pages
+                            })
+                        if not result:
+                            continue
                         if result.markdown:
                             # Add page title/url as context
-                            page_content = f"# {current_url}\n\n{result.markdown}"
-                            all_content.append(page_content)
-                        
-                        # Extract and score new URLs
-                        if result.links:
-                            for link in result.links:
-                                # Normalize URL
-                                full_url = urljoin(current_url, link)
-                                # Only queue internal links
-                                if urlparse(full_url).netloc == base_domain and full_url not in visited_urls:
-                                    score = score_url(full_url)
-                                    heappush(page_queue, PageScore(
-                                        url=full_url,
-                                        score=score,
-                                        depth=current_page.depth + 1
-                                    ))
-                                    
-                except asyncio.TimeoutError:
-                    logger.error(f"Timeout scraping {current_url} after {timeout} seconds")
-                    
-        except Exception as e:
-            logger.error(f"Error scraping {current_url}: {str(e)}")
+                            page_content = f"# {current_page.url}\n\n{result.markdown}"
+                            report.pages.append(CrawledPage(
+                                url=current_page.url,
+                                score=current_page.score,
+                                depth=current_page.depth,
+                                markdown=page_content,
+                                order=positions[current_page.url]
+                            ))
+                            content_size += len(page_content)
+                    if content_size >= content_budget:
+                        report.stop_reason = "content_budget"
+                        break
+            finally:
+                # Cancel whatever is still in flight when we stop early or are cancelled ourselves
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    report.pages_cancelled += len(pending)
+                    await asyncio.gather(*pending, return_exceptions=True)
+
+            if report.stop_reason is not None:
+                break
+
+            # Process in wave order, not completion order, to keep the frontier deterministic
+            for current_page in wave:
+                result = results.get(current_page.url)
+                if not result:
+                    continue
+
+                # Queue new same-site links, scored by path and anchor text
+                for href, text in extract_anchors(result):
+                    frontier.add(href, base=current_page.url, depth=current_page.depth + 1, anchor_text=text)
+    finally:
+        if discovery_task is not None:
+            discovery_task.cancel()
+            await asyncio.gather(discovery_task, return_exceptions=True)
+
+    if report.stop_reason is not None:
+        # Pages that were still within max_pages but never fetched
+        report.pages_skipped = min(len(frontier), max(0, max_pages - visited))
+        logger.info(f"Crawl of {url} stopped early ({report.stop_reason})")
+
+    report.pages.sort(key=lambda page: (-page.score, page.depth, page.order))
+
+    # Drop the header/nav/footer blocks every page repeats
+    deduped, dedup_stats = dedupe_pages([page.markdown for page in report.pages])
+    for page, markdown in zip(report.pages, deduped):
+        page.markdown = markdown
+    report.dedup_blocks_dropped = dedup_stats.blocks_dropped
+    report.dedup_bytes_saved = dedup_stats.bytes_saved
+    if dedup_stats.blocks_dropped:
+        logger.info(
+            f"Dropped {dedup_stats.blocks_dropped}/{dedup_stats.blocks_total} repeated blocks, "
+            f"saved {dedup_stats.bytes_saved} of {dedup_stats.bytes_before} bytes"
+        )
 
-    if all_content:
-        return "\n\n---\n\n".join(all_content)
-    return None 
\ No newline at end of file
+    report.elapsed = time.monotonic() - started
+    return report
+
+async def scrape_content(
+    url: str,
+    timeout: int = 30,
+    max_pages: int = 5,
+    concurrency: int = CRAWL_CONCURRENCY,
+    deadline: float = CRAWL_DEADLINE,
+    content_budget: int = CRAWL_CONTENT_BUDGET
+) -> Optional[str]:
+    """
+    Scrape website content using Crawl4AI.
+    Returns cleaned content in Markdown format.
+
+    Pages are fetched with crawlers leased from the shared browser pool,
+    several at a time, and joined in score order. See crawl_site for the
+    deadline and content budget semantics.
+    
+    Args:
+        url: Website URL to scrape
+        timeout: Timeout in seconds for a single page (default 30)
+        max_pages: Maximum number of pages to scrape (default 5)
+        concurrency: Maximum number of pages fetched at once for this request
+        deadline: Total seconds allowed for the whole crawl
+        content_budget: Stop once this many characters of markdown are gathered
+    """
+    report = await crawl_site(
+        url,
+        timeout=timeout,
+        max_pages=max_pages,
+        concurrency=concurrency,
+        deadline=deadline,
+        content_budget=content_budget
+    )
+    return report.content
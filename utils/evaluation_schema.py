@@ -0,0 +1,138 @@
+from functools import lru_cache
+from typing import Annotated, Any, Dict, List, Tuple, Type
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, create_model
+
+# Section fields default to empty values so a sparse section is still usable;
+# only missing or mistyped top-level fields trigger a repair request.
+
+class BusinessProfile(BaseModel):
+    industry: str = ""
+    companySize: str = ""
+    geographicReach: str = ""
+    yearsInBusiness: str = ""
+    clientPortfolioSize: str = ""
+
+class TechnicalAssessment(BaseModel):
+    techStack: List[str] = []
+    accessibilitySolutions: str = ""
+    integrationScore: int = Field(default=0, ge=0, le=5)
+    developmentServices: List[str] = []
+    hostingServices: str = ""
+
+class MarketPosition(BaseModel):
+    segments: List[str] = []
+    competitors: List[str] = []
+    certifications: List[str] = []
+    memberships: List[str] = []
+    awards: List[str] = []
+
+class ClientRelationships(BaseModel):
+    clientTypes: List[str] = []
+    averageClientSize: str = ""
+    retentionRate: str = ""
+    serviceModel: str = ""
+    successStories: int = Field(default=0, ge=0)
+
+class BusinessModel(BaseModel):
+    revenueStreams: List[str] = []
+    pricingModel: str = ""
+    salesApproach: str = ""
+    serviceDelivery: str = ""
+    contractTypes: List[str] = []
+
+class ComplianceGrowth(BaseModel):
+    regulatoryFocus: List[str] = []
+    complianceServices: List[str] = []
+    growthIndicators: List[str] = []
+    digitalPresenceScore: int = Field(default=0, ge=0, le=5)
+    futurePlans: List[str] = []
+
+class PartnershipEvaluation(BaseModel):
+    strengths: List[str] = []
+    challenges: List[str] = []
+    opportunities: List[str] = []
+    risks: List[str] = []
+    recommendedApproach: str = ""
+
+class PartnerEvaluation(BaseModel):
+    """The evaluation returned by /predict, in the order the model should emit it"""
+    probability: int = Field(ge=0, le=100)
+    reachScore: int = Field(ge=0, le=100)
+    relevanceScore: int = Field(ge=0, le=100)
+    reasoning: str
+    category: str
+    businessProfile: BusinessProfile
+    technicalAssessment: TechnicalAssessment
+    marketPosition: MarketPosition
+    clientRelationships: ClientRelationships
+    businessModel: BusinessModel
+    complianceGrowth: ComplianceGrowth
+    partnershipEvaluation: PartnershipEvaluation
+    indicators: List[str]
+    salesPitch: str
+
+SECTION_NAMES = list(PartnerEvaluation.model_fields)
+
+@lru_cache(maxsize=None)
+def _section_adapter(name: str) -> TypeAdapter:
+    field = PartnerEvaluation.model_fields[name]
+    return TypeAdapter(Annotated[field.annotation, field])
+
+def validate_sections(data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Validate each top-level section independently.
+    Returns the valid sections (as plain JSON-compatible values) and the
+    names of sections that are missing or invalid.
+    """
+    valid: Dict[str, Any] = {}
+    bad: List[str] = []
+    for name in SECTION_NAMES:
+        if name not in data:
+            bad.append(name)
+            continue
+        adapter = _section_adapter(name)
+        try:
+            valid[name] = adapter.dump_python(adapter.validate_python(data[name]), mode="json")
+        except ValidationError:
+            bad.append(name)
+    return valid, bad
+
+def section_model(names: List[str]) -> Type[BaseModel]:
+    """A model containing only the given top-level sections, for repair requests"""
+    fields = PartnerEvaluation.model_fields
+    return create_model(
+        "PartnerEvaluationRepair",
+        **{name: (fields[name].annotation, fields[name]) for name in names}
+    )
+
+# Keywords OpenAI's strict structured-output mode does not accept
+_UNSUPPORTED_SCHEMA_KEYS = ("default", "title", "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum")
+
+def _make_strict(schema: Any) -> Any:
+    if isinstance(schema, dict):
+        schema = {
+            key: (
+                # Property names and $defs names are not keywords; recurse into their schemas
+                {name: _make_strict(sub) for name, sub in value.items()}
+                if key in ("properties", "$defs") else _make_strict(value)
+            )
+            for key, value in schema.items() if key not in _UNSUPPORTED_SCHEMA_KEYS
+        }
+        if schema.get("type") == "object" and "properties" in schema:
+            schema["additionalProperties"] = False
+            schema["required"] = list(schema["properties"])
+        return schema
+    if isinstance(schema, list):
+        return [_make_strict(item) for item in schema]
+    return schema
+
+def response_format(model: Type[BaseModel] = PartnerEvaluation) -> Dict[str, Any]:
+    """The json_schema response_format for a model, in strict structured-output form"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "strict": True,
+            "schema": _make_strict(model.model_json_schema())
+        }
+    }
@@ -0,0 +1,164 @@
+import os
+import re
+from dataclasses import dataclass
+from heapq import heappush, heappop
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit, unquote
+from utils.url_validation import canonicalize_url, site_host
+
+# Most URLs kept queued per crawl; lower-scored ones beyond this are dropped
+CRAWL_FRONTIER_SIZE = int(os.getenv("CRAWL_FRONTIER_SIZE", "500"))
+# Anchor text is a slightly weaker signal than the path itself
+ANCHOR_WEIGHT = 0.9
+# Raw hrefs remembered per crawl, so links repeated on every page skip parsing
+HREF_MEMORY = 20000
+# Score multiplier per path segment beyond the first
+DEPTH_DECAY = 0.85
+DEFAULT_SCORE = 0.1
+
+# Keywords by priority, matched in the URL path and in the link's anchor text
+LINK_TIERS = (
+    (1.0, (
+        "about", "company", "team", "partner", "client", "service", "product", "solution",
+        "integration", "enterprise", "business", "pricing", "plan", "technology", "platform",
+        "developer", "api", "security", "compliance", "legal", "privacy", "contact", "support"
+    )),
+    (0.6, (
+        "feature", "resource", "blog", "news", "case-study", "success-story", "testimonial",
+        "documentation", "guide", "help"
+    )),
+    (0.3, ("career", "job", "press", "media", "event", "webinar", "download")),
+)
+
+def _compile_tiers() -> "re.Pattern":
+    # One alternation with a named group per tier; hyphenated keywords also
+    # match "_", " " or nothing between words so anchor text matches too
+    groups = []
+    for index, (_, keywords) in enumerate(LINK_TIERS):
+        alternatives = "|".join(
+            r"[-_ ]?".join(re.escape(word) for word in keyword.split("-"))
+            for keyword in sorted(keywords, key=len, reverse=True)
+        )
+        groups.append(f"(?P<tier{index}>{alternatives})")
+    return re.compile("|".join(groups))
+
+_TIER_PATTERN = _compile_tiers()
+_TIER_WEIGHTS = {f"tier{index}": weight for index, (weight, _) in enumerate(LINK_TIERS)}
+
+def _match_weight(text: str) -> float:
+    best = 0.0
+    for match in _TIER_PATTERN.finditer(text):
+        best = max(best, _TIER_WEIGHTS[match.lastgroup])
+        if best == LINK_TIERS[0][0]:
+            break
+    return best
+
+def score_link(url: str, anchor_text: str = "") -> float:
+    """Score a link's relevance for partner evaluation from its path, anchor text and path depth"""
+    return _score_path(urlsplit(url).path, anchor_text)
+
+def _score_path(path: str, anchor_text: str) -> float:
+    path = unquote(path).lower()
+    score = max(_match_weight(path), ANCHOR_WEIGHT * _match_weight(anchor_text.lower()) if anchor_text else 0.0)
+    score = max(score, DEFAULT_SCORE)
+    segments = sum(1 for segment in path.split("/") if segment)
+    return score * DEPTH_DECAY ** max(0, segments - 1)
+
+def score_url(url: str) -> float:
+    """Score URL relevance for business partner evaluation"""
+    return score_link(url)
+
+@dataclass
+class PageScore:
+    url: str
+    score: float
+    depth: int
+
+    def __lt__(self, other):
+        return (-self.score, self.depth) < (-other.score, other.depth)
+
+class Frontier:
+    """
+    Priority queue of same-site URLs to crawl, best first.
+
+    Links are canonicalized (no fragment or query, lowercased host) and each
+    page is queued at most once, whatever the trailing slash, scheme or
+    "www." of the link. The queue is trimmed to the max_size best URLs.
+    """
+
+    def __init__(self, root_url: str, max_size: int = CRAWL_FRONTIER_SIZE):
+        self.host = site_host(root_url)
+        self.max_size = max(1, max_size)
+        self._heap: List[PageScore] = []
+        self._seen: Set[str] = set()
+        # Absolute and root-relative hrefs already handled -> whether they were queued
+        self._hrefs: Dict[str, bool] = {}
+        self.queued = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def seed(self, url: str):
+        """Queue the crawl's start URL as given, ahead of everything else"""
+        canonical = canonicalize_url(url)
+        if canonical is not None:
+            self._seen.add(canonical[1])
+        heappush(self._heap, PageScore(url=url, score=1.0, depth=0))
+        self.queued += 1
+
+    def add(self, href: str, base: str = "", depth: int = 0,
+            anchor_text: str = "", score: Optional[float] = None) -> bool:
+        """Queue a link found on page base; returns False if it was off-site, not a page or already seen"""
+        href = href.strip()
+        # Same-site hrefs that don't depend on the linking page resolve the same everywhere
+        remember = href.startswith(("/", "http:", "https:")) and not href.startswith("//")
+        if remember and href in self._hrefs:
+            if self._hrefs[href]:
+                self.duplicates += 1
+            else:
+                self.rejected += 1
+            return False
+        canonical = canonicalize_url(href, base)
+        # The key starts with the host, without "www."
+        if canonical is None or canonical[1].split("/", 1)[0] != self.host:
+            self.rejected += 1
+            self._remember(href, remember, False)
+            return False
+        url, key = canonical
+        if key in self._seen:
+            self.duplicates += 1
+            self._remember(href, remember, True)
+            return False
+        self._seen.add(key)
+        self._remember(href, remember, True)
+        if score is None:
+            score = _score_path(key[len(self.host):], anchor_text)
+        heappush(self._heap, PageScore(url=url, score=score, depth=depth))
+        self.queued += 1
+        if len(self._heap) > 2 * self.max_size:
+            # Amortized trim; a sorted list is a valid heap
+            self.dropped += len(self._heap) - self.max_size
+            self._heap.sort()
+            del self._heap[self.max_size:]
+        return True
+
+    def _remember(self, href: str, remember: bool, queued: bool):
+        if remember:
+            if len(self._hrefs) >= HREF_MEMORY:
+                self._hrefs.clear()
+            self._hrefs[href] = queued
+
+    def pop(self) -> Optional[PageScore]:
+        return heappop(self._heap) if self._heap else None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queued,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "pending": len(self._heap)
+        }
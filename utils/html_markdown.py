@@ -0,0 +1,170 @@
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+# Content never shown as text
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "canvas", "select", "button"}
+# Tags allowed in <head>; any other start tag opens the body even when
+# </head> and <body> are omitted, as HTML allows
+HEAD_TAGS = {"title", "meta", "link", "style", "script", "base", "noscript", "template"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "header", "footer", "nav", "main", "aside", "table",
+    "tr", "ul", "ol", "form", "blockquote", "figure", "figcaption", "address", "dl", "dt", "dd", "pre"
+}
+VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "source", "wbr", "area", "base", "col", "embed", "track"}
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+_WHITESPACE = re.compile(r"\s+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_WORD = re.compile(r"\w+")
+
+@dataclass
+class HtmlDocument:
+    title: str = ""
+    markdown: str = ""
+    words: int = 0
+    links: Dict[str, List[Dict[str, str]]] = field(default_factory=lambda: {"internal": [], "external": []})
+
+class _MarkdownConverter(HTMLParser):
+    """Single-pass HTML to markdown for server-rendered pages: headings, paragraphs, lists and links"""
+
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.host = urlparse(base_url).netloc
+        self.out: List[str] = []
+        self.title: List[str] = []
+        self.links: Dict[str, List[Dict[str, str]]] = {"internal": [], "external": []}
+        self._seen_links = set()
+        self._skip = 0
+        self._in_head = False
+        self._in_title = False
+        self._pre = 0
+        self._lists = 0
+        self._anchor: Optional[Tuple[str, List[str]]] = None
+        self.words = 0
+
+    def _newline(self, count: int = 2):
+        """End the line with count - 1 blank lines after it, counting newlines already written"""
+        written = 0
+        for piece in reversed(self.out):
+            stripped = piece.rstrip("\n")
+            written += len(piece) - len(stripped)
+            if stripped or written >= count:
+                break
+        if written < count:
+            self.out.append("\n" * (count - written))
+
+    def handle_starttag(self, tag: str, attrs):
+        if tag == "head":
+            self._in_head = True
+            return
+        if self._in_head and tag not in HEAD_TAGS:
+            self._in_head = False
+        if tag in SKIP_TAGS:
+            if tag not in VOID_TAGS:
+                self._skip += 1
+            return
+        if tag == "title":
+            self._in_title = True
+        if self._skip or self._in_head:
+            return
+        if tag in HEADING_TAGS:
+            self._newline()
+            self.out.append("#" * HEADING_TAGS[tag] + " ")
+        elif tag in ("ul", "ol"):
+            self._lists += 1
+            self._newline(1)
+        elif tag == "li":
+            self._newline(1)
+            self.out.append("  " * max(0, self._lists - 1) + "- ")
+        elif tag == "pre":
+            self._pre += 1
+            self._newline()
+        elif tag == "br":
+            self._newline(1)
+        elif tag == "hr":
+            self._newline()
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            self._anchor = (href, []) if href else None
+        elif tag in BLOCK_TAGS or tag in ("td", "th"):
+            self._newline(2 if tag in BLOCK_TAGS else 1)
+
+    def handle_endtag(self, tag: str):
+        if tag == "head":
+            self._in_head = False
+            return
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+            return
+        if tag == "title":
+            self._in_title = False
+        if self._skip or self._in_head:
+            return
+        if tag == "a" and self._anchor is not None:
+            href, parts = self._anchor
+            self._anchor = None
+            self._add_link(href, _WHITESPACE.sub(" ", "".join(parts)).strip())
+        elif tag in ("ul", "ol"):
+            self._lists = max(0, self._lists - 1)
+            self._newline(1)
+        elif tag == "pre":
+            self._pre = max(0, self._pre - 1)
+            self._newline()
+        elif tag in HEADING_TAGS or tag in BLOCK_TAGS:
+            self._newline()
+
+    def handle_data(self, data: str):
+        if self._in_title:
+            self.title.append(data)
+            return
+        if self._in_head and not self._skip and data.strip():
+            # Text can't be in <head>, so it starts the body
+            self._in_head = False
+        if self._skip or self._in_head:
+            return
+        text = data if self._pre else _WHITESPACE.sub(" ", data)
+        if not text.strip():
+            if text and self.out and not self.out[-1].endswith((" ", "\n")):
+                self.out.append(" ")
+            return
+        self.words += len(_WORD.findall(text))
+        if self._anchor is not None:
+            self._anchor[1].append(text)
+        else:
+            self.out.append(text)
+
+    def _add_link(self, href: str, text: str):
+        href = href.strip()
+        if href.startswith(("#", "mailto:", "tel:", "javascript:", "data:")):
+            if text:
+                self.out.append(text)
+            return
+        absolute = urljoin(self.base_url, href).split("#")[0]
+        parsed = urlparse(absolute)
+        if parsed.scheme not in ("http", "https"):
+            return
+        if text:
+            self.out.append(f"[{text}]({absolute})")
+        if absolute not in self._seen_links:
+            self._seen_links.add(absolute)
+            group = "internal" if parsed.netloc == self.host else "external"
+            self.links[group].append({"href": absolute, "text": text})
+
+def html_to_markdown(html: str, base_url: str) -> HtmlDocument:
+    """Convert an HTML page to markdown, collecting its links and visible word count"""
+    converter = _MarkdownConverter(base_url)
+    converter.feed(html)
+    converter.close()
+    markdown = "".join(converter.out)
+    lines = [line.rstrip() for line in markdown.split("\n")]
+    markdown = _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+    return HtmlDocument(
+        title=_WHITESPACE.sub(" ", "".join(converter.title)).strip(),
+        markdown=markdown,
+        words=converter.words,
+        links=converter.links
+    )
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from utils.sqlite_store import SQLiteStore, CACHE_DIR
+from utils.content_selection import PAGE_SEPARATOR, Section, split_sections, score_section
+
+logger = logging.getLogger(__name__)
+
+# Incremental re-evaluation. The fingerprints of every crawled page and of
+# each of its paragraphs are stored with the evaluation made from them. On
+# a later crawl of the same site, the share of relevant content that was
+# added or removed is its change score: below INCREMENTAL_REUSE_THRESHOLD
+# the previous evaluation is reused without a model call, up to
+# INCREMENTAL_DELTA_MAX the model only gets the previous evaluation and the
+# changed sections, and beyond that the site is evaluated from scratch.
+INCREMENTAL_ENABLED = os.getenv("INCREMENTAL_ENABLED", "false").lower() in ("1", "true", "yes")
+INCREMENTAL_REUSE_THRESHOLD = float(os.getenv("INCREMENTAL_REUSE_THRESHOLD", "0.1"))
+INCREMENTAL_DELTA_MAX = float(os.getenv("INCREMENTAL_DELTA_MAX", "0.5"))
+SNAPSHOT_STORE_PATH = os.getenv("SNAPSHOT_STORE_PATH", str(CACHE_DIR / "snapshots.sqlite3"))
+SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", str(90 * 24 * 3600)))
+
+# Removed paragraphs are described to the model by their first line only
+REMOVED_BLOCKS_LISTED = 20
+REMOVED_BLOCK_CHARS = 160
+
+_WHITESPACE = re.compile(r"\s+")
+
+def fingerprint(text: str) -> str:
+    """Hash of text with whitespace differences ignored"""
+    normalized = _WHITESPACE.sub(" ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+def section_blocks(section: Section) -> List[str]:
+    """The paragraphs of a section, the unit changes are counted in"""
+    return [block for block in section.text.split("\n\n") if block.strip()]
+
+def section_weight(section: Section) -> float:
+    # score_section is relevance per sqrt(token); weigh whole sections by
+    # relevance and size so a changed footer counts less than a changed
+    # services page
+    return score_section(section) * section.tokens
+
+@dataclass
+class SiteFingerprint:
+    pages: Dict[str, str]  # page URL -> fingerprint of the whole page
+    blocks: Dict[str, float]  # paragraph fingerprint -> relevance weight
+    headings: Dict[str, str]  # paragraph fingerprint -> its first line, to describe removed paragraphs
+
+    def to_json(self) -> str:
+        return json.dumps({"pages": self.pages, "blocks": self.blocks, "headings": self.headings})
+
+    @classmethod
+    def from_json(cls, text: str) -> "SiteFingerprint":
+        data = json.loads(text)
+        return cls(pages=data["pages"], blocks=data["blocks"], headings=data["headings"])
+
+def fingerprint_site(content: str) -> SiteFingerprint:
+    """Fingerprints of the pages and paragraphs of crawled markdown"""
+    pages: Dict[str, str] = {}
+    for page in content.split(PAGE_SEPARATOR):
+        url, _, body = page.partition("\n")
+        pages[url[2:].strip() if url.startswith("# ") else url.strip()] = fingerprint(body)
+    blocks: Dict[str, float] = {}
+    headings: Dict[str, str] = {}
+    for section in split_sections(content):
+        # A section's weight is shared by its paragraphs in proportion to their length
+        weight = section_weight(section)
+        paragraphs = section_blocks(section)
+        size = sum(len(block) for block in paragraphs)
+        for block in paragraphs:
+            key = fingerprint(block)
+            blocks[key] = blocks.get(key, 0.0) + weight * len(block) / size
+            headings[key] = block.strip().split("\n", 1)[0][:REMOVED_BLOCK_CHARS]
+    return SiteFingerprint(pages=pages, blocks=blocks, headings=headings)
+
+@dataclass
+class SiteChange:
+    score: float  # Share of relevant content added or removed, 0 (none) to 1 (all)
+    pages_added: List[str] = field(default_factory=list)
+    pages_removed: List[str] = field(default_factory=list)
+    pages_changed: List[str] = field(default_factory=list)
+    blocks_added: int = 0
+    blocks_removed: int = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "changeScore": self.score,
+            "pagesAdded": self.pages_added,
+            "pagesRemoved": self.pages_removed,
+            "pagesChanged": self.pages_changed,
+            "blocksAdded": self.blocks_added,
+            "blocksRemoved": self.blocks_removed
+        }
+
+def compare(previous: SiteFingerprint, current: SiteFingerprint) -> SiteChange:
+    added = current.blocks.keys() - previous.blocks.keys()
+    removed = previous.blocks.keys() - current.blocks.keys()
+    total = sum(previous.blocks.values()) + sum(current.blocks.values())
+    changed_weight = sum(current.blocks[key] for key in added) + sum(previous.blocks[key] for key in removed)
+    return SiteChange(
+        score=round(changed_weight / total, 4) if total > 0 else 0.0,
+        pages_added=sorted(current.pages.keys() - previous.pages.keys()),
+        pages_removed=sorted(previous.pages.keys() - current.pages.keys()),
+        pages_changed=sorted(
+            url for url in current.pages.keys() & previous.pages.keys()
+            if current.pages[url] != previous.pages[url]
+        ),
+        blocks_added=len(added),
+        blocks_removed=len(removed)
+    )
+
+def changed_content(content: str, previous: SiteFingerprint) -> str:
+    """
+    The sections of crawled markdown with a paragraph that wasn't in the
+    previous crawl, whole for context and under their page headers
+    """
+    pages: List[str] = []
+    current_page = None
+    for section in split_sections(content):
+        if all(fingerprint(block) in previous.blocks for block in section_blocks(section)):
+            continue
+        if section.page != current_page:
+            current_page = section.page
+            pages.append(f"# {section.page_url}" if section.page_url else "")
+        pages[-1] = f"{pages[-1]}\n\n{section.text}".strip()
+    return PAGE_SEPARATOR.join(pages)
+
+def removed_blocks(previous: SiteFingerprint, current: SiteFingerprint) -> List[str]:
+    """First lines of the most relevant previous paragraphs that are gone"""
+    removed = sorted(previous.blocks.keys() - current.blocks.keys(), key=lambda key: -previous.blocks[key])
+    return [previous.headings[key] for key in removed[:REMOVED_BLOCKS_LISTED]]
+
+@dataclass
+class Snapshot:
+    fingerprint: SiteFingerprint
+    result: Dict
+    evaluated_at: float
+
+class SnapshotStore(SQLiteStore):
+    """The last model evaluation of each site with the fingerprints of the content it was made from"""
+
+    def __init__(self, path: str = SNAPSHOT_STORE_PATH, max_age: int = SNAPSHOT_MAX_AGE):
+        super().__init__(path)
+        self.max_age = max_age
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                result TEXT NOT NULL,
+                evaluated_at REAL NOT NULL
+            )
+        """)
+
+    def _get(self, key: str) -> Optional[Snapshot]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fingerprint, result, evaluated_at FROM snapshots WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[2] >= self.max_age:
+            return None
+        return Snapshot(
+            fingerprint=SiteFingerprint.from_json(row[0]), result=json.loads(row[1]), evaluated_at=row[2]
+        )
+
+    def _put(self, key: str, snapshot: Snapshot):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (key, fingerprint, result, evaluated_at) VALUES (?, ?, ?, ?)",
+                (key, snapshot.fingerprint.to_json(), json.dumps(snapshot.result), snapshot.evaluated_at)
+            )
+            conn.execute("DELETE FROM snapshots WHERE evaluated_at < ?", (now - self.max_age,))
+
+    async def get(self, key: str) -> Optional[Snapshot]:
+        try:
+            return await asyncio.to_thread(self._get, key)
+        except sqlite3.Error as e:
+            logger.error(f"Snapshot read failed: {str(e)}")
+            return None
+
+    async def put(self, key: str, snapshot: Snapshot):
+        try:
+            await asyncio.to_thread(self._put, key, snapshot)
+        except sqlite3.Error as e:
+            logger.error(f"Snapshot write failed: {str(e)}")
+
+snapshot_store = SnapshotStore()
+
+
+@dataclass
+class IncrementalPlan:
+    fingerprint: SiteFingerprint
+    mode: str  # "reuse", "delta" or "full"
+    previous: Optional[Snapshot] = None
+    change: Optional[SiteChange] = None
+
+    def report(self) -> Dict:
+        """What changed since the previous evaluation, and whether the model was called"""
+        report = {"mode": self.mode, "llmCalled": self.mode != "reuse"}
+        if self.previous is not None:
+            report["previousAgeSeconds"] = int(time.time() - self.previous.evaluated_at)
+        if self.change is not None:
+            report.update(self.change.to_dict())
+        return report
+
+async def plan_evaluation(key: str, content: str, incremental: bool) -> IncrementalPlan:
+    """
+    Fingerprint crawled content and decide how to evaluate it: reuse the
+    site's previous evaluation, update it from the changes, or evaluate in
+    full (always, when not incremental or there is no previous evaluation).
+    """
+    current = fingerprint_site(content)
+    previous = await snapshot_store.get(key) if incremental else None
+    if previous is None:
+        return IncrementalPlan(fingerprint=current, mode="full")
+    change = compare(previous.fingerprint, current)
+    if change.score < INCREMENTAL_REUSE_THRESHOLD:
+        mode = "reuse"
+    elif change.score <= INCREMENTAL_DELTA_MAX:
+        mode = "delta"
+    else:
+        mode = "full"
+    return IncrementalPlan(fingerprint=current, mode=mode, previous=previous, change=change)
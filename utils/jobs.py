@@ -0,0 +1,306 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+from utils.sqlite_store import SQLiteStore, CACHE_DIR
+from utils.pipeline import get_evaluation, PipelineError
+
+logger = logging.getLogger(__name__)
+
+# Jobs live in SQLite so that any gunicorn worker can answer GET /jobs/{id}
+# and stream its events, whichever worker is running it.
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", str(CACHE_DIR / "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(24 * 3600)))
+# Workers refresh the updated_at of the jobs they hold every heartbeat; a
+# queued or running job not refreshed within the lease was lost with its
+# worker (a restart or the OOM killer). Lost queued jobs are taken over by
+# another worker, lost running ones are failed.
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_LEASE = float(os.getenv("JOB_LEASE", "60"))
+
+TERMINAL_STATUSES = ("done", "failed")
+LOST_JOB_ERROR = "The worker running this job stopped; please submit it again"
+
+def job_is_stale(job: Dict) -> bool:
+    """Whether a job from JobStore.get is unfinished but no worker holds it"""
+    return job["status"] not in TERMINAL_STATUSES and job["updatedAt"] < time.time() - JOB_LEASE
+
+class JobStore(SQLiteStore):
+    """Job rows and their ordered progress events on local disk"""
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        super().__init__(path)
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                status_code INTEGER,
+                result TEXT,
+                error TEXT,
+                options TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "options" not in columns:
+            # Stores created before jobs could be taken over by another worker
+            conn.execute("ALTER TABLE jobs ADD COLUMN options TEXT")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            )
+        """)
+
+    def create(self, url: str, options: Dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, url, status, options, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, url, json.dumps(options), now, now)
+            )
+            # Opportunistically drop old jobs
+            expired = now - JOB_RETENTION
+            conn.execute("DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE updated_at < ?)", (expired,))
+            conn.execute("DELETE FROM jobs WHERE updated_at < ?", (expired,))
+        return job_id
+
+    def finish(self, job_id: str, status: str, data: Dict, result: Optional[Dict] = None,
+               error: Optional[str] = None, status_code: Optional[int] = None):
+        """Record a job's terminal status and event together, so either both are seen or neither"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, status_code = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, status_code, time.time(), job_id)
+            )
+            self._insert_event(conn, job_id, status, data)
+
+    def claim(self, job_id: str) -> bool:
+        """Mark a queued job running; False if another worker already took it"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+            return cursor.rowcount == 1
+
+    def touch(self, job_ids: List[str]):
+        """Renew the lease of jobs this worker holds"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                [(now, job_id) for job_id in job_ids]
+            )
+
+    def take_over_lost(self) -> List[Tuple[str, str, Dict]]:
+        """
+        Take over queued jobs whose lease ran out, renewing it, and fail
+        running ones. Returns the (id, url, options) of the queued jobs.
+        """
+        now = time.time()
+        expired = now - JOB_LEASE
+        taken = []
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, url, status, options FROM jobs "
+                "WHERE status IN ('queued', 'running') AND updated_at < ?",
+                (expired,)
+            ).fetchall()
+            for job_id, url, status, options in rows:
+                if status == "queued":
+                    cursor = conn.execute(
+                        "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'queued' AND updated_at < ?",
+                        (now, job_id, expired)
+                    )
+                    if cursor.rowcount == 1:
+                        taken.append((job_id, url, json.loads(options) if options else {}))
+                    continue
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, status_code = 500, updated_at = ? "
+                    "WHERE id = ? AND status = 'running' AND updated_at < ?",
+                    (LOST_JOB_ERROR, now, job_id, expired)
+                )
+                if cursor.rowcount == 1:
+                    logger.warning(f"Job {job_id} was lost with its worker, marked failed")
+                    self._insert_event(conn, job_id, "failed", {"error": LOST_JOB_ERROR})
+        return taken
+
+    def add_event(self, job_id: str, event: str, data: Dict):
+        with self._connect() as conn:
+            self._insert_event(conn, job_id, event, data)
+
+    def _insert_event(self, conn: sqlite3.Connection, job_id: str, event: str, data: Dict):
+        conn.execute(
+            "INSERT INTO job_events (job_id, seq, event, data, created_at) "
+            "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM job_events WHERE job_id = ?",
+            (job_id, event, json.dumps(data), time.time(), job_id)
+        )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, url, status, status_code, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "id": row[0],
+            "url": row[1],
+            "status": row[2],
+            "createdAt": row[6],
+            "updatedAt": row[7]
+        }
+        if row[4] is not None:
+            job["result"] = json.loads(row[4])
+        if row[5] is not None:
+            job["error"] = row[5]
+            job["statusCode"] = row[3]
+        return job
+
+    def events_since(self, job_id: str, seq: int) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, seq)
+            ).fetchall()
+        return [{"seq": row[0], "event": row[1], "data": json.loads(row[2])} for row in rows]
+
+class JobEvents:
+    """Writes one job's progress events in order, off the event loop"""
+
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._write())
+
+    def add(self, event: str, data: Dict):
+        self._queue.put_nowait((event, data))
+
+    async def _write(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            try:
+                await asyncio.to_thread(self.store.add_event, self.job_id, *item)
+            except sqlite3.Error as e:
+                logger.error(f"Job {self.job_id}: failed to record {item[0]} event: {str(e)}")
+
+    async def close(self):
+        """Wait until every event added so far is written"""
+        self._queue.put_nowait(None)
+        await self._task
+
+class JobManager:
+    """Per-worker pool of background tasks that run queued evaluation jobs"""
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Queued and running jobs of this worker, whose leases it renews
+        self._held: Set[str] = set()
+        self.taken_over = 0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        # The first heartbeat also picks up jobs left behind by a worker that died
+        self._tasks.append(asyncio.ensure_future(self._heartbeat()))
+        logger.info(f"Job manager started with {self.workers} worker(s)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, url: str, options: Dict) -> str:
+        if self._queue is None:
+            self.start()
+        job_id = await asyncio.to_thread(self.store.create, url, options)
+        await asyncio.to_thread(self.store.add_event, job_id, "queued", {"url": url})
+        self._held.add(job_id)
+        self._queue.put_nowait((job_id, url, options))
+        return job_id
+
+    async def _heartbeat(self):
+        while True:
+            try:
+                if self._held:
+                    await asyncio.to_thread(self.store.touch, list(self._held))
+                for job_id, url, options in await asyncio.to_thread(self.store.take_over_lost):
+                    logger.warning(f"Job {job_id} was lost with its worker, queued again here")
+                    self.taken_over += 1
+                    self._held.add(job_id)
+                    self._queue.put_nowait((job_id, url, options))
+            except sqlite3.Error as e:
+                logger.error(f"Job heartbeat failed: {str(e)}")
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+
+    async def _worker(self):
+        while True:
+            job_id, url, options = await self._queue.get()
+            try:
+                await self._run(job_id, url, options)
+            except Exception as e:
+                # Never let one job take a worker down with it
+                logger.error(f"Job {job_id} could not be recorded: {str(e)}")
+            finally:
+                self._held.discard(job_id)
+
+    async def _run(self, job_id: str, url: str, options: Dict):
+        # Progress events arrive synchronously from the pipeline; they are
+        # written in the background so the event loop never waits on SQLite
+        if not await asyncio.to_thread(self.store.claim, job_id):
+            # Taken over by another worker while this one was busy
+            return
+        events = JobEvents(self.store, job_id)
+        try:
+            # Accepted jobs wait for a crawl slot rather than being shed
+            evaluation = await get_evaluation(url, progress=events.add, shed_load=False, **options)
+        except PipelineError as e:
+            status, fields, data = "failed", {"error": e.message, "status_code": e.status_code}, e.to_dict()
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            status, fields, data = "failed", {"error": str(e), "status_code": 500}, {"error": str(e)}
+        else:
+            status, fields, data = "done", {"result": evaluation.result}, {"cache": evaluation.cache_status}
+        finally:
+            await events.close()
+        # The terminal event ends event streams, so it goes after every progress event
+        await asyncio.to_thread(self.store.finish, job_id, status, data, **fields)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "held": len(self._held),
+            "taken_over": self.taken_over
+        }
+
+_manager: Optional[JobManager] = None
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        _manager = JobManager(JobStore())
+    return _manager
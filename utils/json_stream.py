@@ -0,0 +1,80 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+class IncrementalJSONParser:
+    """
+    Incrementally parse the top-level fields of a JSON object as it streams in.
+
+    Text before the first "{" (prose, a ```json fence) is ignored. Each time a
+    top-level value is complete, feed() returns it as a (key, value) pair, so
+    early fields can be used before the rest of the document has arrived.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._value_start = None  # Index just after the ":" of the current top-level value
+        self._key_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk of text; return the top-level fields it completed"""
+        self.buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        text = self.buffer
+
+        while self._pos < len(text) and not self.complete:
+            ch = text[self._pos]
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._key_start = self._pos + 1
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_field(text, completed)
+                    self.complete = True
+            elif self._depth == 1:
+                if ch == ":" and self._value_start is None:
+                    self._value_start = self._pos + 1
+                elif ch == ",":
+                    self._finish_field(text, completed)
+                    self._key_start = self._pos + 1
+            self._pos += 1
+
+        return completed
+
+    def _finish_field(self, text: str, completed: List[Tuple[str, Any]]):
+        if self._value_start is None:
+            return
+        key_text = text[self._key_start:self._value_start - 1].strip()
+        value_text = text[self._value_start:self._pos].strip()
+        self._value_start = None
+        try:
+            key = json.loads(key_text, strict=False)
+            value = json.loads(value_text, strict=False)
+        except json.JSONDecodeError:
+            # Leave malformed fields to the caller's full-document fallback
+            return
+        self.fields[key] = value
+        completed.append((key, value))
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from utils.sqlite_store import SQLiteStore, CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Parsed evaluations keyed by exactly what was sent to the model. Entries are
+# evicted least-recently-used first beyond LLM_CACHE_MAX_BYTES and expire after LLM_CACHE_MAX_AGE.
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(CACHE_DIR / "llm.sqlite3"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+LLM_CACHE_MAX_AGE = int(os.getenv("LLM_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+
+@dataclass
+class CachedCompletion:
+    result: Dict
+    tokens: int
+
+def completion_key(content: str, model: str, prompt_version: str, temperature: float,
+                   response_format: str) -> str:
+    """Hash of everything that determines the model's answer"""
+    payload = json.dumps([content, model, prompt_version, temperature, response_format])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache(SQLiteStore):
+    """On-disk cache of parsed evaluations keyed by prompt content hash"""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        max_age: int = LLM_CACHE_MAX_AGE
+    ):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age > 0 and self.max_bytes > 0
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)")
+
+    def _get(self, key: str) -> Optional[CachedCompletion]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result, tokens, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[2] >= self.max_age:
+                conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+        return CachedCompletion(result=json.loads(row[0]), tokens=row[1])
+
+    def _put(self, key: str, result: Dict, tokens: int):
+        now = time.time()
+        data = json.dumps(result)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, result, tokens, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, data, tokens, len(data), now, now)
+            )
+            conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.max_age,))
+            # Evict least-recently-used entries until the total size fits
+            conn.execute("""
+                DELETE FROM completions WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS running
+                        FROM completions
+                    ) WHERE running > ?
+                )
+            """, (self.max_bytes,))
+
+    async def get(self, key: str) -> Optional[CachedCompletion]:
+        if not self.enabled:
+            return None
+        try:
+            entry = await asyncio.to_thread(self._get, key)
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache read failed: {str(e)}")
+            entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.tokens_saved += entry.tokens
+        return entry
+
+    async def put(self, key: str, result: Dict, tokens: int):
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._put, key, result, tokens)
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache write failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age,
+            "hits": self.hits,
+            "misses": self.misses,
+            "tokens_saved": self.tokens_saved
+        }
+
+llm_cache = LLMCache()
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# OpenAI limits for the whole deployment; each gunicorn worker takes an equal
+# share. 0 disables a limit. Other providers set their own (see llm_providers).
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "500"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "300000"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "4")))  # gunicorn workers (the Procfile runs 4)
+# Adaptive concurrency bounds per worker: halved on a 429, grown by one per
+# window of successful calls
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Retries of rate-limited, timed-out and 5xx calls, all within one deadline
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
+LLM_REQUEST_DEADLINE = float(os.getenv("LLM_REQUEST_DEADLINE", "180"))
+
+class RateLimited(Exception):
+    """A provider rejected the call for exceeding its rate limits"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TransientError(Exception):
+    """A provider failure (overload, 5xx) worth retrying"""
+
+class DeadlineExceeded(Exception):
+    """The call could not complete, including retries, before its deadline"""
+
+class Superseded(Exception):
+    """Another backend's answer won the race; the call is abandoned, not failed"""
+
+# The openai package takes a large share of a worker's import time, so its
+# exceptions are looked up on the first model call rather than at import
+@lru_cache(maxsize=None)
+def throttle_errors() -> Tuple[type, ...]:
+    import openai
+    return (openai.RateLimitError, RateLimited)
+
+@lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[type, ...]:
+    import openai
+    return throttle_errors() + (
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+        TransientError,
+        httpx.TransportError,
+        asyncio.TimeoutError,
+    )
+
+class TokenBucket:
+    """
+    Refills at `rate` units per second up to `capacity`. A caller may take
+    more than is left; the balance goes negative and later callers wait it off,
+    so estimates can be corrected with adjust() once actual usage is known.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float, deadline_at: float):
+        if self.rate <= 0:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # One waiter at a time keeps the bucket FIFO
+        async with self._lock:
+            while True:
+                self._refill()
+                # A request larger than the bucket only needs it full
+                if self._level >= min(amount, self.capacity):
+                    self._level -= amount
+                    return
+                wait = (min(amount, self.capacity) - self._level) / self.rate
+                if time.monotonic() + wait > deadline_at:
+                    raise DeadlineExceeded("LLM rate limit wait exceeds the request deadline")
+                await asyncio.sleep(wait)
+
+    def adjust(self, amount: float):
+        if self.rate <= 0:
+            return
+        self._refill()
+        self._level = min(self.capacity, self._level - amount)
+
+    @property
+    def level(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return self._level
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: each success grows the limit by 1/limit (about one
+    per window of calls), and a throttled call halves it. Throttles within
+    `cooldown` seconds of the last decrease count once.
+    """
+
+    def __init__(self, minimum: int, maximum: int, cooldown: float = 5.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(max(self.minimum, self.maximum // 2))
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+    async def acquire(self, deadline_at: float):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded("Timed out waiting for an LLM slot")
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded("Timed out waiting for an LLM slot")
+            self.in_flight += 1
+
+    async def release(self, throttled: bool = False):
+        async with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self._last_decrease = now
+                    logger.warning(f"LLM rate limited, concurrency limit lowered to {int(self.limit)}")
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+def retry_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, or the server's Retry-After if it sent one"""
+    retry_after = getattr(error, "retry_after", None)
+    response = getattr(error, "response", None)
+    if retry_after is None and response is not None:
+        retry_after = response.headers.get("retry-after")
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), LLM_RETRY_MAX_DELAY)
+    except ValueError:
+        pass
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+class LLMDispatcher:
+    """
+    Per-worker gate for every model call: request and token buckets sized to
+    this worker's share of the provider limits, an adaptive concurrency limit,
+    and jittered retries bounded by a deadline.
+    """
+
+    def __init__(
+        self,
+        rpm: int = LLM_RPM_LIMIT,
+        tpm: int = LLM_TPM_LIMIT,
+        workers: int = WEB_CONCURRENCY,
+        min_concurrency: int = LLM_MIN_CONCURRENCY,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        deadline: float = LLM_REQUEST_DEADLINE
+    ):
+        rpm_share = rpm / workers
+        tpm_share = tpm / workers
+        # Bursts of up to ~10 seconds' worth of the share
+        self.requests = TokenBucket(rpm_share / 60.0, max(1.0, rpm_share / 6.0))
+        self.tokens = TokenBucket(tpm_share / 60.0, max(1.0, tpm_share / 6.0))
+        self.concurrency = AdaptiveLimiter(min_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.queued = 0
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def run(
+        self,
+        attempt: Callable[[], Awaitable[T]],
+        estimated_tokens: int,
+        usage: Optional[Callable[[T], int]] = None,
+        deadline: Optional[float] = None
+    ) -> T:
+        """
+        Run attempt() under the limits, retrying retryable errors with backoff.
+        usage(result), if given, returns the tokens actually used so the token
+        bucket can be corrected from the estimate.
+        """
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        retry = 0
+        while True:
+            waited = time.monotonic()
+            self.queued += 1
+            try:
+                await self.requests.acquire(1, deadline_at)
+                await self.tokens.acquire(estimated_tokens, deadline_at)
+                await self.concurrency.acquire(deadline_at)
+            finally:
+                self.queued -= 1
+            waited = time.monotonic() - waited
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.calls += 1
+
+            throttled = False
+            try:
+                remaining = deadline_at - time.monotonic()
+                result = await asyncio.wait_for(attempt(), timeout=remaining)
+            except retryable_errors() as e:
+                throttled = isinstance(e, throttle_errors())
+                if throttled:
+                    # A rejected request used no tokens
+                    self.throttled += 1
+                    self.tokens.adjust(-estimated_tokens)
+                if retry >= self.max_retries:
+                    self.failures += 1
+                    raise
+                delay = retry_delay(retry, e)
+                if time.monotonic() + delay >= deadline_at:
+                    self.failures += 1
+                    raise
+                logger.warning(f"LLM call failed ({type(e).__name__}), retry {retry + 1} in {delay:.1f}s")
+            except Superseded:
+                raise
+            except Exception:
+                self.failures += 1
+                raise
+            else:
+                if usage is not None:
+                    self.tokens.adjust(usage(result) - estimated_tokens)
+                return result
+            finally:
+                await self.concurrency.release(throttled)
+
+            self.retries += 1
+            retry += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict:
+        calls = max(1, self.calls)
+        return {
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+            "queued": self.queued,
+            "request_tokens_available": round(self.requests.level, 1),
+            "llm_tokens_available": round(self.tokens.level),
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "wait_avg": round(self.wait_total / calls, 3),
+            "wait_max": round(self.wait_max, 3)
+        }
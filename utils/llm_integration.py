@@ -1,18 +1,73 @@
 import os
-from openai import AsyncOpenAI
 import json
+import logging
 from dotenv import load_dotenv
 import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-# Load environment variables
+# Load environment variables before the modules below read their settings
+# (backends, rate limits, hedging, caches) at import
 load_dotenv()
 
-# Get API key
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY environment variable is not set")
+from utils.json_stream import IncrementalJSONParser
+from utils.evaluation_schema import SECTION_NAMES, validate_sections
+from utils.content_selection import select_content, CONTENT_TOKEN_BUDGET
+from utils.llm_cache import llm_cache, completion_key
+from utils.llm_providers import Backend, Router, create_router
+from utils.metrics import LLM_PARSE_DURATION
 
-client = AsyncOpenAI(api_key=api_key)
+logger = logging.getLogger(__name__)
+
+# Point at any OpenAI-compatible server, e.g. a local stand-in for testing
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or os.getenv("OPENAI_BASE_URL")
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4")
+LLM_TEMPERATURE = 0.5
+
+# How the model is asked for JSON: "json_schema" (structured outputs, the model
+# is constrained to the PartnerEvaluation schema), "json_object" or "none".
+# By default structured outputs are used on the models that support them.
+_STRUCTURED_OUTPUT_MODELS = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+LLM_RESPONSE_FORMAT = os.getenv(
+    "LLM_RESPONSE_FORMAT",
+    "json_schema" if LLM_MODEL.startswith(_STRUCTURED_OUTPUT_MODELS) else "none"
+)
+# Follow-up requests for sections that were missing or invalid in the answer
+LLM_REPAIR_ATTEMPTS = int(os.getenv("LLM_REPAIR_ATTEMPTS", "1"))
+
+_router: Optional[Router] = None
+
+def get_router() -> Router:
+    """
+    The process-wide model router, created on first use so that importing
+    this module needs neither the openai package nor an API key. OpenAI
+    first, hedged to Anthropic when ANTHROPIC_API_KEY is set (see
+    utils.llm_providers).
+    """
+    global _router
+    if _router is None:
+        client = None
+        api_key = os.getenv("OPENAI_API_KEY")
+        if api_key:
+            from openai import AsyncOpenAI
+            # Retries are done by utils.llm_dispatch, which also applies the rate limits
+            client = AsyncOpenAI(api_key=api_key, base_url=LLM_BASE_URL, max_retries=0)
+        # Raises ValueError if neither OPENAI_API_KEY nor ANTHROPIC_API_KEY is set
+        _router = create_router(client, LLM_MODEL, LLM_RESPONSE_FORMAT, LLM_TEMPERATURE)
+    return _router
+
+def router_stats() -> Dict:
+    return _router.stats() if _router is not None else {}
+
+async def close_router():
+    global _router
+    if _router is not None:
+        await _router.close()
+        _router = None
+
+# Bump whenever SYSTEM_PROMPT, build_prompt or the result schema changes so
+# cached answers to the old prompt are not reused
+PROMPT_VERSION = "2"
 
 def clean_json_string(s: str) -> str:
     """Clean and validate JSON string from GPT response."""
@@ -25,20 +80,39 @@ def clean_json_string(s: str) -> str:
     json_str = s[start:end]
     # Remove any markdown code block syntax
     json_str = re.sub(r'```json\s*|\s*```', '', json_str)
-    # Replace any escaped newlines
-    json_str = json_str.replace('\\n', ' ')
     return json_str
 
-async def evaluate_partner(content: str) -> dict:
+def parse_response(text: str) -> Dict[str, Any]:
     """
-    Evaluate if the website content indicates a potential partner.
-    Returns a comprehensive analysis dictionary.
+    Parse the model's answer into a dict. If the answer is not valid JSON
+    (e.g. truncated), the top-level fields that were complete are returned
+    so that only the rest has to be repaired.
     """
-    prompt = f"""Analyze this website to determine if it represents a potential partner/affiliate for accessiBe's web accessibility solutions. 
+    try:
+        # strict=False accepts raw control characters (newlines) inside strings
+        parsed = json.loads(clean_json_string(text), strict=False)
+        if isinstance(parsed, dict):
+            return parsed
+    except (ValueError, json.JSONDecodeError) as e:
+        logger.warning(f"Failed to parse JSON: {str(e)}")
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.fields
+
+SYSTEM_PROMPT = """You are an expert at evaluating business partnership opportunities, specifically for SaaS and digital solutions. 
+                Focus on finding partners who can reach many website owners or influence digital accessibility decisions.
+                Consider both explicit statements and implicit indicators in the content.
+                Be precise in categorizing and scoring potential partners.
+                Ensure all numeric scores are integers.
+                Format the response as a valid JSON object."""
+
+def build_prompt(content: str) -> str:
+    """Build the evaluation prompt for the scraped website content"""
+    return f"""Analyze this website to determine if it represents a potential partner/affiliate for accessiBe's web accessibility solutions. 
 Provide a comprehensive analysis covering all aspects below.
 
 Content to analyze:
-{content[:4000]}
+{content}
 
 Analyze and provide detailed information for each category:
 
@@ -158,50 +232,177 @@ Respond with a JSON object containing these fields and structure:
 
 Ensure all numeric scores are integers and arrays contain actual findings, not placeholder text.
 """
+
+def build_delta_prompt(previous: Dict[str, Any], changed: str, removed: List[str]) -> str:
+    """Build the prompt that updates a previous evaluation from the changed parts of the website"""
+    removed_list = "\n".join(f"- {line}" for line in removed) or "(none)"
+    return f"""This website was evaluated before as a potential partner/affiliate for accessiBe's web accessibility solutions. Its content has changed since.
+
+Previous evaluation:
+{json.dumps(previous)}
+
+New or changed content:
+{changed or "(none)"}
+
+Paragraphs no longer on the website (first line of each):
+{removed_list}
+
+Update the previous evaluation to reflect these changes. Keep findings that the changes do not affect, revise scores only where the changes justify it, and remove findings that relied on removed content.
+
+Respond with the complete updated evaluation as a JSON object with exactly the same fields and structure as the previous evaluation. Ensure all numeric scores are integers.
+"""
+
+WinnerCallback = Callable[[Backend], None]
+
+async def stream_completion(
+    messages: list,
+    on_field: Callable[[str, Any], None],
+    on_winner: Optional[WinnerCallback] = None
+) -> Tuple[str, Optional[dict], int]:
+    """
+    Stream a chat completion, calling on_field for each top-level JSON field
+    as soon as it is complete. Returns the full response text, the parsed
+    object if the stream contained a complete one, and the total tokens used.
+    on_winner(backend), if given, is told which backend answered.
+    """
+    return await get_router().stream(messages, on_field, on_winner)
+
+async def complete(messages: list, sections: Optional[List[str]] = None,
+                   on_winner: Optional[WinnerCallback] = None) -> Tuple[str, int]:
+    """Run a chat completion for the given sections (all by default); returns the text and tokens used"""
+    return await get_router().complete(
+        messages, sections, validate=lambda text: bool(parse_response(text)), on_winner=on_winner
+    )
+
+async def repair_sections(messages: list, response_text: str, bad: List[str],
+                          on_winner: Optional[WinnerCallback] = None) -> Tuple[Dict[str, Any], int]:
+    """
+    Ask the model again for only the sections that were missing or invalid
+    in its previous answer. Returns the parsed sections and tokens used.
+    """
+    repair_messages = messages + [
+        {"role": "assistant", "content": response_text},
+        {"role": "user", "content": (
+            f"These fields were missing or invalid in your response: {', '.join(bad)}. "
+            "Respond with a JSON object containing only these fields, using the structure "
+            "requested above. Ensure all numeric scores are integers."
+        )}
+    ]
+    text, tokens = await complete(repair_messages, bad, on_winner)
+    return parse_response(text), tokens
+
+async def evaluate_partner(
+    content: str,
+    on_field: Optional[Callable[[str, Any], None]] = None,
+    token_budget: int = CONTENT_TOKEN_BUDGET
+) -> dict:
+    """
+    Evaluate if the website content indicates a potential partner.
+    Returns a comprehensive analysis dictionary.
+
+    The most relevant sections of the content are packed into token_budget
+    tokens (see utils.content_selection) before building the prompt.
+
+    If on_field is given the completion is streamed, and on_field(key, value)
+    is called for each top-level field (probability, reachScore, ...) as soon
+    as the model has emitted it.
+
+    The answer is validated section by section against PartnerEvaluation
+    (see utils.evaluation_schema). Missing or invalid sections are requested
+    again on their own, up to LLM_REPAIR_ATTEMPTS times, instead of failing
+    the whole evaluation.
+
+    Parsed results are cached by a hash of the selected content, primary
+    backend and model, prompt version, temperature and response format, so
+    unchanged content never triggers a second model call.
+    """
+    selected = select_content(content, token_budget)
+    return await run_evaluation(build_prompt(selected), selected, PROMPT_VERSION, on_field)
+
+async def evaluate_partner_delta(
+    previous: Dict[str, Any],
+    changed: str,
+    removed: List[str],
+    on_field: Optional[Callable[[str, Any], None]] = None,
+    token_budget: int = CONTENT_TOKEN_BUDGET
+) -> dict:
+    """
+    Update a previous evaluation from only the parts of the site that changed.
+
+    changed is markdown of the new or edited sections (see
+    utils.incremental), packed into token_budget tokens like the content of
+    a full evaluation; removed lists the first lines of paragraphs that are
+    gone. Validation, repair, streaming and caching are as in evaluate_partner.
+    """
+    selected = select_content(changed, token_budget)
+    prompt = build_delta_prompt(previous, selected, removed)
+    return await run_evaluation(prompt, prompt, f"{PROMPT_VERSION}-delta", on_field)
+
+async def run_evaluation(
+    prompt: str,
+    cache_content: str,
+    prompt_version: str,
+    on_field: Optional[Callable[[str, Any], None]] = None
+) -> dict:
+    """
+    Get, validate and cache the evaluation answering prompt. The cache key
+    is a hash of cache_content and prompt_version with the primary backend's
+    model and settings.
+
+    Only answers produced entirely by the primary backend are cached: the key
+    is computed before the call, when it is not yet known whether a hedged
+    or failed-over backend will answer, and another backend's answer must
+    not be served later as the primary model's.
+    """
+    primary = get_router().backends[0]
+    cache_key = completion_key(
+        cache_content, f"{primary.name}:{primary.model}", prompt_version, LLM_TEMPERATURE, LLM_RESPONSE_FORMAT
+    )
+    cached = await llm_cache.get(cache_key)
+    if cached is not None:
+        if on_field is not None:
+            for key, value in cached.result.items():
+                on_field(key, value)
+        return cached.result
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
     
+    answered_by = set()
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": """You are an expert at evaluating business partnership opportunities, specifically for SaaS and digital solutions. 
-                Focus on finding partners who can reach many website owners or influence digital accessibility decisions.
-                Consider both explicit statements and implicit indicators in the content.
-                Be precise in categorizing and scoring potential partners.
-                Ensure all numeric scores are integers.
-                Format the response as a valid JSON object."""},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5
-        )
-        
-        # Get the response content and clean it
-        response_text = response.choices[0].message.content
-        cleaned_json = clean_json_string(response_text)
+        if on_field is not None:
+            response_text, streamed, tokens = await stream_completion(messages, on_field, answered_by.add)
+        else:
+            response_text, tokens = await complete(messages, on_winner=answered_by.add)
+            streamed = None
         
-        try:
-            # Parse the JSON response
-            result = json.loads(cleaned_json)
-            
-            # Validate all required fields are present
-            required_fields = [
-                "probability", "reachScore", "relevanceScore", "reasoning", 
-                "category", "businessProfile", "technicalAssessment", 
-                "marketPosition", "clientRelationships", "businessModel",
-                "complianceGrowth", "partnershipEvaluation", "indicators", 
-                "salesPitch"
-            ]
-            
-            missing_fields = [field for field in required_fields if field not in result]
-            if missing_fields:
-                raise Exception(f"Missing required fields: {', '.join(missing_fields)}")
-            
-            return result
-            
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON: {str(e)}")
-            print(f"Response text: {response_text}")
-            print(f"Cleaned JSON: {cleaned_json}")
-            raise Exception("Failed to parse GPT response as JSON")
+        # Use the stream's parse if it completed, otherwise parse the text
+        with LLM_PARSE_DURATION.time():
+            data = streamed if streamed is not None else parse_response(response_text)
+            valid, bad = validate_sections(data)
+
+        for attempt in range(LLM_REPAIR_ATTEMPTS):
+            if not bad:
+                break
+            logger.warning(f"Repairing fields (attempt {attempt + 1}): {', '.join(bad)}")
+            repaired, repair_tokens = await repair_sections(messages, response_text, bad, answered_by.add)
+            tokens += repair_tokens
+            fixed, bad = validate_sections({**repaired, **valid})
+            if on_field is not None:
+                for key in fixed.keys() - valid.keys():
+                    on_field(key, fixed[key])
+            valid = fixed
+
+        if bad:
+            logger.debug(f"Response text: {response_text}")
+            raise Exception(f"Missing or invalid fields: {', '.join(bad)}")
+
+        result = {name: valid[name] for name in SECTION_NAMES}
+        if answered_by == {primary}:
+            await llm_cache.put(cache_key, result, tokens)
+        return result
         
     except Exception as e:
-        raise Exception(f"Failed to evaluate content: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Failed to evaluate content: {str(e)}") 
@@ -0,0 +1,463 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+from utils.json_stream import IncrementalJSONParser
+from utils.evaluation_schema import section_model, response_format
+from utils.content_selection import count_tokens
+from utils.metrics import LLM_REQUESTS_IN_FLIGHT, LLM_REQUEST_DURATION, record_tokens
+from utils.llm_dispatch import (
+    LLMDispatcher, RateLimited, Superseded, TransientError, retryable_errors, LLM_REQUEST_DEADLINE
+)
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Completion tokens reserved from the rate limit per call until actual usage is known
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "1000"))
+
+# Backends in order of preference; unconfigured ones (no API key) are skipped
+LLM_BACKENDS = [name.strip() for name in os.getenv("LLM_BACKENDS", "openai,anthropic").split(",") if name.strip()]
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-sonnet-4-5")
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com")
+ANTHROPIC_MAX_TOKENS = int(os.getenv("ANTHROPIC_MAX_TOKENS", "4096"))
+ANTHROPIC_RPM_LIMIT = int(os.getenv("ANTHROPIC_RPM_LIMIT", "50"))
+ANTHROPIC_TPM_LIMIT = int(os.getenv("ANTHROPIC_TPM_LIMIT", "40000"))
+
+# Hedging: if the primary backend has not answered within its observed p90
+# latency, the same request is sent to the next backend and the first valid
+# answer wins. Until LLM_HEDGE_MIN_SAMPLES latencies are recorded the delay is
+# LLM_HEDGE_DEFAULT_DELAY.
+LLM_HEDGE = os.getenv("LLM_HEDGE", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "30"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1"))
+LATENCY_WINDOW = 200
+
+FieldCallback = Callable[[str, Any], None]
+
+class StreamInterrupted(Exception):
+    """A stream failed after fields were already delivered, so it is not retried"""
+
+class LatencyTracker:
+    """Recent latencies of one kind of call, for percentile estimates"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def estimate_tokens(messages: list) -> int:
+    return sum(count_tokens(message["content"]) for message in messages) + LLM_COMPLETION_TOKEN_ESTIMATE
+
+class Backend:
+    """
+    One model provider. Subclasses implement a single attempt of a complete
+    or streamed call; retries and rate limits come from the backend's own
+    dispatcher, and latencies are tracked per kind of call:
+    "complete", "repair" and "first_field" (time to the first streamed field).
+    """
+
+    name = "backend"
+
+    def __init__(self, model: str, dispatcher: LLMDispatcher):
+        self.model = model
+        self.dispatcher = dispatcher
+        self.latency: Dict[str, LatencyTracker] = {
+            "complete": LatencyTracker(), "repair": LatencyTracker(), "first_field": LatencyTracker()
+        }
+
+    async def _complete_once(self, messages: list, sections: Optional[List[str]]) -> Tuple[str, int]:
+        raise NotImplementedError
+
+    async def _stream_once(self, messages: list, parser: IncrementalJSONParser,
+                           on_field: FieldCallback) -> int:
+        """Stream one attempt into parser, calling on_field per field; returns tokens used"""
+        raise NotImplementedError
+
+    async def complete(self, messages: list, sections: Optional[List[str]] = None) -> Tuple[str, int]:
+        """Run a completion for the given sections (all by default); returns the text and tokens used"""
+        kind = "repair" if sections else "complete"
+        started = time.monotonic()
+        with LLM_REQUESTS_IN_FLIGHT.labels(self.name).track_inprogress():
+            text, tokens = await self.dispatcher.run(
+                lambda: self._complete_once(messages, sections),
+                estimate_tokens(messages),
+                usage=lambda result: result[1]
+            )
+        elapsed = time.monotonic() - started
+        self.latency[kind].record(elapsed)
+        LLM_REQUEST_DURATION.labels(self.name, kind).observe(elapsed)
+        return text, tokens
+
+    async def stream(self, messages: list, on_field: FieldCallback) -> Tuple[str, Optional[dict], int]:
+        """
+        Stream a completion, calling on_field for each top-level JSON field as
+        soon as it is complete. Returns the full response text, the parsed
+        object if the stream contained a complete one, and the tokens used.
+        """
+        started = time.monotonic()
+
+        async def attempt() -> Tuple[str, Optional[dict], int]:
+            parser = IncrementalJSONParser()
+            first = True
+
+            def field(key: str, value: Any):
+                nonlocal first
+                if first:
+                    first = False
+                    elapsed = time.monotonic() - started
+                    self.latency["first_field"].record(elapsed)
+                    LLM_REQUEST_DURATION.labels(self.name, "first_field").observe(elapsed)
+                on_field(key, value)
+
+            try:
+                tokens = await self._stream_once(messages, parser, field)
+            except retryable_errors() as e:
+                if parser.fields:
+                    raise StreamInterrupted(f"Stream interrupted: {str(e)}") from e
+                raise
+            return parser.buffer, parser.fields if parser.complete else None, tokens
+
+        with LLM_REQUESTS_IN_FLIGHT.labels(self.name).track_inprogress():
+            result = await self.dispatcher.run(attempt, estimate_tokens(messages), usage=lambda result: result[2])
+        LLM_REQUEST_DURATION.labels(self.name, "stream").observe(time.monotonic() - started)
+        return result
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict:
+        return {
+            "model": self.model,
+            "latency_p50": {kind: _round(tracker.percentile(50)) for kind, tracker in self.latency.items()},
+            "latency_p90": {kind: _round(tracker.percentile(90)) for kind, tracker in self.latency.items()},
+            "dispatch": self.dispatcher.stats()
+        }
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+class OpenAIBackend(Backend):
+    """OpenAI, or any OpenAI-compatible server, through the official client"""
+
+    name = "openai"
+
+    def __init__(self, client: "AsyncOpenAI", model: str, response_format_mode: str,
+                 temperature: float, dispatcher: LLMDispatcher):
+        super().__init__(model, dispatcher)
+        self.client = client
+        self.response_format_mode = response_format_mode
+        self.temperature = temperature
+
+    def _format_kwargs(self, sections: Optional[List[str]] = None) -> Dict[str, Any]:
+        """response_format argument for a completion returning the given sections"""
+        if self.response_format_mode == "json_schema":
+            return {"response_format": response_format(section_model(sections)) if sections else response_format()}
+        if self.response_format_mode == "json_object":
+            return {"response_format": {"type": "json_object"}}
+        return {}
+
+    async def _complete_once(self, messages: list, sections: Optional[List[str]]) -> Tuple[str, int]:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            **self._format_kwargs(sections)
+        )
+        tokens = 0
+        if response.usage:
+            tokens = response.usage.total_tokens
+            record_tokens(self.name, response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response.choices[0].message.content or "", tokens
+
+    async def _stream_once(self, messages: list, parser: IncrementalJSONParser,
+                           on_field: FieldCallback) -> int:
+        tokens = 0
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            **self._format_kwargs()
+        )
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                tokens = chunk.usage.total_tokens
+                record_tokens(self.name, chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            for key, value in parser.feed(delta):
+                on_field(key, value)
+        return tokens
+
+class AnthropicBackend(Backend):
+    """Anthropic's Messages API over plain HTTP"""
+
+    name = "anthropic"
+
+    def __init__(self, api_key: str, model: str, base_url: str, temperature: float,
+                 dispatcher: LLMDispatcher, max_tokens: int = ANTHROPIC_MAX_TOKENS):
+        super().__init__(model, dispatcher)
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the server's event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"x-api-key": self.api_key, "anthropic-version": "2023-06-01"},
+                timeout=httpx.Timeout(LLM_REQUEST_DEADLINE, connect=10)
+            )
+        return self._client
+
+    def _payload(self, messages: list, stream: bool) -> Dict:
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        return {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "system": system,
+            "messages": [
+                {"role": m["role"], "content": m["content"]} for m in messages if m["role"] != "system"
+            ],
+            "stream": stream
+        }
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code == 429:
+            raise RateLimited("Anthropic rate limit reached", response.headers.get("retry-after"))
+        # 529 is Anthropic's "overloaded"
+        if response.status_code >= 500:
+            raise TransientError(f"Anthropic error {response.status_code}: {response.text[:200]}")
+        if response.status_code >= 400:
+            raise Exception(f"Anthropic error {response.status_code}: {response.text[:200]}")
+
+    async def _complete_once(self, messages: list, sections: Optional[List[str]]) -> Tuple[str, int]:
+        response = await self._http().post("/v1/messages", json=self._payload(messages, stream=False))
+        self._check(response)
+        data = response.json()
+        text = "".join(block.get("text", "") for block in data.get("content", []) if block.get("type") == "text")
+        usage = data.get("usage") or {}
+        record_tokens(self.name, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+        return text, usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+
+    async def _stream_once(self, messages: list, parser: IncrementalJSONParser,
+                           on_field: FieldCallback) -> int:
+        input_tokens = output_tokens = 0
+        async with self._http().stream("POST", "/v1/messages", json=self._payload(messages, stream=True)) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                self._check(response)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                kind = event.get("type")
+                if kind == "message_start":
+                    input_tokens = event["message"].get("usage", {}).get("input_tokens", 0)
+                elif kind == "message_delta":
+                    output_tokens = event.get("usage", {}).get("output_tokens", output_tokens)
+                elif kind == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                    for key, value in parser.feed(event["delta"]["text"]):
+                        on_field(key, value)
+                elif kind == "error":
+                    error = event.get("error", {})
+                    if error.get("type") == "overloaded_error":
+                        raise TransientError(f"Anthropic overloaded: {error.get('message')}")
+                    raise Exception(f"Anthropic stream error: {error.get('message')}")
+        record_tokens(self.name, input_tokens, output_tokens)
+        return input_tokens + output_tokens
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class Router:
+    """
+    Sends each call to the first backend, hedging to the next one when the
+    first is slower than its usual p90 or fails outright.
+    """
+
+    def __init__(self, backends: List[Backend], hedge: bool = LLM_HEDGE):
+        if not backends:
+            raise ValueError("No LLM backend is configured")
+        self.backends = backends
+        self.hedge = hedge and len(backends) > 1
+        self.hedges = 0
+        self.failovers = 0
+        self.wins: Dict[str, int] = {backend.name: 0 for backend in backends}
+
+    def hedge_delay(self, backend: Backend, kind: str) -> float:
+        tracker = backend.latency[kind]
+        if tracker.count < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, tracker.percentile(LLM_HEDGE_PERCENTILE))
+
+    async def _race(self, call: Callable[[Backend, Callable[[], bool]], Awaitable[Any]], kind: str,
+                    on_winner: Optional[Callable[[Backend], None]] = None) -> Any:
+        """
+        Run call(backend, claim) on the primary, and on the next backend if the
+        primary is slow or fails. An attempt calls claim() before it delivers
+        anything; the first to claim wins and the other is cancelled.
+        on_winner(backend), if given, is told which backend's answer is returned.
+        """
+        primary = self.backends[0]
+        if not self.hedge:
+            result = await call(primary, lambda: True)
+            if on_winner is not None:
+                on_winner(primary)
+            return result
+
+        tasks: Dict[asyncio.Task, Backend] = {}
+        winner: Optional[Backend] = None
+
+        def claimer(backend: Backend) -> Callable[[], bool]:
+            def claim() -> bool:
+                nonlocal winner
+                if winner is None:
+                    winner = backend
+                    for task, other in tasks.items():
+                        if other is not backend:
+                            task.cancel()
+                return winner is backend
+            return claim
+
+        def start(backend: Backend):
+            tasks[asyncio.ensure_future(call(backend, claimer(backend)))] = backend
+
+        backups = list(self.backends[1:])
+        hedge_at = time.monotonic() + self.hedge_delay(primary, kind)
+        error: Optional[BaseException] = None
+        start(primary)
+        try:
+            while True:
+                pending = {task for task in tasks if not task.done()}
+                if not pending:
+                    if winner is not None or not backups:
+                        break
+                    # Everything started so far failed: fail over to the next backend
+                    self.failovers += 1
+                    start(backups.pop(0))
+                    continue
+                timeout = None
+                if len(tasks) == 1 and backups and winner is None:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The primary is slower than its usual p90: hedge
+                    backend = backups.pop(0)
+                    self.hedges += 1
+                    logger.info(f"Hedging slow {primary.name} call to {backend.name}")
+                    start(backend)
+                    continue
+                for task in done:
+                    backend = tasks[task]
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        if claimer(backend)():
+                            self.wins[backend.name] += 1
+                            if on_winner is not None:
+                                on_winner(backend)
+                            return task.result()
+                        continue
+                    if isinstance(task.exception(), Superseded):
+                        continue
+                    error = task.exception()
+                    logger.warning(f"LLM backend {backend.name} failed: {str(error)}")
+                    if winner is backend:
+                        raise error
+            raise error or Exception("All LLM backends failed")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def complete(self, messages: list, sections: Optional[List[str]] = None,
+                       validate: Optional[Callable[[str], bool]] = None,
+                       on_winner: Optional[Callable[[Backend], None]] = None) -> Tuple[str, int]:
+        """
+        Run a completion on the fastest backend. validate(text), if given,
+        rejects answers so that a hedged backend's answer can win instead.
+        """
+        async def call(backend: Backend, claim: Callable[[], bool]) -> Tuple[str, int]:
+            text, tokens = await backend.complete(messages, sections)
+            if validate is not None and not validate(text):
+                raise Exception(f"Invalid answer from {backend.name}")
+            return text, tokens
+
+        return await self._race(call, "repair" if sections else "complete", on_winner)
+
+    async def stream(self, messages: list, on_field: FieldCallback,
+                     on_winner: Optional[Callable[[Backend], None]] = None) -> Tuple[str, Optional[dict], int]:
+        """Stream a completion from whichever backend emits its first field first"""
+        async def call(backend: Backend, claim: Callable[[], bool]) -> Tuple[str, Optional[dict], int]:
+            def field(key: str, value: Any):
+                if not claim():
+                    raise Superseded()
+                on_field(key, value)
+            return await backend.stream(messages, field)
+
+        return await self._race(call, "first_field", on_winner)
+
+    def stats(self) -> Dict:
+        return {
+            "hedging": self.hedge,
+            "hedges": self.hedges,
+            "failovers": self.failovers,
+            "wins": dict(self.wins),
+            "backends": {backend.name: backend.stats() for backend in self.backends}
+        }
+
+    async def close(self):
+        for backend in self.backends:
+            await backend.close()
+
+def create_router(openai_client: Optional["AsyncOpenAI"], openai_model: str,
+                  response_format_mode: str, temperature: float) -> Router:
+    """Build the router over the configured backends, in LLM_BACKENDS order"""
+    backends: List[Backend] = []
+    for name in LLM_BACKENDS:
+        if name == "openai" and openai_client is not None:
+            backends.append(OpenAIBackend(
+                openai_client, openai_model, response_format_mode, temperature, LLMDispatcher()
+            ))
+        elif name == "anthropic" and ANTHROPIC_API_KEY:
+            backends.append(AnthropicBackend(
+                ANTHROPIC_API_KEY, ANTHROPIC_MODEL, ANTHROPIC_BASE_URL, temperature,
+                LLMDispatcher(rpm=ANTHROPIC_RPM_LIMIT, tpm=ANTHROPIC_TPM_LIMIT)
+            ))
+    logger.info(f"LLM backends: {', '.join(backend.name for backend in backends)}")
+    return Router(backends)
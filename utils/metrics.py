@@ -0,0 +1,118 @@
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Tuple
+from utils.sqlite_store import CACHE_DIR
+
+# Every gunicorn worker writes its samples to files in this directory, and
+# /metrics in any worker aggregates all of them. prometheus_client reads the
+# variable when metrics are created, so it is set before the import below.
+METRICS_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", str(CACHE_DIR / "metrics"))
+Path(METRICS_DIR).mkdir(parents=True, exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 20, 30, 45, 60, 90, 120, 180)
+FETCH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 15, 20, 30, 60)
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "partner_http_request_duration_seconds",
+    "Time to the response headers, per route",
+    ["handler", "method", "status"],
+    buckets=STAGE_BUCKETS
+)
+WORKER_STARTUP_DURATION = Histogram(
+    "partner_worker_startup_seconds",
+    "Worker cold start: import of the app, and from its start to ready",
+    ["phase"],
+    buckets=STAGE_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "partner_http_requests_in_flight", "HTTP requests being handled", multiprocess_mode="livesum"
+)
+EVALUATIONS = Counter("partner_evaluations_total", "Evaluations served, by result cache status", ["cache"])
+
+STAGE_DURATION = Histogram(
+    "partner_stage_duration_seconds", "Time spent in a pipeline stage", ["stage"], buckets=STAGE_BUCKETS
+)
+STAGE_QUEUE_WAIT = Histogram(
+    "partner_stage_queue_seconds", "Wait for a pipeline stage slot", ["stage"], buckets=WAIT_BUCKETS
+)
+STAGE_IN_FLIGHT = Gauge(
+    "partner_stage_in_flight", "Evaluations inside a pipeline stage", ["stage"], multiprocess_mode="livesum"
+)
+
+PAGE_FETCH_DURATION = Histogram(
+    "partner_page_fetch_duration_seconds",
+    "Time to fetch one page, by how it was served (cache, http, browser or failed)",
+    ["path"],
+    buckets=FETCH_BUCKETS
+)
+HOST_QUEUE_WAIT = Histogram(
+    "partner_host_queue_seconds", "Wait for a per-host politeness slot", buckets=WAIT_BUCKETS
+)
+BROWSER_LEASE_WAIT = Histogram(
+    "partner_browser_lease_wait_seconds", "Wait for a pooled browser", buckets=WAIT_BUCKETS
+)
+BROWSER_LAUNCH_DURATION = Histogram(
+    "partner_browser_launch_seconds", "Time to launch a headless browser", buckets=FETCH_BUCKETS
+)
+
+ADMISSION_ACTIVE = Gauge(
+    "partner_admission_active_crawls", "Crawls holding a host-wide slot", multiprocess_mode="livesum"
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "partner_admission_queue_depth", "Crawls waiting for a host-wide slot", multiprocess_mode="livesum"
+)
+ADMISSION_WAIT = Histogram("partner_admission_wait_seconds", "Wait for a host-wide crawl slot", buckets=WAIT_BUCKETS)
+ADMISSION_REJECTIONS = Counter(
+    "partner_admission_rejections_total", "Crawls shed with a 503, by reason", ["reason"]
+)
+
+LLM_REQUEST_DURATION = Histogram(
+    "partner_llm_request_duration_seconds",
+    "Model call latency including retries, by backend and kind (complete, repair, stream, first_field)",
+    ["backend", "kind"],
+    buckets=STAGE_BUCKETS
+)
+LLM_REQUESTS_IN_FLIGHT = Gauge(
+    "partner_llm_requests_in_flight", "Model calls in progress", ["backend"], multiprocess_mode="livesum"
+)
+LLM_TOKENS = Counter("partner_llm_tokens_total", "Tokens used by model calls", ["backend", "type"])
+LLM_PARSE_DURATION = Histogram(
+    "partner_llm_parse_seconds", "Time to parse and validate a model answer",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+def record_tokens(backend: str, prompt: int, completion: int):
+    LLM_TOKENS.labels(backend, "prompt").inc(prompt)
+    LLM_TOKENS.labels(backend, "completion").inc(completion)
+
+@asynccontextmanager
+async def stage(name: str, semaphore) -> AsyncIterator[None]:
+    """Enter a pipeline stage through its semaphore, recording the queue wait and time inside"""
+    queued = time.monotonic()
+    async with semaphore:
+        STAGE_QUEUE_WAIT.labels(name).observe(time.monotonic() - queued)
+        with STAGE_IN_FLIGHT.labels(name).track_inprogress(), STAGE_DURATION.labels(name).time():
+            yield
+
+def render() -> Tuple[bytes, str]:
+    """All workers' metrics in the Prometheus text format"""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def reset_metrics_dir():
+    """Start from empty metrics; run once in the parent process before workers start"""
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    Path(METRICS_DIR).mkdir(parents=True, exist_ok=True)
+
+def mark_worker_dead(pid: int):
+    """Drop a dead worker's live gauges; its counters and histograms are kept"""
+    multiprocess.mark_process_dead(pid)
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from utils.sqlite_store import SQLiteStore, CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Converted pages keyed by URL, with the validators needed to revalidate them.
+# Pages younger than PAGE_CACHE_FRESH are used as-is; older ones are
+# revalidated with a conditional GET and dropped after PAGE_CACHE_MAX_AGE.
+# Least recently used pages are evicted beyond PAGE_CACHE_MAX_BYTES.
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", str(CACHE_DIR / "pages.sqlite3"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+PAGE_CACHE_FRESH = int(os.getenv("PAGE_CACHE_FRESH", "600"))
+PAGE_CACHE_MAX_AGE = int(os.getenv("PAGE_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+@dataclass
+class CachedPage:
+    url: str  # Final URL after redirects
+    markdown: str
+    links: Dict[str, List[Dict[str, str]]] = field(default_factory=dict)
+    title: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    fetched_at: float = 0.0
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() - self.fetched_at < PAGE_CACHE_FRESH
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class PageCache(SQLiteStore):
+    """On-disk cache of crawled pages for conditional revalidation"""
+
+    def __init__(
+        self,
+        path: str = PAGE_CACHE_PATH,
+        max_bytes: int = PAGE_CACHE_MAX_BYTES,
+        max_age: int = PAGE_CACHE_MAX_AGE
+    ):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.fresh_hits = 0
+        self.revalidated = 0
+        self.unchanged = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age > 0 and self.max_bytes > 0
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                final_url TEXT NOT NULL,
+                markdown TEXT NOT NULL,
+                links TEXT NOT NULL,
+                title TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+
+    def _get(self, url: str) -> Optional[CachedPage]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT final_url, markdown, links, title, etag, last_modified, content_hash, fetched_at "
+                "FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[7] >= self.max_age:
+                conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                return None
+            conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (now, url))
+        return CachedPage(
+            url=row[0], markdown=row[1], links=json.loads(row[2]), title=row[3],
+            etag=row[4], last_modified=row[5], content_hash=row[6], fetched_at=row[7]
+        )
+
+    def _put(self, url: str, page: CachedPage):
+        now = time.time()
+        links = json.dumps(page.links)
+        size = len(page.markdown) + len(links)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, final_url, markdown, links, title, etag, last_modified, "
+                "content_hash, size, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, page.url, page.markdown, links, page.title, page.etag, page.last_modified,
+                 page.content_hash, size, now, now)
+            )
+            conn.execute("DELETE FROM pages WHERE fetched_at < ?", (now - self.max_age,))
+            # Evict least-recently-used pages until the total size fits
+            conn.execute("""
+                DELETE FROM pages WHERE url IN (
+                    SELECT url FROM (
+                        SELECT url, SUM(size) OVER (ORDER BY accessed_at DESC, url) AS running
+                        FROM pages
+                    ) WHERE running > ?
+                )
+            """, (self.max_bytes,))
+
+    def _touch(self, url: str):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+
+    async def get(self, url: str) -> Optional[CachedPage]:
+        if not self.enabled:
+            return None
+        try:
+            page = await asyncio.to_thread(self._get, url)
+        except sqlite3.Error as e:
+            logger.error(f"Page cache read failed: {str(e)}")
+            page = None
+        if page is None:
+            self.misses += 1
+        return page
+
+    async def put(self, url: str, page: CachedPage):
+        if not self.enabled or not page.markdown:
+            return
+        try:
+            await asyncio.to_thread(self._put, url, page)
+        except sqlite3.Error as e:
+            logger.error(f"Page cache write failed: {str(e)}")
+
+    async def touch(self, url: str):
+        """Mark a cached page as just revalidated"""
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._touch, url)
+        except sqlite3.Error as e:
+            logger.error(f"Page cache write failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "max_bytes": self.max_bytes,
+            "fresh_hits": self.fresh_hits,
+            "revalidated": self.revalidated,
+            "unchanged": self.unchanged,
+            "misses": self.misses
+        }
+
+page_cache = PageCache()
@@ -0,0 +1,432 @@
+import asyncio
+import logging
+import os
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+from utils.url_validation import validate_url, normalize_url
+from utils.crawl4ai_integration import (
+    crawl_site, ProgressCallback, CRAWL_DEADLINE, CRAWL_MAX_DEADLINE, CRAWL_CONTENT_BUDGET
+)
+from utils.llm_integration import evaluate_partner, evaluate_partner_delta
+from utils.content_selection import CONTENT_TOKEN_BUDGET
+from utils.result_cache import get_result_cache, CachedResult
+from utils.coalescing import single_flight
+from utils.prescreen import prescreen_url, PRESCREEN_ENABLED
+from utils.metrics import EVALUATIONS, stage
+from utils.admission import crawl_admission, AdmissionRejected
+from utils.incremental import (
+    plan_evaluation, changed_content, removed_blocks, snapshot_store, Snapshot, INCREMENTAL_ENABLED
+)
+
+logger = logging.getLogger(__name__)
+
+# Process-wide caps on each stage, shared by /predict and /predict/batch so a
+# large batch can't starve interactive requests of browsers or LLM capacity.
+CRAWL_STAGE_CONCURRENCY = int(os.getenv("CRAWL_STAGE_CONCURRENCY", "4"))
+LLM_STAGE_CONCURRENCY = int(os.getenv("LLM_STAGE_CONCURRENCY", "4"))
+
+CORE_SCORE_FIELDS = ("probability", "reachScore", "relevanceScore")
+
+class PipelineError(Exception):
+    """Evaluation failure carrying the HTTP status and error body to return"""
+
+    def __init__(self, status_code: int, message: str, extra: Optional[Dict] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.extra = extra or {}
+        self.headers = headers or {}
+
+    def to_dict(self) -> Dict:
+        return {"error": self.message, **self.extra}
+
+def busy_error(e: AdmissionRejected) -> PipelineError:
+    return PipelineError(
+        503,
+        "Server is busy, retry later",
+        {"reason": e.reason, "retryAfter": e.retry_after},
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def check_admission():
+    """Raise a 503 PipelineError if a new crawl would be shed right now"""
+    try:
+        crawl_admission.check()
+    except AdmissionRejected as e:
+        raise busy_error(e)
+
+_crawl_semaphore: Optional[asyncio.Semaphore] = None
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+def _stage_semaphores():
+    # Created lazily so they bind to the server's event loop, not the import-time one
+    global _crawl_semaphore, _llm_semaphore
+    if _crawl_semaphore is None:
+        _crawl_semaphore = asyncio.Semaphore(CRAWL_STAGE_CONCURRENCY)
+        _llm_semaphore = asyncio.Semaphore(LLM_STAGE_CONCURRENCY)
+    return _crawl_semaphore, _llm_semaphore
+
+def stage_stats() -> Dict:
+    crawl_semaphore, llm_semaphore = _crawl_semaphore, _llm_semaphore
+    return {
+        "crawl_limit": CRAWL_STAGE_CONCURRENCY,
+        "crawl_available": crawl_semaphore._value if crawl_semaphore else CRAWL_STAGE_CONCURRENCY,
+        "llm_limit": LLM_STAGE_CONCURRENCY,
+        "llm_available": llm_semaphore._value if llm_semaphore else LLM_STAGE_CONCURRENCY
+    }
+
+def parse_budgets(data: Dict) -> Dict:
+    """
+    Read the optional crawlDeadline, contentBudget, tokenBudget, prescreen
+    and incremental fields of a request body into keyword arguments for
+    get_evaluation.
+    """
+    try:
+        crawl_deadline = min(float(data.get("crawlDeadline") or CRAWL_DEADLINE), CRAWL_MAX_DEADLINE)
+        content_budget = int(data.get("contentBudget") or CRAWL_CONTENT_BUDGET)
+        token_budget = int(data.get("tokenBudget") or CONTENT_TOKEN_BUDGET)
+        if crawl_deadline <= 0 or content_budget <= 0 or token_budget <= 0:
+            raise ValueError("budgets must be positive")
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid budget in request: {data}")
+        raise PipelineError(400, "crawlDeadline, contentBudget and tokenBudget must be positive numbers")
+    prescreen = data.get("prescreen")
+    if prescreen is not None and not isinstance(prescreen, bool):
+        raise PipelineError(400, "prescreen must be true or false")
+    incremental = data.get("incremental")
+    if incremental is not None and not isinstance(incremental, bool):
+        raise PipelineError(400, "incremental must be true or false")
+    return {
+        "crawl_deadline": crawl_deadline,
+        "content_budget": content_budget,
+        "token_budget": token_budget,
+        "prescreen": prescreen,
+        "incremental": incremental
+    }
+
+async def evaluate_url(
+    url: str,
+    crawl_deadline: float = CRAWL_DEADLINE,
+    content_budget: int = CRAWL_CONTENT_BUDGET,
+    token_budget: int = CONTENT_TOKEN_BUDGET,
+    progress: Optional[ProgressCallback] = None,
+    prescreen: bool = False,
+    shed_load: bool = True,
+    incremental: bool = False
+) -> Dict:
+    """
+    Run the crawl and LLM stages for one URL.
+    Returns the evaluation dict with crawlStats attached; raises PipelineError on failure.
+    progress, if given, receives stage events (prescreen_finished, crawl_started,
+    page_fetched, crawl_finished, incremental, llm_started, scores, section,
+    llm_finished).
+
+    With prescreen, the homepage is scored first (see utils.prescreen) and
+    obvious non-partners are returned without the crawl and LLM stages. The
+    result's "tier" says which stage produced it: "prescreen" or "llm".
+
+    The pre-screen fetch and the crawl each need a host-wide slot from
+    utils.admission. With shed_load a busy host fails fast with a 503;
+    without it they wait for a slot in the background queue.
+
+    Every model evaluation is stored with the fingerprints of its content.
+    With incremental, a re-crawl is compared to them (see utils.incremental):
+    if little relevant content changed the stored evaluation is reused, else
+    the model updates it from the changed sections or evaluates the site
+    again. The result's "incremental" field reports the change and whether
+    the model was called.
+    """
+    def notify(event: str, data: Dict):
+        if progress:
+            progress(event, data)
+
+    # With a progress listener the LLM output is streamed: each section is
+    # forwarded as it completes, and the core scores as soon as all three exist.
+    streamed_fields: Dict = {}
+
+    def on_field(key: str, value):
+        streamed_fields[key] = value
+        notify("section", {"name": key, "value": value})
+        if key in CORE_SCORE_FIELDS and all(field in streamed_fields for field in CORE_SCORE_FIELDS):
+            notify("scores", {field: streamed_fields[field] for field in CORE_SCORE_FIELDS})
+
+    if not url:
+        raise PipelineError(400, "URL is required")
+    if not validate_url(url):
+        logger.warning(f"Invalid URL format: {url}")
+        raise PipelineError(400, "Invalid URL format")
+
+    crawl_semaphore, llm_semaphore = _stage_semaphores()
+
+    screen = None
+    homepage = None
+    if prescreen:
+        try:
+            # The homepage fetch may launch a browser, so it needs a crawl slot too
+            async with stage("prescreen", crawl_semaphore), crawl_admission.slot(shed=shed_load):
+                screen, homepage = await prescreen_url(url)
+        except AdmissionRejected as e:
+            raise busy_error(e)
+        logger.info(f"Pre-screen for {url}: {screen.stats()}")
+        notify("prescreen_finished", screen.stats())
+        if not screen.escalate:
+            result = screen.to_result()
+            notify("scores", {field: result[field] for field in CORE_SCORE_FIELDS})
+            result["tier"] = "prescreen"
+            result["prescreen"] = screen.stats()
+            return result
+
+    try:
+        # Scrape content using Crawl4AI within the crawl budgets
+        # The worker's own stage limit first, so a worker holds host-wide slots
+        # only for crawls it is ready to run
+        async with stage("crawl", crawl_semaphore), crawl_admission.slot(shed=shed_load):
+            logger.info(f"Starting content scraping for: {url}")
+            notify("crawl_started", {"url": url})
+            report = await crawl_site(
+                url,
+                deadline=crawl_deadline,
+                content_budget=content_budget,
+                progress=progress,
+                homepage=homepage
+            )
+        content = report.content
+        logger.info(f"Crawl stats for {url}: {report.stats()}")
+        notify("crawl_finished", report.stats())
+    except AdmissionRejected as e:
+        raise busy_error(e)
+    except asyncio.TimeoutError:
+        logger.error(f"Timeout while scraping {url}")
+        raise PipelineError(504, "Timeout while scraping website")
+    except Exception as e:
+        logger.error(f"Scraping error for {url}: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise PipelineError(500, f"Failed to scrape website: {str(e)}")
+
+    if not content:
+        if report.stop_reason == "deadline":
+            raise PipelineError(504, "Timeout while scraping website", {"crawlStats": report.stats()})
+        raise PipelineError(500, "Failed to retrieve content from website", {"crawlStats": report.stats()})
+    logger.info(f"Successfully scraped content, length: {len(content)}")
+
+    key = normalize_url(url)
+    plan = await plan_evaluation(key, content, incremental)
+    if incremental:
+        logger.info(f"Incremental evaluation of {url}: {plan.report()}")
+        notify("incremental", plan.report())
+
+    try:
+        if plan.mode == "reuse":
+            # Too little changed to be worth a model call
+            result = dict(plan.previous.result)
+            if progress:
+                for name, value in result.items():
+                    on_field(name, value)
+        else:
+            # Evaluate using LLM
+            async with stage("llm", llm_semaphore):
+                logger.info("Starting LLM evaluation")
+                notify("llm_started", {"contentLength": len(content)})
+                if plan.mode == "delta":
+                    result = await evaluate_partner_delta(
+                        plan.previous.result,
+                        changed_content(content, plan.previous.fingerprint),
+                        removed_blocks(plan.previous.fingerprint, plan.fingerprint),
+                        on_field=on_field if progress else None,
+                        token_budget=token_budget
+                    )
+                else:
+                    result = await evaluate_partner(
+                        content,
+                        on_field=on_field if progress else None,
+                        token_budget=token_budget
+                    )
+            # A reused evaluation keeps the fingerprints it was made from, so
+            # small changes add up across re-crawls until they are re-scored
+            await snapshot_store.put(key, Snapshot(plan.fingerprint, dict(result), time.time()))
+    except asyncio.TimeoutError:
+        logger.error("Timeout during LLM evaluation")
+        raise PipelineError(504, "Timeout during content evaluation")
+    except Exception as e:
+        logger.error(f"LLM evaluation error: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise PipelineError(500, f"Failed to evaluate content: {str(e)}")
+
+    if not result:
+        raise PipelineError(500, "Failed to generate evaluation")
+    logger.info("Successfully completed LLM evaluation")
+    notify("llm_finished", {})
+    result["tier"] = "llm"
+    if screen is not None:
+        result["prescreen"] = screen.stats()
+    result["crawlStats"] = report.stats()
+    if incremental:
+        result["incremental"] = plan.report()
+    return result
+
+@dataclass
+class Evaluation:
+    result: Dict
+    etag: str
+    cache_status: str  # "HIT", "STALE", "MISS", "REFRESH" or "COALESCED"
+    age: float = 0.0
+
+    def headers(self) -> Dict[str, str]:
+        """Cache-Control/ETag headers describing how long this result stays fresh"""
+        cache = get_result_cache()
+        max_age = max(0, int(cache.ttl - self.age))
+        return {
+            "Cache-Control": f"max-age={max_age}, stale-while-revalidate={cache.stale_ttl}",
+            "ETag": self.etag,
+            "X-Cache": self.cache_status
+        }
+
+def evaluation_key(url: str, crawl_deadline: float, content_budget: int, token_budget: int,
+                   prescreen: bool, incremental: bool) -> str:
+    """
+    Result cache and coalescing key: the normalized URL, plus any option that
+    differs from its default, so requests whose budgets or stages differ
+    never share an evaluation.
+    """
+    options = []
+    if crawl_deadline != CRAWL_DEADLINE:
+        options.append(f"crawlDeadline={crawl_deadline:g}")
+    if content_budget != CRAWL_CONTENT_BUDGET:
+        options.append(f"contentBudget={content_budget}")
+    if token_budget != CONTENT_TOKEN_BUDGET:
+        options.append(f"tokenBudget={token_budget}")
+    if prescreen != PRESCREEN_ENABLED:
+        options.append(f"prescreen={str(prescreen).lower()}")
+    if incremental != INCREMENTAL_ENABLED:
+        options.append(f"incremental={str(incremental).lower()}")
+    key = normalize_url(url)
+    return f"{key}?{'&'.join(options)}" if options else key
+
+# Keys with a background refresh in flight in this worker, and the tasks themselves
+_refreshing: Set[str] = set()
+_refresh_tasks: Set[asyncio.Task] = set()
+
+async def _evaluate_and_store(
+    key: str,
+    url: str,
+    crawl_deadline: float,
+    content_budget: int,
+    token_budget: int,
+    prescreen: bool,
+    progress: Optional[ProgressCallback] = None,
+    shed_load: bool = True,
+    incremental: bool = False
+) -> Tuple[CachedResult, bool]:
+    """
+    Run the pipeline once per key across concurrent requests and workers,
+    storing the result in the result cache. Returns (entry, coalesced).
+    """
+    cache = get_result_cache()
+
+    async def run() -> CachedResult:
+        result = await evaluate_url(
+            url,
+            crawl_deadline=crawl_deadline,
+            content_budget=content_budget,
+            token_budget=token_budget,
+            progress=progress,
+            prescreen=prescreen,
+            shed_load=shed_load,
+            incremental=incremental
+        )
+        return await cache.put(key, result)
+
+    async def shared(started: float) -> Optional[CachedResult]:
+        # Another worker held the key's lock; use its result if it stored one
+        entry = await cache.get(key, record=False)
+        if entry is not None and entry.created_at >= started:
+            return entry
+        return None
+
+    return await single_flight.run(key, run, shared if cache.enabled else None)
+
+async def _refresh(key: str, url: str, crawl_deadline: float, content_budget: int,
+                   token_budget: int, prescreen: bool, incremental: bool):
+    try:
+        await _evaluate_and_store(
+            key, url, crawl_deadline, content_budget, token_budget, prescreen, incremental=incremental
+        )
+        logger.info(f"Refreshed cached evaluation for {key}")
+    except PipelineError as e:
+        logger.warning(f"Background refresh failed for {key}: {e.message}")
+    finally:
+        _refreshing.discard(key)
+
+async def get_evaluation(
+    url: str,
+    crawl_deadline: float = CRAWL_DEADLINE,
+    content_budget: int = CRAWL_CONTENT_BUDGET,
+    token_budget: int = CONTENT_TOKEN_BUDGET,
+    force_refresh: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    prescreen: Optional[bool] = None,
+    shed_load: bool = True,
+    incremental: Optional[bool] = None
+) -> Evaluation:
+    """
+    Evaluate a URL through the persistent result cache.
+
+    Fresh entries are returned as-is. Stale entries are returned immediately
+    while a background task re-evaluates the site (stale-while-revalidate).
+    force_refresh always runs the pipeline and overwrites the cached entry.
+    Concurrent misses for the same normalized URL and options share one
+    pipeline run; progress events are only emitted by the caller that runs it.
+
+    prescreen defaults to PRESCREEN_ENABLED.
+
+    shed_load is passed to evaluate_url: cache hits are always served, but a
+    crawl on a busy host raises a 503 PipelineError unless it is False.
+    incremental defaults to INCREMENTAL_ENABLED and applies to background
+    refreshes too.
+    """
+    if not url or not validate_url(url):
+        # Let evaluate_url raise the usual 400
+        await evaluate_url(url)
+
+    cache = get_result_cache()
+    if prescreen is None:
+        prescreen = PRESCREEN_ENABLED
+    if incremental is None:
+        incremental = INCREMENTAL_ENABLED
+    key = evaluation_key(url, crawl_deadline, content_budget, token_budget, prescreen, incremental)
+
+    if not force_refresh:
+        entry = await cache.get(key)
+        if entry is not None:
+            if not entry.fresh and key not in _refreshing:
+                _refreshing.add(key)
+                task = asyncio.ensure_future(_refresh(
+                    key, url, crawl_deadline, content_budget, token_budget, prescreen, incremental
+                ))
+                _refresh_tasks.add(task)
+                task.add_done_callback(_refresh_tasks.discard)
+            EVALUATIONS.labels("HIT" if entry.fresh else "STALE").inc()
+            return Evaluation(
+                result=entry.result,
+                etag=entry.etag,
+                cache_status="HIT" if entry.fresh else "STALE",
+                age=entry.age
+            )
+
+    entry, coalesced = await _evaluate_and_store(
+        key, url, crawl_deadline, content_budget, token_budget, prescreen, progress, shed_load, incremental
+    )
+    if coalesced:
+        cache_status = "COALESCED"
+    else:
+        cache_status = "REFRESH" if force_refresh else "MISS"
+    EVALUATIONS.labels(cache_status).inc()
+    return Evaluation(
+        result=entry.result,
+        etag=entry.etag,
+        cache_status=cache_status,
+        age=entry.age
+    )
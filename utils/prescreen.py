@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from utils.content_selection import RELEVANCE_TERMS
+from utils.crawl4ai_integration import fetch_page, extract_links
+from utils.evaluation_schema import validate_sections
+
+logger = logging.getLogger(__name__)
+
+# The pre-screen scores the homepage alone and rejects obvious non-partners
+# before the full crawl and LLM call. It is off unless enabled here or by the
+# "prescreen" field of a request.
+PRESCREEN_ENABLED = os.getenv("PRESCREEN_ENABLED", "false").lower() in ("1", "true", "yes")
+# Sites scoring below this are rejected; everything else is escalated
+PRESCREEN_REJECT_THRESHOLD = float(os.getenv("PRESCREEN_REJECT_THRESHOLD", "0.2"))
+# Homepages with fewer words (e.g. rendered client-side) are always escalated
+PRESCREEN_MIN_WORDS = int(os.getenv("PRESCREEN_MIN_WORDS", "80"))
+PRESCREEN_TIMEOUT = float(os.getenv("PRESCREEN_TIMEOUT", "20"))
+# Optional JSON file with classifier weights, as written by
+# `python -m utils.prescreen train`; the built-in weights are used otherwise
+PRESCREEN_MODEL_PATH = os.getenv("PRESCREEN_MODEL_PATH", "")
+
+# Terms typical of sites that are customers or unrelated rather than partners
+NEGATIVE_TERMS = {
+    "restaurant": 2.0, "menu": 1.5, "reservation": 1.5, "recipe": 2.0, "dine": 1.0,
+    "add to cart": 2.0, "free shipping": 2.0, "checkout": 1.0, "in stock": 1.5, "size guide": 2.0,
+    "casino": 3.0, "betting": 3.0, "dating": 3.0, "lottery": 3.0,
+    "apartments": 1.5, "for sale": 1.0, "listings": 1.0, "hotel": 1.5, "booking": 1.0,
+    "church": 2.0, "sermon": 2.0, "obituar": 2.0, "horoscope": 3.0,
+}
+# Homepage links pointing at these usually mean a services or partner business
+PARTNER_LINK_TERMS = (
+    "partner", "reseller", "affiliate", "agency", "client", "service", "portfolio",
+    "case-stud", "case stud", "our-work", "our work", "hosting", "web-design", "web design",
+    "development", "solution", "integration", "accessib",
+)
+
+def _term_pattern(terms) -> "re.Pattern":
+    # Same matching rule as content_selection: short terms whole-word, longer ones as stems
+    return re.compile("|".join(
+        rf"\b{re.escape(term)}\b" if len(term) <= 4 else rf"\b{re.escape(term)}"
+        for term in sorted(terms, key=len, reverse=True)
+    ))
+
+_RELEVANCE_PATTERN = _term_pattern(RELEVANCE_TERMS)
+_NEGATIVE_PATTERN = _term_pattern(NEGATIVE_TERMS)
+_LINK_PATTERN = _term_pattern(PARTNER_LINK_TERMS)
+_WORD_PATTERN = re.compile(r"\w+")
+
+FEATURE_NAMES = ("relevance", "negative", "distinctTerms", "partnerLinks", "length")
+
+# Hand-tuned logistic weights over FEATURE_NAMES
+DEFAULT_WEIGHTS = {
+    "bias": -2.0,
+    "weights": {
+        "relevance": 1.2,
+        "negative": -1.5,
+        "distinctTerms": 2.5,
+        "partnerLinks": 3.0,
+        "length": 0.2
+    }
+}
+
+def extract_features(markdown: str, links: Optional[List[str]] = None) -> Tuple[Dict[str, float], List[str]]:
+    """
+    Lexicon features of a homepage. Returns the features and the relevance
+    terms found, most frequent first.
+    """
+    text = markdown.lower()
+    words = max(1, len(_WORD_PATTERN.findall(text)))
+    per_thousand = 1000.0 / words
+
+    relevance_hits: Dict[str, int] = {}
+    relevance = 0.0
+    for match in _RELEVANCE_PATTERN.finditer(text):
+        term = match.group(0)
+        relevance_hits[term] = relevance_hits.get(term, 0) + 1
+        relevance += RELEVANCE_TERMS[term]
+    negative = sum(NEGATIVE_TERMS[match.group(0)] for match in _NEGATIVE_PATTERN.finditer(text))
+
+    links = links or []
+    partner_links = sum(1 for link in links if _LINK_PATTERN.search(link.lower()))
+
+    features = {
+        "relevance": math.log1p(relevance * per_thousand),
+        "negative": math.log1p(negative * per_thousand),
+        # Breadth matters more than repetition of a single term
+        "distinctTerms": len(relevance_hits) / 10.0,
+        "partnerLinks": min(partner_links, 10) / 10.0,
+        "length": math.log10(words)
+    }
+    terms = sorted(relevance_hits, key=relevance_hits.get, reverse=True)
+    return features, terms
+
+def _sigmoid(x: float) -> float:
+    if x < -60:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-x))
+
+def predict(features: Dict[str, float], model: Dict = DEFAULT_WEIGHTS) -> float:
+    """Probability that the site is worth a full evaluation"""
+    weights = model["weights"]
+    return _sigmoid(model["bias"] + sum(weights.get(name, 0.0) * value for name, value in features.items()))
+
+_model: Optional[Dict] = None
+
+def get_model() -> Dict:
+    global _model
+    if _model is None:
+        _model = DEFAULT_WEIGHTS
+        if PRESCREEN_MODEL_PATH:
+            try:
+                with open(PRESCREEN_MODEL_PATH) as f:
+                    _model = json.load(f)
+                logger.info(f"Loaded pre-screen classifier from {PRESCREEN_MODEL_PATH}")
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load pre-screen classifier, using built-in weights: {str(e)}")
+    return _model
+
+@dataclass
+class Prescreen:
+    score: float
+    escalate: bool
+    reason: str
+    threshold: float = PRESCREEN_REJECT_THRESHOLD
+    features: Dict[str, float] = field(default_factory=dict)
+    terms: List[str] = field(default_factory=list)
+
+    def stats(self) -> Dict:
+        return {
+            "score": round(self.score, 3),
+            "threshold": self.threshold,
+            "escalated": self.escalate,
+            "reason": self.reason,
+            "features": {name: round(value, 3) for name, value in self.features.items()}
+        }
+
+    def to_result(self) -> Dict:
+        """An evaluation in the usual shape for a site rejected by the pre-screen"""
+        score = round(self.score * 100)
+        sections, _ = validate_sections({
+            "probability": score,
+            "reachScore": score,
+            "relevanceScore": score,
+            "reasoning": (
+                f"Rejected by the homepage pre-screen (score {self.score:.2f}, threshold "
+                f"{self.threshold:.2f}): {self.reason}. No full crawl or LLM evaluation was run."
+            ),
+            "category": "Unlikely partner",
+            "businessProfile": {},
+            "technicalAssessment": {},
+            "marketPosition": {},
+            "clientRelationships": {},
+            "businessModel": {},
+            "complianceGrowth": {},
+            "partnershipEvaluation": {},
+            "indicators": self.terms[:5],
+            "salesPitch": ""
+        })
+        return sections
+
+def screen(markdown: str, links: Optional[List[str]] = None,
+           threshold: float = PRESCREEN_REJECT_THRESHOLD) -> Prescreen:
+    """Decide from the homepage alone whether a site needs the full evaluation"""
+    words = len(_WORD_PATTERN.findall(markdown))
+    features, terms = extract_features(markdown, links)
+    score = predict(features, get_model())
+    if words < PRESCREEN_MIN_WORDS:
+        return Prescreen(score, True, f"too little homepage text ({words} words)", threshold, features, terms)
+    if score < threshold:
+        return Prescreen(score, False, "few partner indicators on the homepage", threshold, features, terms)
+    return Prescreen(score, True, "partner indicators found", threshold, features, terms)
+
+async def prescreen_url(url: str, timeout: float = PRESCREEN_TIMEOUT) -> Tuple[Prescreen, Optional[object]]:
+    """
+    Fetch and screen the homepage. Returns the decision and the crawl result,
+    so an escalated crawl can start from the page already fetched. A failed
+    fetch is escalated and left to the full crawl to report.
+    """
+    try:
+        result = await fetch_page(url, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Pre-screen fetch timed out for {url}")
+        return Prescreen(0.0, True, "homepage fetch timed out"), None
+    except Exception as e:
+        logger.warning(f"Pre-screen fetch failed for {url}: {str(e)}")
+        return Prescreen(0.0, True, "homepage fetch failed"), None
+    if not result or not result.markdown:
+        return Prescreen(0.0, True, "homepage returned no content"), result
+    return screen(result.markdown, extract_links(result)), result
+
+def train(samples: List[Dict], epochs: int = 500, learning_rate: float = 0.5, l2: float = 0.01) -> Dict:
+    """
+    Fit logistic regression weights on labeled homepages.
+    Each sample has "markdown", optional "links" and "label" (1 = worth evaluating).
+    """
+    rows = [(extract_features(s["markdown"], s.get("links"))[0], float(s["label"])) for s in samples]
+    bias = 0.0
+    weights = {name: 0.0 for name in FEATURE_NAMES}
+    for _ in range(epochs):
+        grad_bias = 0.0
+        grad = {name: 0.0 for name in FEATURE_NAMES}
+        for features, label in rows:
+            error = predict(features, {"bias": bias, "weights": weights}) - label
+            grad_bias += error
+            for name in FEATURE_NAMES:
+                grad[name] += error * features[name]
+        bias -= learning_rate * grad_bias / len(rows)
+        for name in FEATURE_NAMES:
+            weights[name] -= learning_rate * (grad[name] / len(rows) + l2 * weights[name])
+    return {"bias": bias, "weights": weights}
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the pre-screen classifier")
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("samples", help="JSONL file of {markdown, links, label} samples")
+    parser.add_argument("output", help="Where to write the weights (set PRESCREEN_MODEL_PATH to use them)")
+    parser.add_argument("--epochs", type=int, default=500)
+    args = parser.parse_args()
+
+    with open(args.samples) as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    model = train(samples, epochs=args.epochs)
+    correct = sum(
+        (predict(extract_features(s["markdown"], s.get("links"))[0], model) >= 0.5) == bool(s["label"])
+        for s in samples
+    )
+    with open(args.output, "w") as f:
+        json.dump(model, f, indent=2)
+    print(f"Trained on {len(samples)} samples, training accuracy {correct / len(samples):.1%}")
+
+if __name__ == "__main__":
+    main()
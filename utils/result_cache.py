@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from utils.sqlite_store import SQLiteStore, CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# How long an evaluation is served as fresh, how much longer it may be served
+# stale while a background refresh runs, and how many domains are kept.
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", str(CACHE_DIR / "results.sqlite3"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_STALE_TTL = int(os.getenv("RESULT_CACHE_STALE_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+
+@dataclass
+class CachedResult:
+    result: Dict
+    etag: str
+    created_at: float
+    fresh: bool
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.created_at)
+
+def make_etag(result: Dict) -> str:
+    digest = hashlib.sha256(json.dumps(result, sort_keys=True).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+class ResultCache(SQLiteStore):
+    """
+    Evaluation results on local disk, keyed by normalized URL.
+
+    Backed by SQLite in WAL mode so every gunicorn worker on the host shares
+    one store. Entries are evicted least-recently-used once max_entries is
+    exceeded, and dropped entirely after ttl + stale_ttl seconds.
+    """
+
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_PATH,
+        ttl: int = RESULT_CACHE_TTL,
+        stale_ttl: int = RESULT_CACHE_STALE_TTL,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES
+    ):
+        super().__init__(path)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                etag TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+
+    def _get(self, key: str) -> Optional[CachedResult]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result, etag, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            result, etag, created_at = row
+            age = now - created_at
+            if age >= self.ttl + self.stale_ttl:
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        return CachedResult(
+            result=json.loads(result),
+            etag=etag,
+            created_at=created_at,
+            fresh=age < self.ttl
+        )
+
+    def _put(self, key: str, result: Dict) -> CachedResult:
+        now = time.time()
+        etag = make_etag(result)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, result, etag, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(result), etag, now, now)
+            )
+            # Least-recently-used eviction beyond the size cap
+            conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        return CachedResult(result=result, etag=etag, created_at=now, fresh=True)
+
+    async def get(self, key: str, record: bool = True) -> Optional[CachedResult]:
+        """Look up a key; record=False skips the hit/miss counters for internal lookups"""
+        if not self.enabled:
+            return None
+        try:
+            entry = await asyncio.to_thread(self._get, key)
+        except sqlite3.Error as e:
+            logger.error(f"Result cache read failed for {key}: {str(e)}")
+            entry = None
+        if not record:
+            return entry
+        if entry is None:
+            self.misses += 1
+        elif entry.fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry
+
+    async def put(self, key: str, result: Dict) -> CachedResult:
+        if not self.enabled:
+            return CachedResult(result=result, etag=make_etag(result), created_at=time.time(), fresh=True)
+        try:
+            return await asyncio.to_thread(self._put, key, result)
+        except sqlite3.Error as e:
+            logger.error(f"Result cache write failed for {key}: {str(e)}")
+            return CachedResult(result=result, etag=make_etag(result), created_at=time.time(), fresh=True)
+
+    def _count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self) -> Dict:
+        try:
+            entries = self._count() if self.enabled else 0
+        except sqlite3.Error:
+            entries = None
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "stale_ttl_seconds": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses
+        }
+
+_cache: Optional[ResultCache] = None
+
+def get_result_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Before crawling, read robots.txt and the site's sitemaps so the best pages
+# can be fetched in parallel straight away instead of after the homepage.
+SITEMAP_DISCOVERY = os.getenv("SITEMAP_DISCOVERY", "true").lower() in ("1", "true", "yes")
+SITEMAP_TIMEOUT = float(os.getenv("SITEMAP_TIMEOUT", "5"))
+SITEMAP_MAX_URLS = int(os.getenv("SITEMAP_MAX_URLS", "5000"))
+SITEMAP_MAX_FILES = int(os.getenv("SITEMAP_MAX_FILES", "5"))
+SITEMAP_MAX_BYTES = int(os.getenv("SITEMAP_MAX_BYTES", str(50 * 1024 * 1024)))
+ROBOTS_MAX_BYTES = 512 * 1024
+DECOMPRESS_STEP = 256 * 1024
+
+@dataclass
+class SiteDiscovery:
+    robots_found: bool = False
+    crawl_delay: Optional[float] = None
+    sitemaps_read: int = 0
+    urls: List[str] = field(default_factory=list)
+    urls_disallowed: int = 0
+    robots: Optional[RobotFileParser] = None
+
+    def allowed(self, url: str) -> bool:
+        """Whether robots.txt lets crawlers in general ("*") fetch url; True without one"""
+        return self.robots is None or self.robots.can_fetch("*", url)
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+async def fetch_robots(client: httpx.AsyncClient, base_url: str, discovery: SiteDiscovery) -> List[str]:
+    """Read robots.txt into discovery; returns the sitemaps it lists"""
+    robots_url = urljoin(base_url, "/robots.txt")
+    try:
+        async with client.stream("GET", robots_url, headers={"Accept": "*/*"}) as response:
+            if response.status_code != 200:
+                return []
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= ROBOTS_MAX_BYTES:
+                    break
+    except httpx.HTTPError as e:
+        logger.info(f"Could not fetch {robots_url}: {type(e).__name__}")
+        return []
+
+    parser = RobotFileParser()
+    parser.parse(body.decode("utf-8", errors="replace").splitlines())
+    discovery.robots_found = True
+    discovery.robots = parser
+    delay = parser.crawl_delay("*")
+    if delay:
+        discovery.crawl_delay = float(delay)
+    return list(parser.site_maps() or [])
+
+async def read_sitemap(client: httpx.AsyncClient, sitemap_url: str, discovery: SiteDiscovery) -> List[str]:
+    """
+    Stream one sitemap (plain or gzipped XML), appending its page URLs to
+    discovery.urls up to SITEMAP_MAX_URLS. Returns child sitemaps if it is a
+    sitemap index. Elements are discarded as they are parsed, so memory stays
+    flat however large the file is.
+    """
+    children: List[str] = []
+    parser = XMLPullParser(events=("start", "end"))
+    root = None
+    # Counted after decompression, so a small gzip file can't expand past the cap
+    size = 0
+    decompressor = None
+
+    def pieces(chunk: bytes) -> Iterator[bytes]:
+        """XML bytes of one downloaded chunk, decompressed at most DECOMPRESS_STEP at a time"""
+        if decompressor is None:
+            yield chunk
+            return
+        while chunk:
+            yield decompressor.decompress(chunk, DECOMPRESS_STEP)
+            chunk = decompressor.unconsumed_tail
+
+    def parse(piece: bytes):
+        nonlocal root
+        parser.feed(piece)
+        for event, element in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+            name = _local_name(element.tag)
+            if name not in ("url", "sitemap"):
+                continue
+            loc = next(
+                (child.text.strip() for child in element if _local_name(child.tag) == "loc" and child.text),
+                None
+            )
+            if loc and name == "sitemap":
+                children.append(loc)
+            elif loc and discovery.allowed(loc):
+                discovery.urls.append(loc)
+            elif loc:
+                discovery.urls_disallowed += 1
+            root.clear()
+
+    try:
+        async with client.stream("GET", sitemap_url, headers={"Accept": "*/*"}) as response:
+            if response.status_code != 200:
+                return []
+            first = True
+            async for chunk in response.aiter_bytes():
+                if first and chunk[:2] == b"\x1f\x8b":
+                    # A .xml.gz file served as-is rather than with Content-Encoding
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                first = False
+                for piece in pieces(chunk):
+                    size += len(piece)
+                    parse(piece)
+                    if len(discovery.urls) >= SITEMAP_MAX_URLS or size >= SITEMAP_MAX_BYTES:
+                        break
+                if len(discovery.urls) >= SITEMAP_MAX_URLS or size >= SITEMAP_MAX_BYTES:
+                    break
+    except (httpx.HTTPError, ParseError, zlib.error) as e:
+        logger.info(f"Could not read sitemap {sitemap_url}: {type(e).__name__}")
+    discovery.sitemaps_read += 1
+    del discovery.urls[SITEMAP_MAX_URLS:]
+    return children
+
+async def _discover(client: httpx.AsyncClient, base_url: str, discovery: SiteDiscovery):
+    sitemaps = await fetch_robots(client, base_url, discovery)
+    if not sitemaps:
+        sitemaps = [urljoin(base_url, "/sitemap.xml")]
+    queued = set(sitemaps)
+    while sitemaps and discovery.sitemaps_read < SITEMAP_MAX_FILES and len(discovery.urls) < SITEMAP_MAX_URLS:
+        for child in await read_sitemap(client, sitemaps.pop(0), discovery):
+            if child not in queued:
+                queued.add(child)
+                sitemaps.append(child)
+
+async def discover_site(client: httpx.AsyncClient, url: str, timeout: float = SITEMAP_TIMEOUT) -> SiteDiscovery:
+    """
+    Read a site's robots.txt (sitemaps and Crawl-delay) and its sitemaps,
+    following sitemap indexes. Gives up after `timeout` seconds, keeping the
+    URLs found so far.
+    """
+    parsed = urlparse(url)
+    base_url = f"{parsed.scheme}://{parsed.netloc}/"
+    discovery = SiteDiscovery()
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(_discover(client, base_url, discovery), timeout=max(0.1, timeout))
+    except asyncio.TimeoutError:
+        logger.info(f"Site discovery for {base_url} timed out with {len(discovery.urls)} URLs")
+    logger.info(
+        f"Discovered {len(discovery.urls)} URLs in {discovery.sitemaps_read} sitemap(s) of {base_url} "
+        f"in {time.monotonic() - started:.2f}s"
+    )
+    return discovery
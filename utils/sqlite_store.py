@@ -0,0 +1,41 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+# Root directory for every on-disk cache and store
+CACHE_DIR = Path(os.getenv("CACHE_DIR", str(Path(__file__).resolve().parent.parent / ".cache")))
+
+class SQLiteStore:
+    """
+    Base for the on-disk stores shared by all gunicorn workers on a host.
+
+    Subclasses create their tables in _create_schema. Each operation opens a
+    short-lived connection in WAL mode, so concurrent readers in other
+    workers are never blocked by a writer.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection, commit on success and always close it"""
+        if not self._initialized:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                self._create_schema(conn)
+                conn.commit()
+                self._initialized = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        raise NotImplementedError
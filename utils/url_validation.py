@@ -1,5 +1,7 @@
 import validators
-from urllib.parse import urlparse
+from functools import lru_cache
+from typing import Optional, Tuple
+from urllib.parse import urlparse, urlsplit, urljoin
 
 def validate_url(url: str) -> bool:
     """Validate URL format and ensure it has a scheme."""
@@ -10,4 +12,82 @@ def validate_url(url: str) -> bool:
     if not urlparse(url).scheme:
         url = "http://" + url
         
-    return validators.url(url) 
\ No newline at end of file
+    return validators.url(url) 
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a site URL used as a cache key.
+
+    Adds https:// when no scheme is given, lowercases the host, drops a
+    leading "www.", default ports, query strings, fragments and trailing
+    slashes, so "WWW.Example.com/" and "https://example.com" share one key.
+    """
+    if not urlparse(url).scheme:
+        url = "https://" + url
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+    path = parsed.path.rstrip("/")
+    return f"https://{host}{path}"
+
+# Links to these are never HTML pages worth crawling
+NON_PAGE_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".json",
+    ".xml", ".zip", ".gz", ".mp3", ".mp4", ".mov", ".avi", ".woff", ".woff2", ".ttf", ".doc",
+    ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".csv", ".rss", ".exe", ".dmg"
+)
+
+def _split_origin(parsed) -> Optional[Tuple[str, str]]:
+    """(scheme, host) of an http(s) URL, host lowercased and with any non-default port"""
+    try:
+        port = parsed.port
+    except ValueError:
+        return None
+    if parsed.scheme.lower() not in ("http", "https") or not parsed.hostname:
+        return None
+    host = parsed.hostname.lower()
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    return parsed.scheme.lower(), host
+
+@lru_cache(maxsize=256)
+def _origin(url: str) -> Optional[Tuple[str, str]]:
+    return _split_origin(urlsplit(url))
+
+def _page_key(scheme: str, host: str, path: str) -> Optional[Tuple[str, str]]:
+    if path.lower().endswith(NON_PAGE_EXTENSIONS):
+        return None
+    key_host = host[4:] if host.startswith("www.") else host
+    return f"{scheme}://{host}{path}", key_host + (path.rstrip("/") or "/")
+
+def canonicalize_url(href: str, base: str = "") -> Optional[Tuple[str, str]]:
+    """
+    Resolve a link for crawling. Returns (url, key): the URL to fetch, with
+    the fragment and query string dropped and the host lowercased, and a
+    dedup key that also ignores the scheme, "www." and trailing slashes.
+    Returns None for links that are not http(s) pages.
+    """
+    href = href.strip()
+    if base and href.startswith("/") and not href.startswith("//"):
+        # Root-relative links, most of a page's links, only need the base's origin
+        path = href.split("#", 1)[0].split("?", 1)[0]
+        if "/." not in path and path.isprintable() and "\\" not in path:
+            origin = _origin(base)
+            return _page_key(*origin, path) if origin else None
+    try:
+        parsed = urlsplit(urljoin(base, href) if base else href)
+    except ValueError:
+        return None
+    origin = _split_origin(parsed)
+    if origin is None:
+        return None
+    return _page_key(*origin, parsed.path or "/")
+
+def site_host(url: str) -> str:
+    """Host without "www.", for deciding whether a link stays on the same site"""
+    origin = _origin(url)
+    host = origin[1] if origin else ""
+    return host[4:] if host.startswith("www.") else host
@@ -0,0 +1,100 @@
+import asyncio
+import importlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from utils.browser_pool import get_crawler_pool, load_crawl4ai
+from utils.crawl4ai_integration import get_http_client
+from utils.llm_integration import get_router
+from utils.metrics import WORKER_STARTUP_DURATION
+
+logger = logging.getLogger(__name__)
+
+# A worker answers /health as soon as the app is imported. Everything slow to
+# set up (the crawl4ai and openai imports, browsers, connection pools) is
+# warmed up in the background afterwards, and /ready reports when that's done.
+
+async def _import_crawl4ai():
+    # In a thread, so the event loop keeps answering while Playwright loads
+    await asyncio.to_thread(load_crawl4ai)
+
+async def _start_crawler_pool():
+    await get_crawler_pool().start()
+
+async def _open_http_client():
+    get_http_client()
+
+async def _build_router():
+    await asyncio.to_thread(importlib.import_module, "openai")
+    get_router()
+
+class Warmup:
+    """Background warm-up of one worker, and its readiness"""
+
+    def __init__(self):
+        self.import_started: Optional[float] = None
+        self.import_seconds: Optional[float] = None
+        self.ready_seconds: Optional[float] = None  # From the start of the app's import
+        self.steps: Dict[str, Dict] = {}
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._started = 0.0
+
+    def record_import(self, started: float):
+        """Record the app's import, which began at the monotonic time started"""
+        self.import_started = started
+        self.import_seconds = time.monotonic() - started
+        WORKER_STARTUP_DURATION.labels("import").observe(self.import_seconds)
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None and self.error is None
+
+    def start(self):
+        if self._task is None:
+            self._started = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _step(self, name: str, step: Callable[[], Awaitable[None]], required: bool = False):
+        started = time.monotonic()
+        try:
+            await step()
+        except Exception as e:
+            logger.error(f"Warm-up step {name} failed: {str(e)}")
+            self.steps[name] = {"seconds": round(time.monotonic() - started, 3), "error": str(e)}
+            if required:
+                self.error = f"{name}: {str(e)}"
+            return
+        self.steps[name] = {"seconds": round(time.monotonic() - started, 3)}
+
+    async def _run(self):
+        # Browsers are launched lazily on first lease if their warm-up fails,
+        # so only a missing model backend keeps the worker from being ready
+        await self._step("crawl4ai_import", _import_crawl4ai)
+        await self._step("crawler_pool", _start_crawler_pool)
+        await self._step("http_client", _open_http_client)
+        await self._step("llm_router", _build_router, required=True)
+        self.ready_seconds = time.monotonic() - (self.import_started or self._started)
+        WORKER_STARTUP_DURATION.labels("ready").observe(self.ready_seconds)
+        if self.error:
+            logger.error(f"Warm-up finished in {self.ready_seconds:.2f}s, not ready: {self.error}")
+        else:
+            logger.info(f"Ready {self.ready_seconds:.2f}s after start (app import {self.import_seconds or 0:.2f}s)")
+
+    def status(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "warming_up": self._task is not None and not self._task.done(),
+            "import_seconds": round(self.import_seconds, 3) if self.import_seconds is not None else None,
+            "time_to_ready_seconds": round(self.ready_seconds, 3) if self.ready_seconds is not None else None,
+            "steps": dict(self.steps),
+            "error": self.error
+        }
+
+warmup = Warmup()